@@ -0,0 +1,224 @@
+"""Kapanmış mali yılların arşivlenmesi.
+
+Bir yılın satışları, satış kalemleri ve cari hareketleri yıl başına ayrı bir
+arşiv veritabanına (arsiv/stok_takip_arsiv_YYYY.db) taşınır. Her müşterinin o
+yılki net cari hareketi, ertesi yılın ilk anına tarihli tek bir "Devir"
+hareketi olarak ana veritabanında kalır; böylece cari listeler ve bakiyeler
+değişmez, ana veritabanı küçük kalır ve önbellekte tutulabilir.
+
+Taşıma iki adımdır: satırlar önce arşive kopyalanıp commit edilir (yeniden
+çalıştırılırsa INSERT OR IGNORE ile tekrar eklenmez), ardından ana
+veritabanında tek işlemde devir satırları eklenir, taşınan satırlar silinir ve
+yıl archived_years tablosuna yazılır. Raporlar yalnızca bu tabloda kayıtlı
+yılların arşivlerini ATTACH edip UNION ALL ile birleştirir; iki adım arasında
+kesilen bir arşivleme satırları iki kez saydırmaz.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+import db
+
+ARCHIVE_DIR = "arsiv"
+ARCHIVE_PREFIX = "stok_takip_arsiv_"
+SCHEMA_PREFIX = "arsiv_"
+
+# SQLite varsayılan olarak en çok 10 ek veritabanına izin verir
+MAX_ATTACHED = 8
+
+# Cari hareket türü: devreden net bakiye değişimi (işaretli; pozitif = alacak)
+CARRY_FORWARD_TYPE = "Devir"
+
+_COLUMNS = {
+    "sales": "id, invoice_number, customer_id, sale_date, total_amount",
+    "sale_items": "id, sale_id, product_id, qty, unit_price, unit_cost",
+    "ledger_transactions": "id, customer_id, type, amount, transaction_date, description",
+}
+
+
+def create_archive_schema(conn):
+    """archived_years tablosunu oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS archived_years (
+        year INTEGER PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        sale_count INTEGER NOT NULL,
+        ledger_count INTEGER NOT NULL,
+        archived_at TEXT
+    )""")
+
+
+def _create_archive_tables(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY, invoice_number TEXT NOT NULL, customer_id INTEGER, sale_date TEXT, total_amount REAL
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sale_items (
+        id INTEGER PRIMARY KEY, sale_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+        qty INTEGER NOT NULL, unit_price REAL NOT NULL, unit_cost REAL NOT NULL DEFAULT 0.0
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS ledger_transactions (
+        id INTEGER PRIMARY KEY, customer_id INTEGER, type TEXT, amount REAL, transaction_date TEXT, description TEXT
+    )""")
+    # Ana veritabanındaki rapor indekslerinin karşılıkları
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_date_customer ON sales(sale_date, customer_id, total_amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_invoice_number ON sales(invoice_number)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id, product_id, qty, unit_price, unit_cost)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_customer_date ON ledger_transactions(customer_id, transaction_date, id)")
+
+
+def archive_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(db.get_db_path())), ARCHIVE_DIR)
+
+
+def archive_path(year):
+    return os.path.join(archive_dir(), f"{ARCHIVE_PREFIX}{year}.db")
+
+
+def _year_range(year):
+    return f"{year}-01-01", f"{year + 1}-01-01"
+
+
+def archived_years(conn):
+    """Arşivlenmiş yıllar {yıl: (satış adedi, cari hareket adedi)}."""
+    return {year: (sales, ledger) for year, sales, ledger in conn.execute(
+        "SELECT year, sale_count, ledger_count FROM archived_years ORDER BY year"
+    )}
+
+
+def archivable_years(conn, today=None):
+    """Ana veritabanında verisi bulunan kapanmış (içinde bulunulan yıldan önceki) yıllar."""
+    current_year = (today or datetime.now()).year
+    years = set()
+    for table, date_column in (("sales", "sale_date"), ("ledger_transactions", "transaction_date")):
+        oldest = conn.execute(f"SELECT MIN({date_column}) FROM {table}").fetchone()[0]
+        if oldest:
+            years.update(range(int(oldest[:4]), current_year))
+    # Yalnızca devir satırı kalan yıllar arşivlenecek bir şey içermez
+    return [year for year in sorted(years) if conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM sales WHERE sale_date >= ? AND sale_date < ?) "
+        "OR EXISTS (SELECT 1 FROM ledger_transactions WHERE transaction_date >= ? AND transaction_date < ? AND type != ?)",
+        (*_year_range(year), *_year_range(year), CARRY_FORWARD_TYPE)
+    ).fetchone()[0]]
+
+
+def archive_year(year):
+    """Kapanmış bir yılı arşiv dosyasına taşır; (satış adedi, cari hareket adedi) döndürür.
+
+    Arka plan iş parçacığında çalıştırılmalıdır.
+    """
+    if year >= datetime.now().year:
+        raise ValueError("Yalnızca kapanmış (geçmiş) yıllar arşivlenebilir.")
+    start, end = _year_range(year)
+    os.makedirs(archive_dir(), exist_ok=True)
+    path = archive_path(year)
+
+    # 1. Kopyala: arşiv dosyası kendi bağlantısında, ana DB salt okunur bağlanır
+    target = sqlite3.connect(path, isolation_level=None)
+    try:
+        _create_archive_tables(target)
+        target.execute("ATTACH DATABASE ? AS hot", (db.get_db_path(),))
+        # Yalnızca arşiv dosyasına yazılır; ana veritabanı okunur, kasaların yazmaları engellenmez
+        target.execute("BEGIN")
+        try:
+            max_sale_id = target.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM hot.sales WHERE sale_date >= ? AND sale_date < ?", (start, end)
+            ).fetchone()[0]
+            max_ledger_id = target.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM hot.ledger_transactions WHERE transaction_date >= ? AND transaction_date < ?",
+                (start, end)
+            ).fetchone()[0]
+            sale_filter = "sale_date >= ? AND sale_date < ? AND id <= ?"
+            target.execute(f"INSERT OR IGNORE INTO sales ({_COLUMNS['sales']}) "
+                           f"SELECT {_COLUMNS['sales']} FROM hot.sales WHERE {sale_filter}", (start, end, max_sale_id))
+            target.execute(f"INSERT OR IGNORE INTO sale_items ({_COLUMNS['sale_items']}) "
+                           f"SELECT {_COLUMNS['sale_items']} FROM hot.sale_items WHERE sale_id IN "
+                           f"(SELECT id FROM hot.sales WHERE {sale_filter})", (start, end, max_sale_id))
+            target.execute(f"INSERT OR IGNORE INTO ledger_transactions ({_COLUMNS['ledger_transactions']}) "
+                           f"SELECT {_COLUMNS['ledger_transactions']} FROM hot.ledger_transactions "
+                           "WHERE transaction_date >= ? AND transaction_date < ? AND id <= ?", (start, end, max_ledger_id))
+            target.execute("COMMIT")
+        except BaseException:
+            target.execute("ROLLBACK")
+            raise
+        target.execute("DETACH DATABASE hot")
+        sale_count = target.execute(
+            "SELECT COUNT(*) FROM sales WHERE sale_date >= ? AND sale_date < ?", (start, end)
+        ).fetchone()[0]
+        ledger_count = target.execute(
+            "SELECT COUNT(*) FROM ledger_transactions WHERE transaction_date >= ? AND transaction_date < ?", (start, end)
+        ).fetchone()[0]
+    finally:
+        target.close()
+
+    # 2. Ana veritabanında devir satırlarını ekle, taşınanları sil
+    def move(conn):
+        # Kimlikler artan olduğundan sınırın altındaki satırlar arşive kopyalananların
+        # alt kümesidir (bu arada silinen müşteri olabilir); fazlası varsa kopya eksiktir
+        remaining = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM sales WHERE sale_date >= ? AND sale_date < ? AND id <= ?), "
+            "(SELECT COUNT(*) FROM ledger_transactions WHERE transaction_date >= ? AND transaction_date < ? AND id <= ?)",
+            (start, end, max_sale_id, start, end, max_ledger_id)
+        ).fetchone()
+        if remaining[0] > sale_count or remaining[1] > ledger_count:
+            raise RuntimeError(f"{year} arşivi ana veritabanıyla uyuşmuyor; arşivleme yeniden çalıştırılmalı.")
+
+        conn.execute(
+            f"""INSERT INTO ledger_transactions (customer_id, type, amount, transaction_date, description)
+            SELECT customer_id, ?, ROUND(SUM(CASE WHEN type IN ('Tahsilat', '{CARRY_FORWARD_TYPE}') THEN amount ELSE -amount END), 2),
+                   ?, ?
+            FROM ledger_transactions WHERE transaction_date >= ? AND transaction_date < ? AND id <= ?
+            GROUP BY customer_id
+            HAVING ROUND(SUM(CASE WHEN type IN ('Tahsilat', '{CARRY_FORWARD_TYPE}') THEN amount ELSE -amount END), 2) != 0""",
+            (CARRY_FORWARD_TYPE, f"{end} 00:00:00", f"{year} yılından devir", start, end, max_ledger_id)
+        )
+        # Satış kalemleri trg_sales_items_delete ile silinir
+        conn.execute("DELETE FROM sales WHERE sale_date >= ? AND sale_date < ? AND id <= ?", (start, end, max_sale_id))
+        conn.execute("DELETE FROM ledger_transactions WHERE transaction_date >= ? AND transaction_date < ? AND id <= ?",
+                     (start, end, max_ledger_id))
+        conn.execute(
+            "INSERT OR REPLACE INTO archived_years (year, file_name, sale_count, ledger_count, archived_at) VALUES (?, ?, ?, ?, ?)",
+            (year, os.path.basename(path), sale_count, ledger_count, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+    db.run_write(move)
+    return sale_count, ledger_count
+
+
+# --- Raporlar için ---
+
+def years_in_range(conn, start_date, end_exclusive):
+    """[start_date, end_exclusive) aralığıyla kesişen arşivlenmiş yıllar."""
+    return [year for year, in conn.execute(
+        "SELECT year FROM archived_years WHERE year >= ? AND printf('%04d-01-01', year) < ? ORDER BY year",
+        (int(start_date[:4]), end_exclusive)
+    )]
+
+
+def attach(conn, years):
+    """Yılların arşivlerini bağlantıya (gerekiyorsa) ATTACH eder ve şema adlarını döndürür.
+
+    Sınır aşılacaksa bu sorguda kullanılmayan arşivler DETACH edilir.
+    """
+    if len(years) > MAX_ATTACHED:
+        raise ValueError(f"Bir raporda en fazla {MAX_ATTACHED} arşiv yılı birlikte kullanılabilir.")
+    attached = {name for _, name, _ in conn.execute("PRAGMA database_list") if name.startswith(SCHEMA_PREFIX)}
+    wanted = {f"{SCHEMA_PREFIX}{year}": year for year in years}
+    missing = [name for name in wanted if name not in attached]
+    if len(attached) + len(missing) > MAX_ATTACHED:
+        for name in attached - set(wanted):
+            conn.execute(f"DETACH DATABASE {name}")
+    for name in missing:
+        path = archive_path(wanted[name])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{wanted[name]} yılının arşiv dosyası bulunamadı: {path}")
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (path,))
+    return list(wanted)
+
+
+def union(select, params, schemas):
+    """select sorgusunu main ve arşiv şemalarında çalıştıran UNION ALL alt sorgusu ve parametreleri.
+
+    select içindeki {schema} her dalda şema adıyla değiştirilir; koşullar her
+    dalda ayrı uygulandığından her dal kendi indeksini kullanır.
+    """
+    branches = [select.replace("{schema}", schema) for schema in ["main", *schemas]]
+    return " UNION ALL ".join(branches), tuple(params) * len(branches)
@@ -0,0 +1,291 @@
+"""Çalışırken (online) veritabanı yedeği.
+
+Yedek, SQLite yedekleme API'si (Connection.backup) ile ayrı bir iş
+parçacığında alınır: her adımda PAGES_PER_STEP sayfa kopyalanır ve adımlar
+arasında STEP_SLEEP saniye beklenir, böylece kasalar yedek sürerken satış
+yapmaya devam eder. Kopya önce .tmp uzantılı yazılır, PRAGMA integrity_check
+ile doğrulanır ve ancak sağlamsa yedek klasörüne adıyla taşınır.
+
+Döndürme (rotation) tek bir yedek dizisi üzerinde yapılır: en yeni
+keep_hourly yedek, son keep_daily günün her birinin ilk yedeği ve son
+keep_monthly ayın her birinin ilk yedeği saklanır, gerisi silinir. Böylece
+günlük ve aylık yedekler için çok GB'lık dosya yeniden kopyalanmaz.
+
+Aynı DB'yi kullanan kasalardan yalnızca birinde yedekleme açık olmalıdır.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import db
+
+BACKUP_PREFIX = "stok_takip_"
+BACKUP_SUFFIX = ".db"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+# Adım başına sayfa (4 KiB sayfa ile ~4 MB) ve adımlar arası bekleme (sn)
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.05
+# Kopya sürerken başka bağlantı yazarsa yedek baştan başlar; bu kadar
+# yeniden başlamadan sonra kalan sayfalar tek adımda kopyalanır
+MAX_RESTARTS = 3
+# Zamanlayıcının yedek gerekip gerekmediğine bakma aralığı (sn)
+CHECK_INTERVAL = 300
+
+# settings.json içindeki "backup" anahtarı ile değiştirilebilir
+DEFAULT_BACKUP_SETTINGS = {
+    "enabled": True,
+    "dir": "yedekler",
+    "interval_minutes": 60,
+    "keep_hourly": 24,
+    "keep_daily": 7,
+    "keep_monthly": 12,
+}
+
+
+class BackupCancelled(Exception):
+    """Uygulama kapanırken süren yedek durduruldu."""
+
+
+class BackupError(Exception):
+    """Yedek dosyası bozuk veya okunamıyor."""
+
+
+def backup_settings(settings):
+    merged = dict(DEFAULT_BACKUP_SETTINGS)
+    merged.update((settings or {}).get("backup", {}))
+    return merged
+
+
+def list_backups(backup_dir):
+    """Yedekleri en yeniden eskiye [(zaman, yol, boyut), ...] olarak döndürür."""
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        if not (name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)):
+            continue
+        try:
+            taken_at = datetime.strptime(name[len(BACKUP_PREFIX):-len(BACKUP_SUFFIX)], TIMESTAMP_FORMAT)
+        except ValueError:
+            continue  # Elle konmuş dosyalara dokunulmaz
+        path = os.path.join(backup_dir, name)
+        backups.append((taken_at, path, os.path.getsize(path)))
+    backups.sort(reverse=True)
+    return backups
+
+
+def backups_to_keep(backups, keep_hourly, keep_daily, keep_monthly):
+    """Döndürme kuralına göre saklanacak yedeklerin yollarını döndürür (backups en yeniden eskiye)."""
+    keep = {path for _, path, _ in backups[:keep_hourly]}
+    first_of_day, first_of_month = {}, {}
+    for taken_at, path, _ in backups:
+        # Liste yeniden eskiye sıralı: son yazılan, dönemin ilk yedeğidir
+        first_of_day[taken_at.date()] = path
+        first_of_month[(taken_at.year, taken_at.month)] = path
+    keep.update(first_of_day[day] for day in sorted(first_of_day, reverse=True)[:keep_daily])
+    keep.update(first_of_month[month] for month in sorted(first_of_month, reverse=True)[:keep_monthly])
+    return keep
+
+
+def rotate(backup_dir, keep_hourly, keep_daily, keep_monthly):
+    """Kurala uymayan eski yedekleri siler; silinen dosya sayısını döndürür."""
+    backups = list_backups(backup_dir)
+    keep = backups_to_keep(backups, keep_hourly, keep_daily, keep_monthly)
+    removed = 0
+    for _, path, _ in backups:
+        if path not in keep:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                print(f"Eski yedek silinemedi ({path}): {e}")
+    return removed
+
+
+def check_integrity(path):
+    """Yedek dosyasında PRAGMA integrity_check çalıştırır; sorun varsa BackupError."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"Yedek okunamadı: {e}") from e
+    finally:
+        conn.close()
+    if problems != ["ok"]:
+        raise BackupError("Yedek bütünlük denetiminden geçmedi: " + "; ".join(problems[:5]))
+
+
+class _Restart(Exception):
+    pass
+
+
+def _copy(source, target, stop_event=None):
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if stop_event is not None and stop_event.is_set():
+            raise BackupCancelled()
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1  # Kopya sırasında kaynak değişti, SQLite baştan başladı
+            if restarts > MAX_RESTARTS:
+                raise _Restart()
+        last_remaining = remaining
+
+    try:
+        source.backup(target, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_SLEEP)
+    except _Restart:
+        # Yoğun yazma altında adımlı kopya hiç bitmeyebilir: kalan kopya tek adımda alınır
+        source.backup(target)
+
+
+def _remove_files(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def create_backup(backup_dir, stop_event=None, now=None):
+    """Veritabanının doğrulanmış bir yedeğini alır ve yolunu döndürür (arka plan iş parçacığında)."""
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{BACKUP_PREFIX}{(now or datetime.now()).strftime(TIMESTAMP_FORMAT)}{BACKUP_SUFFIX}"
+    path = os.path.join(backup_dir, name)
+    tmp_path = path + ".tmp"
+
+    target = sqlite3.connect(tmp_path)
+    try:
+        _copy(db.get_read_connection(), target, stop_event)
+        # Kopya kaynağın WAL kipini taşır; yedek tek dosya olarak kalsın
+        target.execute("PRAGMA journal_mode = DELETE")
+    except BaseException:
+        target.close()
+        _remove_files(tmp_path)
+        raise
+    target.close()
+
+    try:
+        check_integrity(tmp_path)
+    except BackupError:
+        _remove_files(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return path
+
+
+def restore_backup(path):
+    """Yedeği çalışan veritabanının üzerine yazar.
+
+    Kopya tek adımda yapılır; diğer kasalar bu sırada bekler ve eski ile yeni
+    veritabanının karışımını görmez. Uygulama sonrasında yeniden
+    başlatılmalıdır (şema göçleri ve açık bağlantılar).
+    """
+    check_integrity(path)
+    db.close_all()
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    target = sqlite3.connect(db.get_db_path(), timeout=db.get_settings()["busy_timeout"] / 1000)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+class BackupScheduler:
+    """Yedekleri kendi iş parçacığında, ayarlardaki aralıkla alır ve döndürür."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._requested = False
+        self._status_lock = threading.Lock()
+        self._status = {"running": False, "last_path": None, "last_error": None, "last_duration_s": None}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="Backup", daemon=True)
+        self._thread.start()
+
+    def configure(self, settings):
+        self.settings = settings
+        self._wake.set()
+
+    def request_now(self):
+        """Aralığı beklemeden bir yedek alınmasını ister."""
+        self._requested = True
+        self._set_status(running=True)
+        self._wake.set()
+
+    def status(self):
+        with self._status_lock:
+            return dict(self._status)
+
+    def _set_status(self, **values):
+        with self._status_lock:
+            self._status.update(values)
+
+    def _due(self):
+        if self._requested:
+            return True
+        if not self.settings["enabled"]:
+            return False
+        backups = list_backups(self.settings["dir"])
+        if not backups:
+            return True
+        age_s = (datetime.now() - backups[0][0]).total_seconds()
+        return age_s >= self.settings["interval_minutes"] * 60
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            if self._due():
+                self._requested = False
+                self._run()
+            self._wake.wait(CHECK_INTERVAL)
+
+    def _run(self):
+        settings = self.settings
+        self._set_status(running=True)
+        started = time.perf_counter()
+        try:
+            path = create_backup(settings["dir"], self._stop)
+            removed = rotate(settings["dir"], settings["keep_hourly"], settings["keep_daily"], settings["keep_monthly"])
+        except BackupCancelled:
+            self._set_status(running=False)
+            return
+        except Exception as e:
+            print(f"Yedek alınamadı: {e}")
+            self._set_status(running=False, last_error=str(e))
+            return
+        duration = time.perf_counter() - started
+        print(f"Yedek alındı: {path} ({duration:.1f} sn, {removed} eski yedek silindi)")
+        self._set_status(running=False, last_path=path, last_error=None, last_duration_s=duration)
+
+    def stop(self):
+        # Süren kopya bir sonraki adımda durur; yarım .tmp dosyası silinir
+        self._stop.set()
+        self._wake.set()
+
+
+_scheduler = None
+
+
+def start(settings):
+    """Zamanlayıcıyı başlatır; settings uygulamanın tüm ayar sözlüğüdür."""
+    global _scheduler
+    _scheduler = BackupScheduler(backup_settings(settings))
+    _scheduler.start()
+    return _scheduler
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def stop():
+    if _scheduler is not None:
+        _scheduler.stop()
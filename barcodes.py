@@ -0,0 +1,87 @@
+"""Ürün barkodları.
+
+Bir ürünün birden fazla barkodu olabilir; koli/paket barkodları quantity ile
+kaç adet ürün sayılacağını taşır. barcode birincil anahtar olduğundan kasa
+okutması tek bir indeks aramasıdır.
+"""
+import sqlite3
+
+import db
+
+# Form alanında "barkod*adet" biçimi: 8690000000001, 8690000000002*6
+PACK_SEPARATOR = "*"
+
+
+def create_barcode_schema(conn):
+    """barcodes tablosunu oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS barcodes (
+        barcode TEXT PRIMARY KEY,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 1 CHECK (quantity > 0)
+    ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_barcodes_product ON barcodes(product_id)")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_products_barcodes_delete AFTER DELETE ON products BEGIN
+        DELETE FROM barcodes WHERE product_id = old.id;
+    END""")
+
+
+def parse_barcodes(text):
+    """Form metnini [(barkod, adet), ...] listesine çevirir. Geçersiz adet için ValueError."""
+    entries = {}
+    parts = [part.strip() for part in text.replace(";", ",").replace("\n", ",").split(",")]
+    for number, part in enumerate((part for part in parts if part), start=1):
+        code, _, qty = part.partition(PACK_SEPARATOR)
+        code = code.strip()
+        if not code:
+            raise ValueError(f"{number}. barkod geçersiz: '{part}'")
+        try:
+            qty = int(qty) if qty.strip() else 1
+        except ValueError:
+            raise ValueError(f"{number}. barkodun ('{code}') koli adedi sayı değil: '{qty.strip()}'") from None
+        if qty <= 0:
+            raise ValueError(f"{number}. barkodun ('{code}') koli adedi sıfırdan büyük olmalı: {qty}")
+        entries[code] = qty
+    return list(entries.items())
+
+
+def format_barcodes(entries):
+    return ", ".join(code if qty == 1 else f"{code}{PACK_SEPARATOR}{qty}" for code, qty in entries)
+
+
+def get_product_barcodes(product_id, conn=None):
+    conn = conn or db.get_read_connection()
+    return conn.execute(
+        "SELECT barcode, quantity FROM barcodes WHERE product_id = ? ORDER BY quantity, barcode", (product_id,)
+    ).fetchall()
+
+
+def replace_product_barcodes(conn, product_id, entries):
+    """Ürünün barkodlarını verilenlerle değiştirir; çağıranın işlemi içinde çalışır.
+
+    Barkod başka bir ürüne kayıtlıysa hiçbir şey yazılmadan sqlite3.IntegrityError yükselir.
+    """
+    # Sahibi yazmadan önce aranır: executemany yarıda kalırsa bu ürüne yeni
+    # eklenen satırlar işlemde durur ve yanlış barkod/ürün suçlanırdı
+    for code, _ in entries:
+        owner = conn.execute(
+            "SELECT p.name FROM barcodes b JOIN products p ON p.id = b.product_id "
+            "WHERE b.barcode = ? AND b.product_id != ?",
+            (code, product_id)
+        ).fetchone()
+        if owner:
+            raise sqlite3.IntegrityError(f"'{code}' barkodu zaten '{owner[0]}' ürününe kayıtlı.")
+    conn.execute("DELETE FROM barcodes WHERE product_id = ?", (product_id,))
+    conn.executemany(
+        "INSERT INTO barcodes (barcode, product_id, quantity) VALUES (?, ?, ?)",
+        [(code, product_id, qty) for code, qty in entries]
+    )
+
+
+def find_by_barcode(code, conn=None):
+    """Barkodun ürününü (id, name, sale_price, stock_quantity, paket_adedi) olarak döndürür; yoksa None."""
+    conn = conn or db.get_read_connection()
+    return conn.execute(
+        """SELECT p.id, p.name, p.sale_price, p.stock_quantity, b.quantity
+           FROM barcodes b JOIN products p ON p.id = b.product_id
+           WHERE b.barcode = ?""", (code,)
+    ).fetchone()
@@ -0,0 +1,294 @@
+"""SQLite bağlantı yöneticisi.
+
+Uygulama boyunca açık kalan tek bir yazıcı bağlantısı ve her iş parçacığı
+için ayrı bir okuma bağlantısı tutar. Yazıcı yalnızca transaction() içinde
+(kilit altında) kullanılır; böylece arka plan görevlerinin yazma işlemleri
+ana iş parçacığının okumalarıyla karışmaz. WAL günlüğü, busy_timeout ve
+önbellek PRAGMA'ları her bağlantı açılırken uygulanır.
+
+Aynı DB dosyasını birden çok kasa kullanabilir: yazma işlemleri run_write()
+ile BEGIN IMMEDIATE altında çalışır, kilit meşgulse sınırlı sayıda artan
+aralıklarla yeniden denenir. Kilit bekleme süreleri lock_metrics() ile okunur.
+"""
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_NAME = "stok_takip.db"
+
+# settings.json içindeki "database" anahtarı ile değiştirilebilir.
+DEFAULT_DB_SETTINGS = {
+    "journal_mode": "WAL",      # Ağ paylaşımındaki DB için "DELETE" seçilmeli
+    "synchronous": "NORMAL",    # WAL ile güvenli; her commit'te fsync yapılmaz
+    "busy_timeout": 5000,       # ms
+    "cache_size": -20000,       # Negatif değer KiB demektir (~20 MB)
+    "mmap_size": 268435456,     # 256 MB
+    "temp_store": "MEMORY",
+}
+
+_ALLOWED_VALUES = {
+    "journal_mode": ("WAL", "DELETE", "TRUNCATE", "PERSIST"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+_db_path = DB_NAME
+_db_settings = dict(DEFAULT_DB_SETTINGS)
+
+_writer = None
+_write_lock = threading.RLock()
+
+_sql_functions = {}
+
+# busy_timeout dolduktan sonra yazma işleminin yeniden deneme sayısı ve ilk bekleme (sn)
+WRITE_RETRIES = 3
+RETRY_BACKOFF = 0.1
+
+_metrics_lock = threading.Lock()
+_metrics = {"transactions": 0, "retries": 0, "failures": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+_local = threading.local()
+_readers = []
+_readers_lock = threading.Lock()
+_generation = 0
+
+
+def configure(db_settings=None, db_path=None):
+    """Bağlantı ayarlarını günceller; bağlantılar yeni ayarlarla yeniden açılır.
+
+    Yazıcı kilit altında kapatılır. Okuma bağlantıları başka iş parçacıklarında
+    o anda kullanılıyor olabileceğinden burada kapatılmaz: her iş parçacığı bir
+    sonraki get_read_connection() çağrısında eskimiş bağlantısını kendisi kapatır.
+    """
+    global _db_path, _writer, _generation
+    settings = dict(DEFAULT_DB_SETTINGS)
+    for key, value in (db_settings or {}).items():
+        if key not in DEFAULT_DB_SETTINGS:
+            continue
+        if key in _ALLOWED_VALUES:
+            value = str(value).upper()
+            if value not in _ALLOWED_VALUES[key]:
+                continue
+        else:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                continue
+        settings[key] = value
+
+    with _write_lock:
+        if settings == _db_settings and (not db_path or db_path == _db_path):
+            return
+        if _writer is not None:
+            try:
+                _writer.close()
+            except sqlite3.Error:
+                pass
+            _writer = None
+        if db_path:
+            _db_path = db_path
+        _db_settings.clear()
+        _db_settings.update(settings)
+        with _readers_lock:
+            _generation += 1
+
+
+def get_settings():
+    """Etkin bağlantı ayarlarının bir kopyasını döndürür."""
+    return dict(_db_settings)
+
+
+def get_db_path():
+    return _db_path
+
+
+def register_function(name, num_params, func):
+    """Tüm bağlantılarda (mevcut ve yeni) kullanılacak deterministik bir SQL fonksiyonu kaydeder.
+
+    Tetikleyicilerde kullanılan fonksiyonlar, tetikleyiciyi çalıştıracak her
+    bağlantıda kayıtlı olmalıdır.
+    """
+    _sql_functions[name] = (num_params, func)
+    with _readers_lock:
+        open_conns = list(_readers)
+    with _write_lock:
+        if _writer is not None:
+            open_conns.append(_writer)
+        for conn in open_conns:
+            conn.create_function(name, num_params, func, deterministic=True)
+
+
+def _connect(readonly=False):
+    conn = sqlite3.connect(
+        _db_path,
+        timeout=_db_settings["busy_timeout"] / 1000,
+        isolation_level=None,  # İşlemler transaction() ile açıkça yönetilir
+        check_same_thread=False,
+    )
+    for name, (num_params, func) in _sql_functions.items():
+        conn.create_function(name, num_params, func, deterministic=True)
+    conn.execute(f"PRAGMA busy_timeout = {int(_db_settings['busy_timeout'])}")
+    conn.execute(f"PRAGMA cache_size = {int(_db_settings['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(_db_settings['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {_db_settings['temp_store']}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        # Yeni veritabanında boş sayfalar parça parça geri verilebilsin (bkz. maintenance.py);
+        # mevcut veritabanında ancak bir VACUUM sonrasında etkili olur
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute(f"PRAGMA journal_mode = {_db_settings['journal_mode']}")
+        conn.execute(f"PRAGMA synchronous = {_db_settings['synchronous']}")
+    return conn
+
+
+def get_connection():
+    """Yazıcı bağlantısını döndürür (gerekirse açar). Bağlantı kapatılmamalıdır.
+
+    Yazma işlemleri için transaction() kullanılmalıdır; okumalar get_read_connection() ile yapılır.
+    """
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            try:
+                _writer = _connect()
+            except sqlite3.Error:
+                _writer = None
+                raise
+        return _writer
+
+
+def get_read_connection():
+    """Çağıran iş parçacığına ait (salt okunur) bağlantıyı döndürür; gerekirse açar."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", None) != _generation:
+        if conn is not None:
+            # Ayar değişiminden önce açılmış bağlantı; yalnızca sahibi kapatır
+            with _readers_lock:
+                if conn in _readers:
+                    _readers.remove(conn)
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        get_connection()  # journal_mode önce yazıcı tarafından ayarlanmalı
+        conn = _connect(readonly=True)
+        _local.conn = conn
+        _local.generation = _generation
+        with _readers_lock:
+            _readers.append(conn)
+    return conn
+
+
+class DatabaseBusyError(sqlite3.OperationalError):
+    """Yeniden denemelere rağmen yazma kilidi alınamadı."""
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _record_wait(started, acquired=True):
+    # Kilidi alamayan denemelerin beklemesi de toplama eklenir
+    wait_ms = (time.perf_counter() - started) * 1000
+    with _metrics_lock:
+        _metrics["transactions"] += acquired
+        _metrics["wait_ms_total"] += wait_ms
+        _metrics["wait_ms_max"] = max(_metrics["wait_ms_max"], wait_ms)
+
+
+def lock_metrics():
+    """Yazma kilidi istatistikleri: işlem, yeniden deneme ve başarısızlık sayısı, bekleme süreleri (ms)."""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics["wait_ms_avg"] = metrics["wait_ms_total"] / metrics["transactions"] if metrics["transactions"] else 0.0
+    return metrics
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Yazıcı bağlantısında tek bir işlem açar; hata olursa geri alır.
+
+    immediate=True yazma kilidini işlemin başında alır (okuyup sonra yazan işlemler için).
+    Kilit bekleme süresi lock_metrics()'e eklenir.
+    """
+    started = time.perf_counter()
+    with _write_lock:
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        except sqlite3.OperationalError:
+            _record_wait(started, acquired=False)
+            raise
+        _record_wait(started)
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+
+def run_write(func, *args):
+    """func(conn, *args) fonksiyonunu BEGIN IMMEDIATE işlemi içinde çalıştırır ve sonucunu döndürür.
+
+    Başka bir kasa kilidi busy_timeout süresinden uzun tutarsa işlem geri
+    alınıp WRITE_RETRIES kez artan aralıklarla yeniden denenir; func bu yüzden
+    yalnızca veritabanı üzerinde çalışmalıdır. Denemeler tükenirse
+    DatabaseBusyError yükselir.
+    """
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            with transaction(immediate=True) as conn:
+                return func(conn, *args)
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            if attempt == WRITE_RETRIES:
+                with _metrics_lock:
+                    _metrics["failures"] += 1
+                raise DatabaseBusyError(
+                    "Veritabanı başka bir kasa tarafından kullanılıyor; lütfen birkaç saniye sonra tekrar deneyin."
+                ) from e
+            with _metrics_lock:
+                _metrics["retries"] += 1
+            # Kasalar aynı anda yeniden denemesin diye rastgele sapma eklenir
+            time.sleep(RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+@contextmanager
+def exclusive_connection():
+    """Yazıcı bağlantısını işlem açmadan, kilit altında verir.
+
+    VACUUM ve wal_checkpoint gibi bir işlem içinde çalıştırılamayan komutlar içindir.
+    """
+    with _write_lock:
+        yield get_connection()
+
+
+def close_all():
+    """Tüm açık bağlantıları kapatır (uygulama kapanırken veya geri yükleme öncesinde).
+
+    Başka iş parçacıklarının bağlantılarını da kapatır; ayar değişimi için configure() kullanılır.
+    """
+    global _writer, _generation
+    with _readers_lock:
+        _generation += 1
+        for conn in _readers:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _readers.clear()
+
+    with _write_lock:
+        if _writer is not None:
+            try:
+                _writer.close()
+            except sqlite3.Error:
+                pass
+            _writer = None
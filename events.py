@@ -0,0 +1,70 @@
+"""Veri değişikliği olay yolu (yayınla/abone ol).
+
+Yazma işlemi tamamlanınca değişen varlık türü, kimlikleri ve işlem türü
+yayınlanır; sekmeler birbirlerini doğrudan yenilemek yerine ilgilendikleri
+türlere abone olur. Görünür sekme değişikliği hemen (tek satır güncellemesi
+veya yerinde yenileme ile) uygular, gizli sekmeler yalnızca kirli olarak
+işaretlenir ve gösterildiklerinde bir kez yenilenir.
+
+Olaylar ana (Tk) iş parçacığında yayınlanmalıdır; arka plan görevleri
+bunu on_done geri çağrısında yapar.
+"""
+from collections import namedtuple
+
+# Varlık türleri
+PRODUCT = "product"
+CUSTOMER = "customer"
+SALE = "sale"
+LEDGER = "ledger"   # ids: hareketleri değişen müşterilerin id'leri
+SALE_CONFLICT = "sale_conflict"   # ids: stok çakışması listesindeki kayıt kimlikleri
+
+# İşlem türleri
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+Change = namedtuple("Change", "entity ids operation")
+
+_subscribers = {}
+
+
+def subscribe(entities, callback):
+    """callback(change) verilen türlerdeki her değişiklikte çağrılır."""
+    if isinstance(entities, str):
+        entities = (entities,)
+    for entity in entities:
+        _subscribers.setdefault(entity, []).append(callback)
+
+
+def publish(entity, ids=(), operation=UPDATE):
+    change = Change(entity, frozenset(ids), operation)
+    for callback in list(_subscribers.get(entity, ())):
+        callback(change)
+
+
+class DirtyFlag:
+    """Gizli sekmenin yenilenmesini görünür olana kadar erteler.
+
+    Aynı olay döngüsünde gelen birden çok değişiklik (ör. bir satışın ürün,
+    müşteri ve cari olayları) tek bir yenilemede birleştirilir.
+    """
+
+    def __init__(self, widget, refresh):
+        self.widget = widget
+        self.refresh = refresh
+        self.dirty = False
+        self._after_id = None
+
+    def mark(self):
+        self.dirty = True
+        if self._after_id is None and self.widget.winfo_ismapped():
+            self._after_id = self.widget.after_idle(self.flush)
+
+    def flush(self):
+        """Kirliyse yeniler (sekme gösterildiğinde çağrılır)."""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if self.dirty:
+            self.dirty = False
+            self.refresh()
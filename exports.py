@@ -0,0 +1,277 @@
+"""Satış, cari hareket ve ürün verisinin CSV, Excel (XLSX) ve Parquet dışa aktarımı.
+
+Satırlar pandas.read_sql(chunksize=...) ile tek imleçten parça parça okunur
+ve her parça dosyaya hemen eklenir; milyonlarca satırlık dışa aktarımda da
+bellekte yalnızca bir parça bulunur. Sütun türleri sabittir (tamsayılar Int64,
+tutarlar float64, metinler string, tarihler datetime), böylece her parça aynı
+şemayla yazılır ve Excel/Parquet'te tarih ve sayılar metin olarak kalmaz.
+
+Tarih aralığı arşivlenmiş yıllara uzanıyorsa her arşiv ayrı sorguyla, eski
+yıldan yeniye sırayla okunur (UNION ALL + ORDER BY tüm sonucu sıralatırdı).
+Arşivlenen yılın hareketleri dışa aktarılıyorsa o yılın devir satırı
+atlanır; aksi halde aynı tutar iki kez sayılırdı.
+
+Arka plan görevinde çalıştırılır: ilerleme ve iptal tasks.current_task()
+üzerinden yapılır. Dosya önce .tmp uzantılı yazılır; iptal edilen veya hata
+alan dışa aktarım yarım bir dosya bırakmaz.
+"""
+import os
+
+import archive
+import tasks
+from ledger import SIGNED_AMOUNT
+
+# Parça başına satır; pandas'ın satır başına yükü düşük kalacak kadar büyük
+CHUNK_SIZE = 50_000
+
+DATASET_SALES = "sales"
+DATASET_LEDGER = "ledger"
+DATASET_PRODUCTS = "products"
+
+FORMAT_CSV = "csv"
+FORMAT_XLSX = "xlsx"
+FORMAT_PARQUET = "parquet"
+
+# Excel sayfası en çok 1.048.576 satır alır (başlık dahil); fazlası yeni sayfaya yazılır
+XLSX_MAX_ROWS = 1_048_575
+
+# (sütun, başlık, tür); tür pandas dtype'ı ya da tarih sütunları için "datetime"
+COLUMNS = {
+    DATASET_SALES: [
+        ("sale_id", "Satış No", "Int64"),
+        ("invoice_number", "Fatura No", "string"),
+        ("sale_date", "Tarih", "datetime"),
+        ("customer_id", "Müşteri No", "Int64"),
+        ("customer", "Müşteri", "string"),
+        ("sale_total", "Fatura Toplamı", "float64"),
+        ("product_id", "Ürün No", "Int64"),
+        ("product", "Ürün", "string"),
+        ("qty", "Adet", "Int64"),
+        ("unit_price", "Birim Fiyat", "float64"),
+        ("unit_cost", "Birim Maliyet", "float64"),
+        ("line_total", "Satır Tutarı", "float64"),
+    ],
+    DATASET_LEDGER: [
+        ("id", "Hareket No", "Int64"),
+        ("transaction_date", "Tarih", "datetime"),
+        ("customer_id", "Müşteri No", "Int64"),
+        ("customer", "Müşteri", "string"),
+        ("type", "Tip", "string"),
+        ("description", "Açıklama", "string"),
+        ("amount", "Tutar", "float64"),
+        ("signed", "Bakiyeye Etkisi", "float64"),
+    ],
+    DATASET_PRODUCTS: [
+        ("id", "Ürün No", "Int64"),
+        ("name", "Ürün", "string"),
+        ("stock_quantity", "Stok", "Int64"),
+        ("sale_price", "Satış Fiyatı", "float64"),
+        ("purchase_price", "Alış Fiyatı", "float64"),
+        ("low_stock_threshold", "Kritik Stok", "Int64"),
+    ],
+}
+
+# Kalemi olmayan (eski sürümlerden kalan) satışlar da tek satır olarak çıkar;
+# müşteri ve ürün adları ana veritabanındaki güncel adlardır
+_SALES_FROM = """FROM {schema}.sales s
+    LEFT JOIN {schema}.sale_items si ON si.sale_id = s.id{names}
+    WHERE s.sale_date >= ? AND s.sale_date < ?"""
+_SALES_NAMES = """
+    LEFT JOIN main.customers c ON c.id = s.customer_id
+    LEFT JOIN main.products p ON p.id = si.product_id"""
+_SALES_SELECT = """SELECT s.id AS sale_id, s.invoice_number, s.sale_date, s.customer_id, c.name AS customer,
+    s.total_amount AS sale_total, si.product_id, p.name AS product, si.qty, si.unit_price, si.unit_cost,
+    si.qty * si.unit_price AS line_total"""
+_SALES_ORDER = "ORDER BY s.sale_date, s.id, si.id"
+
+_LEDGER_FROM = """FROM (SELECT id, transaction_date, customer_id, type, description, amount, {signed} AS signed
+        FROM {schema}.ledger_transactions
+        WHERE transaction_date >= ? AND transaction_date < ?{skip_carry}) l{names}"""
+_LEDGER_NAMES = """
+    LEFT JOIN main.customers c ON c.id = l.customer_id"""
+_LEDGER_SELECT = """SELECT l.id, l.transaction_date, l.customer_id, c.name AS customer, l.type, l.description,
+    l.amount, l.signed"""
+_LEDGER_ORDER = "ORDER BY l.transaction_date, l.id"
+
+
+def _queries(conn, dataset, start_date, end_exclusive):
+    """[(sayım sorgusu, veri sorgusu, parametreler), ...]; sırayla çalıştırılır."""
+    if dataset == DATASET_PRODUCTS:
+        columns = ", ".join(name for name, _, _ in COLUMNS[dataset])
+        return [("SELECT COUNT(*) FROM products", f"SELECT {columns} FROM products ORDER BY id", ())]
+
+    years = archive.years_in_range(conn, start_date, end_exclusive)
+    schemas = archive.attach(conn, years)
+    params = (start_date, end_exclusive)
+    if dataset == DATASET_SALES:
+        from_clause, names, select, order = _SALES_FROM, _SALES_NAMES, _SALES_SELECT, _SALES_ORDER
+    elif dataset == DATASET_LEDGER:
+        # Dışa aktarılan arşiv yılının devri, ertesi yılın ilk anına tarihlidir
+        carry_dates = [f"{year + 1}-01-01 00:00:00" for year in years]
+        skip_carry = ""
+        if carry_dates:
+            skip_carry = (f" AND NOT (type = '{archive.CARRY_FORWARD_TYPE}' "
+                          f"AND transaction_date IN ({', '.join('?' * len(carry_dates))}))")
+            params += tuple(carry_dates)
+        from_clause = _LEDGER_FROM.replace("{signed}", SIGNED_AMOUNT).replace("{skip_carry}", skip_carry)
+        names, select, order = _LEDGER_NAMES, _LEDGER_SELECT, _LEDGER_ORDER
+    else:
+        raise ValueError(f"Bilinmeyen dışa aktarım verisi: {dataset}")
+
+    # Sayım ad tablolarına bağlanmaz; years_in_range eski yıldan yeniye sıralıdır,
+    # ana veritabanı en güncel veridir
+    count_from, data_from = from_clause.replace("{names}", ""), from_clause.replace("{names}", names)
+    return [
+        (f"SELECT COUNT(*) {count_from}".replace("{schema}", schema),
+         f"{select} {data_from} {order}".replace("{schema}", schema), params)
+        for schema in [*schemas, "main"]
+    ]
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        # utf-8-sig: Excel Türkçe karakterleri BOM olmadan yanlış okur
+        self.file = open(path, "w", encoding="utf-8-sig", newline="")
+        self.started = False
+
+    def write(self, frame):
+        # Türkçe Excel ayarlarıyla doğrudan açılsın: alan ayırıcı ';', ondalık ayırıcı ','
+        frame.to_csv(self.file, sep=";", decimal=",", index=False, header=not self.started,
+                     date_format="%Y-%m-%d %H:%M:%S")
+        self.started = True
+
+    def close(self):
+        self.file.close()
+
+    def discard(self):
+        self.file.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path):
+        from openpyxl import Workbook
+
+        self.path = path
+        # Salt yazma kipinde satırlar sayfa sayfa geçici dosyaya akıtılır
+        self.book = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+
+    @property
+    def started(self):
+        return self.sheet is not None
+
+    def _new_sheet(self, headers):
+        number = len(self.book.worksheets) + 1
+        self.sheet = self.book.create_sheet("Veri" if number == 1 else f"Veri {number}")
+        self.sheet.append(headers)
+        self.sheet_rows = 0
+
+    def write(self, frame):
+        headers = list(frame.columns)
+        if self.sheet is None:
+            self._new_sheet(headers)
+        # Boş hücreler NaN/NA değil None yazılmalıdır
+        values = frame.astype(object).where(frame.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self.sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet(headers)
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self):
+        self.book.save(self.path)
+
+    def discard(self):
+        # Sayfaların geçici dosyaları openpyxl'de ancak program kapanırken silinir;
+        # uzun açık kalan uygulamada iptal edilen her dışa aktarım iz bırakmasın.
+        # _writer openpyxl'in iç ayrıntısıdır; sürümü değişirse temizlik atlanır,
+        # asıl iptal/hata örtülmez
+        for sheet in self.book.worksheets:
+            try:
+                sheet.close()
+                sheet._writer.cleanup()
+            except Exception as e:
+                print(f"Excel geçici dosyası silinemedi: {e}")
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    @property
+    def started(self):
+        return self.writer is not None
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Şema ilk parçadan alınır; sonraki parçalar aynı şemaya zorlanır
+        schema = self.writer.schema if self.writer is not None else None
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+    def discard(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+_WRITERS = {FORMAT_CSV: _CsvWriter, FORMAT_XLSX: _XlsxWriter, FORMAT_PARQUET: _ParquetWriter}
+
+
+def _empty_frame(pd, columns):
+    return pd.DataFrame({
+        heading: pd.Series(dtype="datetime64[ns]" if kind == "datetime" else kind)
+        for _, heading, kind in columns
+    })
+
+
+def export(conn, dataset, file_format, path, start_date=None, end_exclusive=None):
+    """Veriyi dosyaya aktarır ve yazılan satır sayısını döndürür.
+
+    dataset: DATASET_SALES, DATASET_LEDGER veya DATASET_PRODUCTS
+    file_format: FORMAT_CSV, FORMAT_XLSX veya FORMAT_PARQUET
+    start_date / end_exclusive: yarı açık tarih aralığı (ürünlerde kullanılmaz)
+    """
+    import pandas as pd
+
+    columns = COLUMNS[dataset]
+    dtypes = {name: kind for name, _, kind in columns if kind != "datetime"}
+    dates = {name: {"format": "ISO8601"} for name, _, kind in columns if kind == "datetime"}
+    headings = {name: heading for name, heading, _ in columns}
+
+    task = tasks.current_task()
+    queries = _queries(conn, dataset, start_date, end_exclusive)
+    total = sum(conn.execute(count_sql, params).fetchone()[0] for count_sql, _, params in queries)
+
+    tmp_path = path + ".tmp"
+    writer = _WRITERS[file_format](tmp_path)
+    done = 0
+    try:
+        for _, sql, params in queries:
+            for chunk in pd.read_sql(sql, conn, params=params, chunksize=CHUNK_SIZE,
+                                     dtype=dtypes, parse_dates=dates):
+                if chunk.empty:
+                    continue
+                writer.write(chunk.rename(columns=headings))
+                done += len(chunk)
+                if task is not None:
+                    task.check_cancelled()
+                    task.progress(done, total, f"{done} / {total} satır aktarıldı")
+        if not writer.started:
+            writer.write(_empty_frame(pd, columns))  # Boş aralıkta da başlıklı dosya oluşur
+        writer.close()
+    except BaseException:
+        writer.discard()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return done
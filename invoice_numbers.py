@@ -0,0 +1,154 @@
+"""Sıralı fatura numaraları.
+
+Numara, satışın yazma işlemi içinde invoice_sequences tablosundaki sayaçtan
+alınır; işlem geri alınırsa sayaç da geri alınır, böylece numara atlanmaz ve
+iki satış aynı numarayı alamaz. Her kasa ayarlardan kendi seri kodunu
+kullanır (ör. TR1, TR2); sayaç seri ve yıl başına ayrı tutulduğundan kasalar
+birbirinin numara aralığına karışmaz. sales.invoice_number benzersiz
+indekslidir; yeniden basım aramaları tek indeks okumasıdır.
+
+Kasada satışlar önce yerel satış günlüğüne (journal.py) yazıldığından
+numarayı günlük ayırır. Yerel sayaç ancak seri yalnızca bu kasada
+kullanılıyorsa güvenlidir: kasa açılışta ve seri değişince serisini
+invoice_series_owners tablosunda kendi kasa kimliğine ayırır (claim_series);
+seri başka kasanınsa satış yapılamaz. Günlük uygulanırken record_used() ile DB
+sayacı ileri alınır.
+
+Biçim: SERİ-YIL-SIRA, ör. TR1-2026-000042
+"""
+import re
+from datetime import datetime
+
+DEFAULT_SERIES = "TR"
+SERIES_PATTERN = re.compile(r"^[A-Z0-9]{1,6}$")
+SEQUENCE_DIGITS = 6
+
+
+class SeriesInUseError(Exception):
+    """Fatura serisi başka bir kasaya ayrılmış (veya bu kasaya henüz ayrılamamış)."""
+
+
+def create_sequence_schema(conn):
+    """Sayaç tablosunu ve benzersiz fatura numarası indeksini oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS invoice_sequences (
+        series TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        last_value INTEGER NOT NULL,
+        PRIMARY KEY (series, year)
+    ) WITHOUT ROWID""")
+
+    # Eski rastgele numaralarda çakışanlar olabilir: ilk satış numarasını korur,
+    # sonrakilere -2, -3 ... eki verilir (aksi halde benzersiz indeks kurulamaz)
+    duplicates = conn.execute("""SELECT id, invoice_number FROM sales WHERE invoice_number IN (
+        SELECT invoice_number FROM sales GROUP BY invoice_number HAVING COUNT(*) > 1
+    ) ORDER BY invoice_number, id""").fetchall()
+    seen = {}
+    for sale_id, number in duplicates:
+        seen[number] = seen.get(number, 0) + 1
+        if seen[number] > 1:
+            conn.execute("UPDATE sales SET invoice_number = ? WHERE id = ?", (f"{number}-{seen[number]}", sale_id))
+    if duplicates:
+        print(f"Çakışan {len(duplicates) - len(seen)} eski fatura numarası yeniden adlandırıldı.")
+
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_invoice_number ON sales(invoice_number)")
+
+
+def create_series_owner_schema(conn):
+    """Seri -> kasa sahipliği tablosunu oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS invoice_series_owners (
+        series TEXT PRIMARY KEY,
+        register_id TEXT NOT NULL,
+        claimed_at TEXT NOT NULL
+    ) WITHOUT ROWID""")
+
+
+def claim_series(conn, series, register_id):
+    """Seriyi bu kasaya ayırır; seri başka kasanınsa SeriesInUseError.
+
+    Kasanın daha önce ayırdığı seri bırakılır. Yazma işlemi içinde çağrılmalıdır.
+    """
+    row = conn.execute("SELECT register_id FROM invoice_series_owners WHERE series = ?", (series,)).fetchone()
+    if row and row[0] != register_id:
+        raise SeriesInUseError(
+            f"'{series}' fatura serisi başka bir kasada kullanılıyor; iki kasa aynı numaraları verirdi. "
+            "Ayarlar sekmesinden bu kasaya farklı bir seri kodu girin (ör. TR1, TR2)."
+        )
+    conn.execute("DELETE FROM invoice_series_owners WHERE register_id = ? AND series != ?", (register_id, series))
+    if row is None:
+        conn.execute(
+            "INSERT INTO invoice_series_owners (series, register_id, claimed_at) VALUES (?, ?, ?)",
+            (series, register_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+
+def normalize_series(series):
+    """Ayar metnini seri koduna çevirir; geçersizse ValueError."""
+    series = (series or "").strip().upper()
+    if not SERIES_PATTERN.match(series):
+        raise ValueError("Fatura seri kodu 1-6 karakter, yalnızca harf ve rakam olmalıdır.")
+    return series
+
+
+def format_number(series, year, value):
+    return f"{series}-{year}-{value:0{SEQUENCE_DIGITS}d}"
+
+
+def _last_used(conn, series, year):
+    # Sayaç satırı yoksa (yeni yıl, yedekten dönülmüş DB) mevcut satışlardan devam edilir
+    prefix = f"{series}-{year}-"
+    row = conn.execute(
+        "SELECT MAX(CAST(substr(invoice_number, ?) AS INTEGER)) FROM sales "
+        "WHERE invoice_number >= ? AND invoice_number < ?",
+        (len(prefix) + 1, prefix, prefix + "\uffff")
+    ).fetchone()
+    return row[0] or 0
+
+
+def parse_number(number):
+    """'TR1-2026-000042' -> ('TR1', 2026, 42); bu biçimde değilse None."""
+    series, _, rest = number.partition("-")
+    year, _, value = rest.partition("-")
+    if not (SERIES_PATTERN.match(series) and year.isdigit() and value.isdigit()):
+        return None
+    return series, int(year), int(value)
+
+
+def last_value(conn, series, year):
+    """Serinin yıl içinde kullanılan son sıra numarası."""
+    row = conn.execute(
+        "SELECT last_value FROM invoice_sequences WHERE series = ? AND year = ?", (series, year)
+    ).fetchone()
+    return max(row[0] if row else 0, _last_used(conn, series, year))
+
+
+def record_used(conn, number):
+    """Başka yerde (satış günlüğünde) ayrılmış numarayı sayaca işler; sayaç geri gitmez."""
+    parsed = parse_number(number)
+    if parsed is None:
+        return
+    conn.execute(
+        "INSERT INTO invoice_sequences (series, year, last_value) VALUES (?, ?, ?) "
+        "ON CONFLICT(series, year) DO UPDATE SET last_value = MAX(last_value, excluded.last_value)",
+        parsed
+    )
+
+
+def allocate(conn, series=DEFAULT_SERIES, when=None):
+    """Serinin bu yılki bir sonraki numarasını ayırır ve döndürür.
+
+    Satışın yazma işlemi (BEGIN IMMEDIATE) içinde çağrılmalıdır; yazma kilidi
+    sayacı okuma ile artırma arasında başka kasanın araya girmesini önler.
+    """
+    year = (when or datetime.now()).year
+    cursor = conn.execute(
+        "UPDATE invoice_sequences SET last_value = last_value + 1 WHERE series = ? AND year = ?", (series, year)
+    )
+    if cursor.rowcount == 0:
+        conn.execute(
+            "INSERT INTO invoice_sequences (series, year, last_value) VALUES (?, ?, ?)",
+            (series, year, _last_used(conn, series, year) + 1)
+        )
+    value = conn.execute(
+        "SELECT last_value FROM invoice_sequences WHERE series = ? AND year = ?", (series, year)
+    ).fetchone()[0]
+    return format_number(series, year, value)
@@ -0,0 +1,252 @@
+"""Arka planda PDF fatura üretimi.
+
+Satış işlemi faturayı beklemez: fatura bilgileri (JSON'a çevrilebilir bir
+sözlük) satışla aynı işlemde invoice_jobs tablosuna yazılır, PDF ise ayrı bir
+süreçte (ProcessPoolExecutor) ReportLab ile çizilir. Başarılı olunca kayıt
+silinir; başarısız çizimler artan aralıklarla yeniden denenir. Uygulama
+kapanırken bekleyen faturalar tabloda kalır ve bir sonraki açılışta işlenir,
+böylece hiçbir fatura sessizce kaybolmaz.
+"""
+import json
+import os
+import queue
+import webbrowser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from tkinter import messagebox
+
+import tasks
+
+# ReportLab için Türkçe karakter desteği
+# Lütfen bilgisayarınızda bir Türkçe font dosyası olduğundan emin olun
+FONT_PATH = "arial.ttf" # Eğer hata alırsanız, bu dosya adını kontrol edin!
+
+# Oturum içinde yeniden deneme aralıkları (ms); tükenince fatura bir sonraki açılışa kalır
+RETRY_DELAYS_MS = (2000, 10000, 60000, 300000)
+
+_font_name = None
+
+
+def register_font():
+    """Türkçe fontu (süreç başına bir kez) kaydeder ve kullanılacak font adını döndürür."""
+    global _font_name
+    if _font_name is None:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        try:
+            pdfmetrics.registerFont(TTFont('Turu', FONT_PATH))
+            _font_name = 'Turu'
+        except Exception:
+            print("ReportLab Türkçe Font Hatası: Arial.ttf bulunamadı. Varsayılan font kullanılacak.")
+            _font_name = 'Helvetica'
+    return _font_name
+
+
+def create_invoice_schema(conn):
+    """invoice_jobs tablosunu oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS invoice_jobs (
+        invoice_number TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at TEXT
+    )""")
+
+
+def build_payload(invoice_number, customer_name, sale_date, total_amount, cart, settings):
+    """Çizim sürecine gönderilecek fatura bilgilerini oluşturur."""
+    return {
+        "invoice_number": invoice_number,
+        "customer_name": customer_name,
+        "sale_date": sale_date,
+        "total_amount": total_amount,
+        "items": [{"name": item['name'], "qty": item['qty'], "price": item['price']} for item in cart.values()],
+        "company_name": settings['company_name'],
+        "pdf_dir": settings['pdf_save_path'],
+    }
+
+
+def enqueue_job(conn, payload):
+    """Faturayı kuyruğa yazar; satışın işlemi içinde çağrılır."""
+    conn.execute(
+        "INSERT OR REPLACE INTO invoice_jobs (invoice_number, payload, created_at) VALUES (?, ?, ?)",
+        (payload["invoice_number"], json.dumps(payload, ensure_ascii=False), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+
+
+def render_invoice(payload):
+    """ReportLab ile PDF faturayı çizer ve dosya yolunu döndürür (çizim sürecinde çalışır)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    font_name = register_font()
+    os.makedirs(payload["pdf_dir"], exist_ok=True)
+    pdf_path = os.path.join(payload["pdf_dir"], f"Fatura_{payload['invoice_number']}.pdf")
+    tmp_path = pdf_path + ".tmp"
+
+    c = canvas.Canvas(tmp_path, pagesize=A4)
+    width, height = A4
+
+    c.setFont(font_name, 20)
+    c.drawString(50, height - 50, payload["company_name"])
+
+    c.setFont(font_name, 12)
+    c.drawString(50, height - 80, "--- FATURA ---")
+    c.drawString(50, height - 100, f"Fatura No: {payload['invoice_number']}")
+    c.drawString(50, height - 120, f"Müşteri: {payload['customer_name']}")
+    c.drawString(50, height - 140, f"Tarih: {payload['sale_date'][:16]}")
+
+    # Tablo Başlıkları
+    y_pos = height - 180
+    c.setFont(font_name, 10)
+    c.drawString(50, y_pos, "Ürün Adı")
+    c.drawString(300, y_pos, "Adet")
+    c.drawString(380, y_pos, "Birim Fiyat (₺)")
+    c.drawString(500, y_pos, "Toplam (₺)")
+
+    c.line(40, y_pos - 5, width - 40, y_pos - 5)
+
+    # Ürün Listesi
+    y_pos -= 20
+    for item in payload["items"]:
+        c.drawString(50, y_pos, item['name'][:40])
+        c.drawString(300, y_pos, str(item['qty']))
+        c.drawString(380, y_pos, f"{item['price']:.2f}")
+        c.drawString(500, y_pos, f"{item['qty'] * item['price']:.2f}")
+        y_pos -= 15
+        if y_pos < 100: # Yeni Sayfa
+            c.showPage()
+            y_pos = height - 50
+            c.setFont(font_name, 10)
+
+    # Toplam
+    c.line(450, 70, 580, 70)
+    c.setFont(font_name, 14)
+    c.drawString(380, 50, "GENEL TOPLAM:")
+    c.drawString(500, 50, f"₺{payload['total_amount']:.2f}")
+
+    c.save()
+    # Yarım kalmış bir çizim, tamamlanmış fatura gibi görünmesin
+    os.replace(tmp_path, pdf_path)
+    return pdf_path
+
+
+class InvoiceRenderer:
+    """Faturaları çizim sürecine gönderir ve sonuçlarını Tk ana döngüsünde işler."""
+
+    POLL_MS = 100
+
+    def __init__(self, root):
+        self.root = root
+        self._pool = None
+        self._results = queue.Queue()
+        self._poll_id = None
+        self._pending = {}   # fatura no -> (payload, hazır olunca açılsın mı)
+        self._attempts = {}  # fatura no -> bu oturumdaki deneme sayısı
+
+    def _executor(self):
+        # Süreç havuzu ilk faturada başlatılır (açılışı yavaşlatmaz)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1)
+        return self._pool
+
+    def submit(self, payload, open_when_ready=True):
+        number = payload["invoice_number"]
+        if number in self._pending:
+            # Açılışta kuyruktan alınan fatura oturumda yeniden gönderildi: ikinci kez çizilmez
+            queued_payload, queued_open = self._pending[number]
+            self._pending[number] = (queued_payload, queued_open or open_when_ready)
+            return
+        self._pending[number] = (payload, open_when_ready)
+        self._start(number, payload)
+
+    def _start(self, number, payload):
+        try:
+            future = self._executor().submit(render_invoice, payload)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._pool = None
+            self._results.put((number, None, e))
+        else:
+            future.add_done_callback(
+                lambda f, n=number: self._results.put((n, None, f.exception()) if f.exception() else (n, f.result(), None))
+            )
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def resume_pending(self):
+        """Önceki oturumdan kalan faturaları (açmadan) yeniden kuyruğa alır."""
+        tasks.submit(
+            lambda conn: conn.execute("SELECT payload FROM invoice_jobs ORDER BY created_at").fetchall(),
+            on_done=lambda rows: [self.submit(json.loads(payload), open_when_ready=False) for (payload,) in rows],
+        )
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                number, pdf_path, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if error is None:
+                self._on_rendered(number, pdf_path)
+            else:
+                self._on_failed(number, error)
+        if self._pending:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def _on_rendered(self, number, pdf_path):
+        _, open_when_ready = self._pending.pop(number, (None, False))
+        self._attempts.pop(number, None)
+        tasks.submit(lambda conn: conn.execute("DELETE FROM invoice_jobs WHERE invoice_number = ?", (number,)), write=True)
+        if open_when_ready:
+            webbrowser.open(pdf_path)
+
+    def _on_failed(self, number, error):
+        if isinstance(error, BrokenProcessPool):
+            self._pool = None  # Çöken süreç havuzu bir sonraki denemede yeniden kurulur
+        attempts = self._attempts.get(number, 0) + 1
+        self._attempts[number] = attempts
+        tasks.submit(
+            lambda conn: conn.execute(
+                "UPDATE invoice_jobs SET attempts = attempts + 1, last_error = ? WHERE invoice_number = ?", (str(error), number)
+            ),
+            write=True,
+        )
+
+        payload, open_when_ready = self._pending.pop(number)
+        if attempts <= len(RETRY_DELAYS_MS):
+            self._pending[number] = (payload, open_when_ready)  # Yoklama sürsün
+            self.root.after(RETRY_DELAYS_MS[attempts - 1], lambda: self._start(number, payload))
+        else:
+            messagebox.showwarning(
+                "PDF Hatası",
+                f"Fatura {number} için PDF dosyası oluşturulamadı. Lütfen 'arial.ttf' dosyasının bulunduğundan ve "
+                f"ReportLab'ın doğru kurulduğundan emin olun: {error}\n"
+                "Fatura kuyrukta bekliyor; uygulama yeniden açıldığında tekrar denenecek."
+            )
+
+    def shutdown(self):
+        # Çizilmemiş faturalar invoice_jobs tablosunda kalır
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_renderer = None
+
+
+def init(root):
+    """Uygulama başlarken bir kez çağrılır; önceki oturumdan kalan faturaları işler."""
+    global _renderer
+    _renderer = InvoiceRenderer(root)
+    _renderer.resume_pending()
+    return _renderer
+
+
+def submit(payload, open_when_ready=True):
+    _renderer.submit(payload, open_when_ready)
+
+
+def shutdown():
+    if _renderer is not None:
+        _renderer.shutdown()
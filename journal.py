@@ -0,0 +1,350 @@
+"""Yerel satış günlüğü (write-behind).
+
+Kasada satış önce bu bilgisayardaki günlük dosyasına bir JSON satırı olarak
+eklenir ve fsync ile diske indirilir; kasiyer ana veritabanını (ağ paylaşımında
+olabilir) beklemeden onay alır. Arka plandaki boşaltıcı bekleyen satışları
+toplu halde, tek yazma işleminde veritabanına uygular ve uygulananları
+günlüğe "applied" satırıyla işaretler.
+
+Her kayıt bir UUID (entry["id"]) taşır ve satış sales.journal_id sütununa
+bu kimlikle yazılır; uygulama bu kimliğe göre idempotenttir. Commit ile
+işaretleme arasında çökülürse açılıştaki yeniden oynatma, numarası
+değiştirilerek kaydedilmiş olsa bile satışı atlar. Bekleyen satış
+kalmadığında dosya sıfırlanır.
+
+Stok, uygulama anında yalnızca yeterliyse düşülür. Kasadaki ön kontrol
+yalnızca bu kasanın bekleyen satışlarını bilir; başka kasa aynı son ürünleri
+sattıysa satış uygulanmaz, sale_conflicts tablosuna (stok çakışmaları) alınır
+ve kasiyere bildirilir. Çakışma, stok düzeltildikten sonra yeniden uygulanır
+ya da satış iptal edilir; hiçbir satış sessizce eksi stoğa yazılmaz.
+
+Fatura numarasını günlük, kasaya ayrılmış seriden (set_series) verir; seri
+ayrılmamışsa satış yapılamaz (bkz. invoice_numbers.claim_series). Numara
+uygulama anında yine de kullanılmış çıkarsa satış yeni numarayla kaydedilir;
+fatura çizimi ve bildirimler ApplyResult.invoice_number ile son numarayı kullanır.
+
+Kullanım:
+    journal.open_journal(apply_entry)   # açılışta, arayüz dışında
+    journal.replay()                    # önceki oturumdan kalanlar
+    journal.get_journal().set_series(seri)  # seri bu kasaya ayrılınca
+    journal.start(root, on_applied)     # ana pencere kurulunca
+    journal.record(entry)               # her satışta (ana iş parçacığı)
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import db
+import invoice_numbers
+import tasks
+
+JOURNAL_FILE = "satis_gunlugu.jsonl"
+
+# Boşaltıcı: bir işlemde en çok BATCH_SIZE satış; hata sonrası bekleme (ms) giderek artar
+BATCH_SIZE = 50
+FLUSH_MS = 200
+RETRY_MS = (1000, 5000, 15000, 30000)
+
+
+def create_journal_schema(conn):
+    """sales.journal_id sütununu ve benzersiz indeksini ekler (göç adımı)."""
+    if not any(row[1] == "journal_id" for row in conn.execute("PRAGMA table_info(sales)")):
+        conn.execute("ALTER TABLE sales ADD COLUMN journal_id TEXT")
+    # Yalnızca günlükten gelen satışlar kimlik taşır; eski satırlar indekse girmez
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_journal_id ON sales(journal_id) WHERE journal_id IS NOT NULL")
+
+
+def create_conflict_schema(conn):
+    """Uygulanamayan satışların tablosunu oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS sale_conflicts (
+        journal_id TEXT PRIMARY KEY,
+        invoice_number TEXT NOT NULL,
+        sale_date TEXT NOT NULL,
+        customer_id INTEGER,
+        total_amount REAL,
+        entry TEXT NOT NULL,
+        reason TEXT NOT NULL,
+        detected_at TEXT NOT NULL
+    )""")
+
+
+class SaleConflict(Exception):
+    """apply_entry satışı uygulayamadı (ör. stok yetersiz); satış çakışma listesine alınır."""
+
+
+def entry_key(entry):
+    # Kimliksiz kayıtlar bu sürümden önce yazılmış günlüklerden gelir
+    return entry.get("id") or entry["invoice_number"]
+
+
+class ApplyResult:
+    """Günlükteki bir satışın uygulanma sonucu.
+
+    conflict doluysa satış uygulanmamış, çakışma listesine alınmıştır (sebep
+    metni); ikisi de None ise satış daha önce işlenmiştir (yeniden oynatma).
+    invoice_number satışın veritabanındaki son numarasıdır.
+    """
+
+    def __init__(self, entry, sale_id=None, invoice_number=None, conflict=None):
+        self.entry = entry
+        self.sale_id = sale_id
+        self.invoice_number = invoice_number or entry["invoice_number"]
+        self.conflict = conflict
+
+    @property
+    def renumbered(self):
+        return self.invoice_number != self.entry["invoice_number"]
+
+    def invoice_payload(self):
+        return dict(self.entry["invoice"], invoice_number=self.invoice_number)
+
+
+class SaleJournal:
+    """Bekleyen satışları tutan, yalnızca sona eklenen günlük dosyası."""
+
+    def __init__(self, path, apply_entry):
+        self.path = path
+        self.apply_entry = apply_entry   # apply_entry(conn, entry) -> (sale_id, fatura no) veya None
+        self._lock = threading.Lock()
+        self._pending = {}               # kayıt kimliği -> kayıt (ekleme sırasıyla)
+        self._last_numbers = {}          # (seri, yıl) -> son ayrılan sıra
+        self.series = None               # Bu kasaya ayrılmış fatura serisi
+        self._series_error = "Fatura serisi henüz bu kasaya ayrılmadı."
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Yazılırken kesilmiş son satır; fsync edilmediği için onaylanmamıştı
+                if record["op"] == "sale":
+                    entry = record["entry"]
+                    self._pending[entry_key(entry)] = entry
+                    self._remember_number(entry["invoice_number"])
+                elif record["op"] == "applied":
+                    for key in record.get("ids", record.get("invoice_numbers", ())):
+                        self._pending.pop(key, None)
+
+    def _remember_number(self, number):
+        parsed = invoice_numbers.parse_number(number)
+        if parsed:
+            series, year, value = parsed
+            self._last_numbers[(series, year)] = max(self._last_numbers.get((series, year), 0), value)
+
+    def _append(self, records, truncate=False):
+        with open(self.path, "w" if truncate else "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def set_series(self, series, error=None):
+        """claim_series sonrası kasanın serisini ayarlar; series None ise error satışta gösterilir."""
+        with self._lock:
+            self.series = series
+            if error:
+                self._series_error = error
+
+    def next_invoice_number(self, year):
+        """Kasanın serisinden bir sonraki numarayı ayırır (ana iş parçacığı).
+
+        Seri bu kasaya ayrılmamışsa invoice_numbers.SeriesInUseError.
+        """
+        with self._lock:
+            if self.series is None:
+                raise invoice_numbers.SeriesInUseError(self._series_error)
+            series = self.series
+            key = (series, year)
+            if key not in self._last_numbers:
+                # İlk kullanımda DB'deki sayaçtan devam edilir (yalnızca okuma)
+                self._last_numbers[key] = invoice_numbers.last_value(db.get_read_connection(), series, year)
+            self._last_numbers[key] += 1
+            return invoice_numbers.format_number(series, year, self._last_numbers[key])
+
+    def append(self, entry):
+        """Satışı kalıcı olarak günlüğe yazar; dönüşte satış onaylanmış sayılır. Diske yazılamazsa OSError."""
+        with self._lock:
+            self._append([{"op": "sale", "entry": entry}])
+            self._pending[entry_key(entry)] = entry
+
+    def pending(self, limit=None):
+        with self._lock:
+            entries = list(self._pending.values())
+        return entries[:limit] if limit else entries
+
+    def pending_quantities(self):
+        """Henüz DB'ye işlenmemiş satışlardaki ürün adetleri {ürün id: adet}."""
+        quantities = {}
+        for entry in self.pending():
+            for item in entry["items"]:
+                quantities[item["id"]] = quantities.get(item["id"], 0) + item["qty"]
+        return quantities
+
+    def _apply_one(self, conn, entry):
+        # Çakışan satışın yarım kalan yazmaları geri alınır, partinin geri kalanı uygulanır
+        conn.execute("SAVEPOINT journal_entry")
+        try:
+            applied = self.apply_entry(conn, entry)
+        except SaleConflict as e:
+            conn.execute("ROLLBACK TO journal_entry")
+            conn.execute("RELEASE journal_entry")
+            conn.execute(
+                "INSERT OR REPLACE INTO sale_conflicts (journal_id, invoice_number, sale_date, customer_id, "
+                "total_amount, entry, reason, detected_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry_key(entry), entry["invoice_number"], entry["sale_date"], entry["customer_id"],
+                 entry["total_amount"], json.dumps(entry, ensure_ascii=False), str(e),
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return ApplyResult(entry, conflict=str(e))
+        conn.execute("RELEASE journal_entry")
+        return ApplyResult(entry) if applied is None else ApplyResult(entry, *applied)
+
+    def apply_batch(self, conn, entries):
+        """Satışları çağıranın işlemi içinde uygular; [ApplyResult, ...] döndürür."""
+        results = []
+        for entry in entries:
+            if conn.execute("SELECT 1 FROM sale_conflicts WHERE journal_id = ?", (entry_key(entry),)).fetchone():
+                results.append(ApplyResult(entry))  # Çakışma listesine daha önce alınmış (yeniden oynatma)
+            else:
+                results.append(self._apply_one(conn, entry))
+        return results
+
+    def retry_conflict(self, conn, journal_id):
+        """Çakışma listesindeki satışı yeniden uygular (yazma işlemi içinde); ApplyResult döndürür."""
+        row = conn.execute("SELECT entry FROM sale_conflicts WHERE journal_id = ?", (journal_id,)).fetchone()
+        if row is None:
+            raise ValueError("Çakışma kaydı bulunamadı; başka bir kasada çözülmüş olabilir.")
+        result = self._apply_one(conn, json.loads(row[0]))
+        if result.conflict is None:
+            conn.execute("DELETE FROM sale_conflicts WHERE journal_id = ?", (journal_id,))
+        return result
+
+    def mark_applied(self, results):
+        """Commit edilmiş satışları işaretler; bekleyen kalmadıysa dosyayı sıfırlar."""
+        keys = [entry_key(result.entry) for result in results]
+        with self._lock:
+            for key in keys:
+                self._pending.pop(key, None)
+            if self._pending:
+                self._append([{"op": "applied", "ids": keys}])
+            else:
+                self._append([], truncate=True)
+
+
+class JournalFlusher:
+    """Bekleyen satışları arka plan yazma görevleriyle veritabanına aktarır."""
+
+    def __init__(self, root, journal, on_applied):
+        self.root = root
+        self.journal = journal
+        self.on_applied = on_applied     # on_applied([ApplyResult, ...]) ana iş parçacığında
+        self._after_id = None
+        self._running = False
+        self._failures = 0
+        self._stopped = False
+
+    def schedule(self, delay_ms=FLUSH_MS):
+        if self._stopped or self._running or self._after_id is not None:
+            return
+        self._after_id = self.root.after(delay_ms, self._flush)
+
+    def _flush(self):
+        self._after_id = None
+        batch = self.journal.pending(BATCH_SIZE)
+        if not batch:
+            return
+        self._running = True
+        tasks.submit(self.journal.apply_batch, batch, write=True, on_done=self._on_done, on_error=self._on_error)
+
+    def _on_done(self, results):
+        self._running = False
+        self._failures = 0
+        self.journal.mark_applied(results)
+        self.on_applied(results)
+        if self.journal.pending(1):
+            self.schedule(0)
+
+    def _on_error(self, error):
+        # Satışlar günlükte güvende; veritabanına ulaşılınca yeniden denenir
+        self._running = False
+        delay = RETRY_MS[min(self._failures, len(RETRY_MS) - 1)]
+        self._failures += 1
+        print(f"Satış günlüğü veritabanına aktarılamadı ({len(self.journal.pending())} bekleyen), "
+              f"{delay // 1000} sn sonra yeniden denenecek: {error}")
+        self.schedule(delay)
+
+    def stop(self):
+        self._stopped = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+
+_journal = None
+_flusher = None
+
+
+def open_journal(apply_entry, path=JOURNAL_FILE):
+    """Günlüğü açar ve bekleyen kayıtları yükler (açılışta, arayüz dışında çağrılabilir)."""
+    global _journal
+    _journal = SaleJournal(path, apply_entry)
+    return _journal
+
+
+def replay():
+    """Önceki oturumdan kalan satışları uygular; uygulanan satış sayısını döndürür."""
+    applied = 0
+    while True:
+        batch = _journal.pending(BATCH_SIZE)
+        if not batch:
+            return applied
+        results = db.run_write(_journal.apply_batch, batch)
+        _journal.mark_applied(results)
+        applied += sum(1 for result in results if result.sale_id is not None)
+
+
+def start(root, on_applied):
+    """Boşaltıcıyı başlatır; replay() sonrasında eklenenler de aktarılır."""
+    global _flusher
+    _flusher = JournalFlusher(root, _journal, on_applied)
+    _flusher.schedule()
+    return _flusher
+
+
+def conflicts(conn):
+    """Stok çakışması listesi [(kimlik, fatura no, tarih, müşteri, tutar, sebep), ...]."""
+    return conn.execute(
+        "SELECT sc.journal_id, sc.invoice_number, sc.sale_date, COALESCE(c.name, '-'), sc.total_amount, sc.reason "
+        "FROM sale_conflicts sc LEFT JOIN customers c ON c.id = sc.customer_id ORDER BY sc.sale_date"
+    ).fetchall()
+
+
+def conflict_count(conn):
+    return conn.execute("SELECT COUNT(*) FROM sale_conflicts").fetchone()[0]
+
+
+def discard_conflict(conn, journal_id):
+    """Çakışan satışı iptal eder: satış hiç kaydedilmemiş sayılır (yazma işlemi içinde)."""
+    conn.execute("DELETE FROM sale_conflicts WHERE journal_id = ?", (journal_id,))
+
+
+def get_journal():
+    return _journal
+
+
+def record(entry):
+    """Satışı günlüğe yazar ve kısa süre sonra veritabanına aktarılmak üzere planlar."""
+    _journal.append(entry)
+    if _flusher is not None:
+        _flusher.schedule()
+
+
+def stop():
+    # Aktarılmamış satışlar günlükte kalır, bir sonraki açılışta uygulanır
+    if _flusher is not None:
+        _flusher.stop()
@@ -0,0 +1,148 @@
+"""Cari hesap hareketleri ve yürüyen bakiye.
+
+Hareketler sayfa sayfa, anahtar (keyset) sayfalamayla okunur: sayfa sınırı
+(transaction_date, id) çiftidir ve idx_ledger_customer_date indeksinde
+doğrudan konumlanılır, böylece on binlerce hareketi olan müşteride de sayfa
+açmak yalnızca o sayfanın satırlarını okur. Cari ekran en yeni sayfayla açılır.
+
+Her satırın yürüyen bakiyesi SQL'de SUM() OVER (ORDER BY transaction_date, id)
+ile hesaplanır; sayfanın açılış bakiyesi sayfadaki en eski hareketten önceki
+hareketlerin toplamıdır ve bilinen bakiyeden geriye doğru bulunur (bkz.
+balance_before).
+
+Bakiye işareti customers.balance ile aynıdır: Tahsilat bakiyeyi artırır,
+Satış ve Borç azaltır, arşiv devir hareketi (Devir) işaretli tutarıyla eklenir.
+Negatif bakiye müşterinin bize borçlu olduğunu gösterir.
+"""
+from archive import CARRY_FORWARD_TYPE
+
+PAGE_SIZE = 200
+
+# Hareketin bakiyeye etkisi
+SIGNED_AMOUNT = f"(CASE WHEN type IN ('Tahsilat', '{CARRY_FORWARD_TYPE}') THEN amount ELSE -amount END)"
+
+_COLUMNS = "id, transaction_date, type, description, amount"
+
+
+class LedgerPage:
+    """Bir sayfa hareket: rows en yeniden eskiye (id, tarih, tip, açıklama, tutar, bakiye)."""
+
+    def __init__(self, rows, has_older, has_newer):
+        self.rows = rows
+        self.has_older = has_older
+        self.has_newer = has_newer
+
+    @property
+    def oldest_key(self):
+        return (self.rows[-1][1], self.rows[-1][0]) if self.rows else None
+
+    @property
+    def newest_key(self):
+        return (self.rows[0][1], self.rows[0][0]) if self.rows else None
+
+
+def balance_before(conn, customer_id, key):
+    """Müşterinin (tarih, id) anahtarından önceki hareketlerinin bakiyeye toplam etkisi.
+
+    Geçmişin tamamı toplanmaz: bilinen bir bakiyeden anahtar ve sonrasındaki
+    hareketler çıkarılır, böylece maliyet sayfanın ne kadar geride olduğuyla
+    sınırlı kalır. Kontrol noktası (reconcile.py) varsa o kullanılır; noktadan
+    sonra eklenen hareketler birincil anahtarda kısa bir aralıktır. Nokta yoksa
+    customers.balance kullanılır; bakiyesi hareketlerle uyuşmadığı bilinen
+    (balance_drift) müşteride tüm hareketler toplanır.
+    """
+    checkpoint = conn.execute(
+        "SELECT ledger_id, balance FROM balance_checkpoints WHERE customer_id = ?", (customer_id,)
+    ).fetchone()
+    if checkpoint is not None:
+        ledger_id, balance = checkpoint
+        # NOT INDEXED: noktadan sonrası müşteri indeksinin tamamı değil, id aralığı olarak okunsun
+        return conn.execute(
+            f"""SELECT ?
+                - (SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM ledger_transactions
+                   WHERE customer_id = ? AND (transaction_date, id) >= (?, ?) AND id <= ?)
+                + (SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM ledger_transactions NOT INDEXED
+                   WHERE id > ? AND customer_id = ? AND (transaction_date, id) < (?, ?))""",
+            (balance, customer_id, *key, ledger_id, ledger_id, customer_id, *key)
+        ).fetchone()[0]
+
+    drifted = conn.execute("SELECT 1 FROM balance_drift WHERE customer_id = ?", (customer_id,)).fetchone()
+    if drifted is not None:
+        return conn.execute(
+            f"SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM ledger_transactions "
+            "WHERE customer_id = ? AND (transaction_date, id) < (?, ?)",
+            (customer_id, *key)
+        ).fetchone()[0]
+    return conn.execute(
+        f"""SELECT COALESCE(balance, 0) - (SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM ledger_transactions
+               WHERE customer_id = ? AND (transaction_date, id) >= (?, ?))
+        FROM customers WHERE id = ?""",
+        (customer_id, *key, customer_id)
+    ).fetchone()[0]
+
+
+def page(conn, customer_id, before=None, after=None, limit=PAGE_SIZE):
+    """Bir sayfa hareket döndürür.
+
+    Parametresiz çağrı en yeni sayfayı verir; before=sayfa.oldest_key daha
+    eski, after=sayfa.newest_key daha yeni sayfayı getirir.
+    """
+    if after is not None:
+        # Daha yeni sayfa: anahtardan sonraki ilk limit hareket
+        condition, order, params = "AND (transaction_date, id) > (?, ?)", "ASC", after
+    elif before is not None:
+        condition, order, params = "AND (transaction_date, id) < (?, ?)", "DESC", before
+    else:
+        condition, order, params = "", "DESC", ()
+
+    rows = conn.execute(
+        f"""SELECT {_COLUMNS}, signed, SUM(signed) OVER (ORDER BY transaction_date, id) AS running
+        FROM (SELECT {_COLUMNS}, {SIGNED_AMOUNT} AS signed FROM ledger_transactions
+              WHERE customer_id = ? {condition}
+              ORDER BY transaction_date {order}, id {order} LIMIT ?)
+        ORDER BY transaction_date DESC, id DESC""",
+        (customer_id, *params, limit + 1)
+    ).fetchall()
+
+    # Fazladan okunan satır yalnızca sonraki sayfanın varlığını gösterir
+    more = len(rows) > limit
+    if more:
+        rows = rows[1:] if after is not None else rows[:limit]
+    if not rows:
+        return LedgerPage([], has_older=after is not None, has_newer=before is not None)
+
+    if after is not None:
+        has_older, has_newer = True, more
+    else:
+        has_older, has_newer = more, before is not None
+
+    # Sayfanın en eski satırının bakiyesi, ondan önceki hareketlerin toplamı
+    # üzerine kendi tutarıdır; diğer satırlar pencere toplamıyla ondan yürür
+    oldest_id, oldest_date, _, _, _, oldest_signed, oldest_running = rows[-1]
+    opening = balance_before(conn, customer_id, (oldest_date, oldest_id))
+    base = opening + oldest_signed - oldest_running
+    return LedgerPage(
+        [(row_id, date, t_type, desc, amount, round(base + running, 2))
+         for row_id, date, t_type, desc, amount, _, running in rows],
+        has_older, has_newer
+    )
+
+
+def has_transactions(conn, customer_id):
+    return conn.execute(
+        "SELECT 1 FROM ledger_transactions WHERE customer_id = ? LIMIT 1", (customer_id,)
+    ).fetchone() is not None
+
+
+def statement(conn, customer_id):
+    """Ekstre için tüm hareketleri eskiden yeniye (imleç olarak) döndürür.
+
+    Satırlar (tarih, tip, açıklama, tutar, bakiyeye etkisi, yürüyen bakiye) biçimindedir.
+    """
+    return conn.execute(
+        f"""SELECT transaction_date, type, description, amount, {SIGNED_AMOUNT},
+               ROUND(SUM({SIGNED_AMOUNT}) OVER (ORDER BY transaction_date, id), 2) AS balance
+        FROM ledger_transactions WHERE customer_id = ?
+        ORDER BY transaction_date, id""",
+        (customer_id,)
+    )
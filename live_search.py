@@ -0,0 +1,135 @@
+"""Yazarken arama: erteleme (debounce) + arka plan sorgusu + iptal.
+
+Tuşa her basışta sorgu çalıştırmak yerine giriş delay_ms kadar beklenir; sorgu
+ayrı bir iş parçacığında kendi okuma bağlantısıyla çalışır. Yeni bir tuş
+geldiğinde çalışan eski sorgu sqlite3.Connection.interrupt() ile kesilir ve
+yalnızca en son aramanın sonucu arayüze uygulanır. Tkinter iş parçacığı
+güvenli olmadığından sonuçlar after() ile yoklanan bir kuyrukla ana iş
+parçacığına aktarılır.
+"""
+import queue
+import sqlite3
+import threading
+
+import db
+
+
+class LiveSearch:
+    """run(conn, term) arka planda çalışır; dönen değer apply(result) ile arayüze uygulanır."""
+
+    POLL_MS = 25
+
+    def __init__(self, widget, run, apply, delay_ms=200, on_error=None):
+        self.widget = widget
+        self.run = run
+        self.apply = apply
+        self.delay_ms = delay_ms
+        self.on_error = on_error
+
+        self._after_id = None
+        self._poll_id = None
+        self._generation = 0
+        self._last_term = None
+
+        self._lock = threading.Condition()
+        self._pending = None        # (generation, term)
+        self._running_conn = None
+        self._results = queue.Queue()
+        self._thread = None
+
+    def submit(self, term):
+        """Yeni arama terimi (ör. <KeyRelease> içinden). Değişmeyen terim yok sayılır."""
+        if term == self._last_term:
+            return
+        self._last_term = term
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.delay_ms, self._fire)
+
+    def reset(self, term=None):
+        """Terimi dışarıdan (senkron yükleme sonrası) bilinen değere eşitler."""
+        self.cancel()
+        self._last_term = term
+
+    def cancel(self):
+        """Bekleyen ve çalışan aramayı iptal eder."""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+            if self._running_conn is not None:
+                self._running_conn.interrupt()
+
+    def _fire(self):
+        self._after_id = None
+        with self._lock:
+            self._generation += 1
+            self._pending = (self._generation, self._last_term)
+            if self._running_conn is not None:
+                # Eski sorgu artık gereksiz: SQLite'ı bir sonraki adımda durdur
+                self._running_conn.interrupt()
+            self._lock.notify()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="LiveSearch", daemon=True)
+            self._thread.start()
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while self._pending is None:
+                    self._lock.wait()
+                generation, term = self._pending
+                self._pending = None
+                conn = db.get_read_connection()
+                self._running_conn = conn
+            result, error = self._run_once(conn, term, generation)
+            with self._lock:
+                # Sonuç, iş parçacığı boşta görünmeden önce kuyruğa girer (_poll buna güvenir)
+                self._results.put((generation, result, error))
+                self._running_conn = None
+
+    def _run_once(self, conn, term, generation):
+        for _ in range(2):
+            try:
+                return self.run(conn, term), None
+            except sqlite3.OperationalError as e:
+                if "interrupt" not in str(e):
+                    return None, e
+                # Kesme bir önceki sorgu için gönderilmiş olabilir: bu iş hâlâ güncelse bir kez tekrarla
+                with self._lock:
+                    if generation != self._generation:
+                        return None, None
+            except Exception as e:
+                return None, e
+        return None, None
+
+    def _poll(self):
+        self._poll_id = None
+        with self._lock:
+            busy = self._pending is not None or self._running_conn is not None
+
+        latest = None
+        while True:
+            try:
+                latest = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+        if latest is not None:
+            generation, result, error = latest
+            if generation == self._generation:
+                if error is not None:
+                    if self.on_error:
+                        self.on_error(error)
+                elif result is not None:
+                    self.apply(result)
+
+        if busy:
+            try:
+                self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+            except Exception:
+                pass  # Pencere kapanmış olabilir
@@ -1,32 +1,46 @@
+import startup # Açılış süresi ölçümü ilk içe aktarmadan önce başlar
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
 import os
 import json
-from datetime import datetime
-import random 
-import pandas as pd
-# Gelişmiş PDF için ReportLab
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import calendar
+import uuid
+import copy
+import multiprocessing
+from datetime import datetime, timedelta
+# ReportLab (PDF) ve pandas ilk kullanıldıkları yerde içe aktarılır; açılışı yavaşlatırlar
 from ttkthemes import ThemedTk 
 
+import db
+import archive
+import exports
+import backup
+import tasks
+import invoices
+import invoice_numbers
+import journal
+import ledger
+import maintenance
+import summaries
+import events
+import migrations
+import pdf_export
+import reconcile
+import reports
+import search
+import barcodes
+from virtual_grid import GridSource, VirtualGrid
+from live_search import LiveSearch
+
+startup.check_import_budget()
+
 # --- 0. Sabitler ve Güvenilir Veritabanı Fonksiyonları ---
 
-DB_NAME = "stok_takip.db"
 SETTINGS_FILE = "settings.json"
+# Kasada bu uzunluğa kadar olan sayılar ürün ID'si, daha uzunları barkod kabul edilir
+MAX_PRODUCT_ID_DIGITS = 7
 
-# ReportLab için Türkçe karakter desteği
-try:
-    # Lütfen bilgisayarınızda bir Türkçe font dosyası olduğundan emin olun
-    FONT_PATH = "arial.ttf" # Eğer hata alırsanız, bu dosya adını kontrol edin!
-    pdfmetrics.registerFont(TTFont('Turu', FONT_PATH))
-    FONT_NAME = 'Turu'
-except:
-    print("ReportLab Türkçe Font Hatası: Arial.ttf bulunamadı. Varsayılan font kullanılacak.")
-    FONT_NAME = 'Helvetica'
 
 # Hata Düzeltme Fonksiyonu: Fiyat formatlama sorununu çözer.
 def clean_numeric_input(value):
@@ -50,44 +64,15 @@ def clean_numeric_input(value):
         return 0.0
 
 
-def get_db_connection():
-    """SQLite bağlantısını döndürür."""
-    try:
-        return sqlite3.connect(DB_NAME)
-    except sqlite3.Error as e:
-        messagebox.showerror("Veritabanı Bağlantı Hatası", f"Veritabanına bağlanılamadı: {e}")
-        raise
-
 def setup_database():
-    """Veritabanını ve gerekli tabloları oluşturur ve ŞEMA'yı günceller."""
-    conn = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    """Bekleyen şema göçlerini uygular ve boş veritabanına örnek veri ekler.
 
-        # TÜM GEREKLİ TABLOLARIN OLUŞTURULMASI
-        # purchase_price'ın burada olduğundan emin olun
-        cursor.execute("""CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, stock_quantity INTEGER DEFAULT 0,
-            sale_price REAL DEFAULT 0.0, low_stock_threshold INTEGER DEFAULT 10, purchase_price REAL DEFAULT 0.0 
-        )""")
-        cursor.execute("""CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT DEFAULT 'Perakende', balance REAL DEFAULT 0.0
-        )""")
-        cursor.execute("""CREATE TABLE IF NOT EXISTS sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, invoice_number TEXT NOT NULL, customer_id INTEGER, sale_date TEXT, total_amount REAL
-        )""")
-        cursor.execute("""CREATE TABLE IF NOT EXISTS ledger_transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id INTEGER, type TEXT, amount REAL, transaction_date TEXT, description TEXT
-        )""")
-        
-        # KRİTİK DÜZELTME: Eski DB'lerde eksik olan sütunu otomatik olarak ekle
-        try:
-            cursor.execute("SELECT purchase_price FROM products LIMIT 1")
-        except sqlite3.OperationalError:
-            # Sütun eksikse ekle (ALTER TABLE)
-            cursor.execute("ALTER TABLE products ADD COLUMN purchase_price REAL DEFAULT 0.0")
-            print("Veritabanı şeması güncellendi: 'purchase_price' sütunu eklendi.")
+    Açılışta arka plan iş parçacığında çalışır; hatalar çağırana bırakılır.
+    """
+    migrations.migrate()
+
+    with db.transaction(immediate=True) as conn:
+        cursor = conn.cursor()
 
         # Örnek Veri Ekleme (UX için)
         if cursor.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0:
@@ -96,18 +81,43 @@ def setup_database():
                 ("Kablosuz Mouse", 8, 99.90, 20, 45.00),
             ]
             cursor.executemany("INSERT INTO products (name, stock_quantity, sale_price, low_stock_threshold, purchase_price) VALUES (?, ?, ?, ?, ?)", sample_products)
-        
+    
         if cursor.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == 0:
             cursor.execute("INSERT INTO customers (id, name, type) VALUES (?, ?, ?)", (1, "Perakende Müşteri", "Perakende"))
-            
-        conn.commit()
 
-    except sqlite3.Error as e:
-        messagebox.showerror("KRİTİK Veritabanı Hatası", f"Veritabanı kurulumu/güncellemesi başarısız oldu: {e}")
-        raise
-    finally:
-        if conn:
-            conn.close()
+
+def ensure_register_id(settings):
+    """Bu kasanın kalıcı kimliği; ilk açılışta üretilip ayarlara yazılır."""
+    if not settings.get("register_id"):
+        settings["register_id"] = uuid.uuid4().hex
+        save_settings(settings)
+    return settings["register_id"]
+
+def claim_invoice_series(conn, series, register_id):
+    """Seriyi bu kasaya ayırır ve günlüğün numara vermesine izin verir (yazma işlemi içinde)."""
+    invoice_numbers.claim_series(conn, series, register_id)
+    journal.get_journal().set_series(series)
+
+def open_sale_journal(settings):
+    """Satış günlüğünü açar; önceki oturumda veritabanına aktarılamamış satışları uygular."""
+    journal.open_journal(record_sale)
+    replayed = journal.replay()
+    if replayed:
+        print(f"Satış günlüğünden {replayed} satış veritabanına aktarıldı.")
+    series = settings.get("invoice_series", invoice_numbers.DEFAULT_SERIES)
+    try:
+        db.run_write(claim_invoice_series, series, ensure_register_id(settings))
+    except invoice_numbers.SeriesInUseError as e:
+        # Uygulama açılır; seri düzeltilene kadar satış yapılamaz
+        journal.get_journal().set_series(None, str(e))
+        print(f"Fatura serisi ayrılamadı: {e}")
+
+
+def warm_database_cache():
+    """Sık okunan tablo ve indeks sayfalarını açılışta bir kez okuyarak işletim sistemi önbelleğine alır."""
+    conn = db.get_read_connection()
+    for table in ("products", "customers", "barcodes", "products_fts", "daily_sales", "summary_totals"):
+        conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
 
 # ... (Geri kalan tüm sınıflar ve fonksiyonlar aynı kalacak) ...
 # Sadece ProductTab ve SalesTab içindeki önemli kısımları tekrardan ekliyorum.
@@ -122,20 +132,38 @@ def save_settings(settings):
     with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
         json.dump(settings, f, indent=4, ensure_ascii=False)
 
-def generate_invoice_number():
-    date_str = datetime.now().strftime("%Y%m%d")
-    random_num = random.randint(10000, 99999)
-    return f"TR-{date_str}-{random_num}"
+def one_month_ago(now=None):
+    """Bir ay önceki tarih; kısa aylarda ayın son gününe yuvarlanır (31 Mart -> 28/29 Şubat)."""
+    now = now or datetime.now()
+    year, month = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+    return now.replace(year=year, month=month, day=min(now.day, calendar.monthrange(year, month)[1]))
+
+def open_pdf(pdf_path):
+    """Arka planda hazırlanan PDF'i varsayılan görüntüleyicide açar."""
+    import webbrowser
+    webbrowser.open(pdf_path)
 
 
 # --- 1. Dashboard Modülü (Değişiklik Yok) ---
 
 class DashboardTab(ttk.Frame):
     """Kontrol Paneli Sekmesi."""
-    def __init__(self, master):
+    def __init__(self, master, stats=None):
         super().__init__(master, padding="15")
         self.pack(expand=True, fill="both")
+        self._preloaded_stats = stats  # Açılışta giriş ekranı sürerken okunmuş veriler
         self.create_widgets()
+        self._dirty = events.DirtyFlag(self, self.load_stats)
+        events.subscribe((events.PRODUCT, events.CUSTOMER, events.SALE, events.LEDGER), lambda change: self._dirty.mark())
+
+    def on_shown(self):
+        if self._preloaded_stats is not None:
+            self._apply_stats(self._preloaded_stats)
+            self._preloaded_stats = None
+            return
+        # Kartlar özet satırlardan okunur; başka kasaların satışları da görünsün diye her gösterimde yenilenir
+        self._dirty.dirty = True
+        self._dirty.flush()
         
     def create_widgets(self):
         metrics_frame = ttk.Frame(self)
@@ -171,33 +199,33 @@ class DashboardTab(ttk.Frame):
         self.low_stock_tree.tag_configure('low_alert', background='#FFCCCC')
 
     def load_stats(self):
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor()
-            
-            today = datetime.now().strftime("%Y-%m-%d")
-            today_sales = cursor.execute("SELECT SUM(total_amount) FROM sales WHERE sale_date LIKE ?", (f'{today}%',)).fetchone()[0] or 0.0
-            self.cards['today_sales'].config(text=f"₺{today_sales:.2f}")
+        tasks.submit(self._query_stats, on_done=self._apply_stats,
+                     on_error=lambda e: messagebox.showerror("DB Hatası", f"İstatistikler yüklenemedi: {e}"))
 
-            total_products = cursor.execute("SELECT COUNT(id) FROM products").fetchone()[0]
-            self.cards['total_products'].config(text=str(total_products))
-            
-            total_debt = cursor.execute("SELECT SUM(ABS(balance)) FROM customers WHERE balance < 0").fetchone()[0] or 0.0
-            self.cards['total_debt'].config(text=f"₺{total_debt:.2f}")
+    @staticmethod
+    def _query_stats(conn):
+        # Arka plan iş parçacığında çalışır
+        cursor = conn.cursor()
             
-            for item in self.low_stock_tree.get_children():
-                self.low_stock_tree.delete(item)
+        # Kartlar tetikleyicilerle güncel tutulan özet tablolardan tek satır okur
+        today_count, today_sales = summaries.get_day(conn, datetime.now().strftime("%Y-%m-%d"))
+        total_products = int(summaries.get_total(conn, summaries.PRODUCT_COUNT))
+        total_debt = summaries.get_total(conn, summaries.RECEIVABLES)
                 
-            low_stock_query = "SELECT id, name, stock_quantity, low_stock_threshold FROM products WHERE stock_quantity <= low_stock_threshold ORDER BY stock_quantity ASC"
-            low_stock_rows = cursor.execute(low_stock_query).fetchall()
+        low_stock_query = "SELECT id, name, stock_quantity, low_stock_threshold FROM products WHERE stock_quantity <= low_stock_threshold ORDER BY stock_quantity ASC"
+        low_stock_rows = cursor.execute(low_stock_query).fetchall()
+        return today_count, today_sales, total_products, total_debt, low_stock_rows
+
+    def _apply_stats(self, stats):
+        today_count, today_sales, total_products, total_debt, low_stock_rows = stats
+        self.cards['today_sales'].config(text=f"₺{today_sales:.2f} ({today_count} satış)")
+        self.cards['total_products'].config(text=str(total_products))
+        self.cards['total_debt'].config(text=f"₺{total_debt:.2f}")
             
-            for row in low_stock_rows:
-                self.low_stock_tree.insert("", tk.END, values=row, tags=('low_alert',))
-                
-        except sqlite3.Error as e:
-            messagebox.showerror("DB Hatası", f"İstatistikler yüklenemedi: {e}")
-        finally:
-            conn.close()
+        for item in self.low_stock_tree.get_children():
+            self.low_stock_tree.delete(item)
+        for row in low_stock_rows:
+            self.low_stock_tree.insert("", tk.END, values=row, tags=('low_alert',))
 
 
 # --- 2. Ürün Yönetimi Modülü ---
@@ -239,8 +267,17 @@ class ProductFormWindow(tk.Toplevel):
                 entry.insert(0, str(initial_value))
 
             self.entries[key] = entry
+
+        # Birden fazla barkod virgülle ayrılır; koli barkodu "barkod*adet" biçiminde girilir
+        barcode_row = len(fields)
+        ttk.Label(form_frame, text="Barkodlar (koli: barkod*adet):").grid(row=barcode_row, column=0, padx=5, pady=5, sticky="w")
+        self.entry_barcodes = ttk.Entry(form_frame, width=30)
+        self.entry_barcodes.grid(row=barcode_row, column=1, padx=5, pady=5, sticky="ew")
+        if self.is_edit:
+            self.entry_barcodes.insert(0, barcodes.format_barcodes(barcodes.get_product_barcodes(self.product_data['id'])))
             
-        ttk.Button(form_frame, text="Kaydet", command=self.save_product).grid(row=len(fields), column=0, columnspan=2, pady=20)
+        self.btn_save = ttk.Button(form_frame, text="Kaydet", command=self.save_product)
+        self.btn_save.grid(row=barcode_row + 1, column=0, columnspan=2, pady=20)
 
     def save_product(self):
         data = {key: entry.get() for key, entry in self.entries.items()}
@@ -254,6 +291,12 @@ class ProductFormWindow(tk.Toplevel):
         except ValueError:
             messagebox.showerror("Hata", "Stok ve Eşik alanları geçerli tam sayı, Fiyat alanları geçerli sayı olmalıdır.")
             return
+
+        try:
+            barcode_entries = barcodes.parse_barcodes(self.entry_barcodes.get())
+        except ValueError as e:
+            messagebox.showerror("Hata", f"{e}\nKoli adedi pozitif tam sayı olmalıdır (ör: 8690000000001*6).")
+            return
             
         if data['purchase_price'] == 0.0 and data['sale_price'] == 0.0 and messagebox.askyesno("Uyarı", "Alış ve satış fiyatları sıfır. Devam etmek istiyor musunuz?"):
             pass
@@ -261,34 +304,59 @@ class ProductFormWindow(tk.Toplevel):
             if not messagebox.askyesno("Uyarı", "Alış veya satış fiyatlarından biri sıfır. Yine de kaydetmek istiyor musunuz?"):
                 return
             
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor()
-            
-            if self.is_edit:
-                query = "UPDATE products SET name=?, stock_quantity=?, sale_price=?, low_stock_threshold=?, purchase_price=? WHERE id=?"
-                params = (data['name'], data['stock_quantity'], data['sale_price'], data['low_stock_threshold'], data['purchase_price'], self.product_data['id'])
-                cursor.execute(query, params)
-            else:
-                query = "INSERT INTO products (name, stock_quantity, sale_price, low_stock_threshold, purchase_price) VALUES (?, ?, ?, ?, ?)"
-                params = (data['name'], data['stock_quantity'], data['sale_price'], data['low_stock_threshold'], data['purchase_price'])
-                cursor.execute(query, params)
+        # Kayıt arka planda yapılır; başka kasa DB'yi kilitlemişse pencere donmadan beklenir
+        self.btn_save.config(state=tk.DISABLED)
+        tasks.submit(self._write_product, data, barcode_entries, title="Ürün kaydediliyor", write=True,
+                     on_done=self._on_saved, on_error=self._on_save_failed)
 
-            conn.commit()
-            self.master_tab.load_products() 
-            self.destroy()
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("DB Hatası", f"Ürün kaydedilirken hata oluştu: {e}")
-        finally:
-            conn.close()
+    def _write_product(self, conn, data, barcode_entries):
+        # Arka plan iş parçacığında çalışır
+        cursor = conn.cursor()
+    
+        if self.is_edit:
+            product_id = self.product_data['id']
+            query = "UPDATE products SET name=?, stock_quantity=?, sale_price=?, low_stock_threshold=?, purchase_price=? WHERE id=?"
+            params = (data['name'], data['stock_quantity'], data['sale_price'], data['low_stock_threshold'], data['purchase_price'], product_id)
+            cursor.execute(query, params)
+        else:
+            query = "INSERT INTO products (name, stock_quantity, sale_price, low_stock_threshold, purchase_price) VALUES (?, ?, ?, ?, ?)"
+            params = (data['name'], data['stock_quantity'], data['sale_price'], data['low_stock_threshold'], data['purchase_price'])
+            cursor.execute(query, params)
+            product_id = cursor.lastrowid
+
+        barcodes.replace_product_barcodes(conn, product_id, barcode_entries)
+        return int(product_id)
+
+    def _on_saved(self, product_id):
+        events.publish(events.PRODUCT, (product_id,), events.UPDATE if self.is_edit else events.INSERT)
+        self.destroy()
+
+    def _on_save_failed(self, e):
+        self.btn_save.config(state=tk.NORMAL)
+        messagebox.showerror("DB Hatası", f"Ürün kaydedilirken hata oluştu: {e}")
 
 class ProductTab(ttk.Frame):
     def __init__(self, master):
         super().__init__(master, padding="10")
         self.pack(expand=True, fill="both")
+        self._loaded_filter = None
         self.create_widgets()
         self.load_products()
+        self._dirty = events.DirtyFlag(self, self.load_products)
+        events.subscribe(events.PRODUCT, self._on_products_changed)
+
+    def on_shown(self):
+        self._dirty.flush()
+
+    def _on_products_changed(self, change):
+        if change.operation == events.UPDATE and not self._loaded_filter and self.winfo_ismapped() and not self._dirty.dirty:
+            # Yalnızca değişen satırlar yeniden okunur (ör. satıştan sonra stoklar)
+            try:
+                self.grid_view.update_rows(change.ids)
+            except sqlite3.Error as e:
+                messagebox.showerror("DB Hatası", f"Ürünler yüklenemedi: {e}")
+        else:
+            self._dirty.mark()
     
     def create_widgets(self):
         control_frame = ttk.Frame(self)
@@ -303,50 +371,79 @@ class ProductTab(ttk.Frame):
         ttk.Button(control_frame, text="✏️ Seçileni Düzenle", command=self.open_edit_product_window).pack(side=tk.LEFT, padx=5)
         ttk.Button(control_frame, text="🗑️ Seçileni Sil", command=self.delete_product).pack(side=tk.LEFT, padx=5)
 
-        columns = ("id", "name", "stock", "purchase_price", "sale_price", "threshold")
-        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
-        
-        self.tree.heading("id", text="ID"); self.tree.column("id", width=50, anchor=tk.CENTER)
-        self.tree.heading("name", text="Ürün Adı"); self.tree.column("name", width=250, anchor=tk.W)
-        self.tree.heading("stock", text="Stok"); self.tree.column("stock", width=70, anchor=tk.CENTER)
-        self.tree.heading("purchase_price", text="Alış (₺)"); self.tree.column("purchase_price", width=80, anchor=tk.E)
-        self.tree.heading("sale_price", text="Satış (₺)"); self.tree.column("sale_price", width=80, anchor=tk.E)
-        self.tree.heading("threshold", text="Eşik"); self.tree.column("threshold", width=70, anchor=tk.CENTER)
-        
-        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.pack(expand=True, fill="both")
+        columns = [
+            ("id", "ID", 50, tk.CENTER),
+            ("name", "Ürün Adı", 250, tk.W),
+            ("stock", "Stok", 70, tk.CENTER),
+            ("purchase_price", "Alış (₺)", 80, tk.E),
+            ("sale_price", "Satış (₺)", 80, tk.E),
+            ("threshold", "Eşik", 70, tk.CENTER),
+        ]
+        # Yalnızca görünen satırlar Treeview'a eklenir (100 bin üründe de akıcı)
+        self.grid_view = VirtualGrid(self, columns, formatter=self._format_product_row, selectmode="browse")
+        self.grid_view.pack(expand=True, fill="both")
+        self.tree = self.grid_view.tree
         
         self.tree.tag_configure('low', background='#FFCCCC', foreground='black') 
 
-    def load_products(self, filter_text=""):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        conn = get_db_connection()
+        # Arama kutusu: tuş başına sorgu yerine ertelenmiş, iptal edilebilir arka plan araması
+        self.live_search = LiveSearch(self, run=self._search_in_background, apply=self._apply_search,
+                                      on_error=lambda e: messagebox.showerror("DB Hatası", f"Ürünler yüklenemedi: {e}"))
+
+    @staticmethod
+    def _format_product_row(row):
+        product_id, name, stock, purchase, sale, threshold = row
+        tag = 'low' if stock <= threshold else ''
+        return (product_id, name, stock, f"{purchase:.2f}", f"{sale:.2f}", threshold), (tag,)
+
+    def load_products(self, filter_text=None):
+        if filter_text is None:
+            filter_text = self.search_entry.get()
+
+        if self.grid_view.source is not None and filter_text == self._loaded_filter:
+            # Aynı filtre: kaydırma konumu ve sıralama korunarak yenilenir
+            try:
+                self.grid_view.refresh()
+            except sqlite3.Error as e:
+                messagebox.showerror("DB Hatası", f"Ürünler yüklenemedi: {e}")
+            return
+        self._loaded_filter = filter_text
+        self.live_search.reset(filter_text)
+
         try:
-            cursor = conn.cursor()
-            # Artık purchase_price sütununun var olduğundan eminiz.
-            query = "SELECT id, name, stock_quantity, purchase_price, sale_price, low_stock_threshold FROM products WHERE name LIKE ? ORDER BY id DESC"
-            cursor.execute(query, ('%' + filter_text + '%',))
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                product_id, name, stock, purchase, sale, threshold = row
-                tag = 'low' if stock <= threshold else ''
-                
-                self.tree.insert("", tk.END, 
-                                 values=(product_id, name, stock, f"{purchase:.2f}", f"{sale:.2f}", threshold), 
-                                 tags=(tag,))
+            self.grid_view.set_source(self._build_source(filter_text))
         except sqlite3.Error as e:
             messagebox.showerror("DB Hatası", f"Ürünler yüklenemedi: {e}")
-        finally:
-            conn.close()
+
+    @staticmethod
+    def _build_source(filter_text):
+        where, params = "", ()
+        match = search.build_match_filter(filter_text)
+        if match:
+            # FTS5 trigram indeksi: Türkçe harf duyarsız alt dize araması
+            where, params = match
+
+        return GridSource(
+            select="p.id, p.name, p.stock_quantity, p.purchase_price, p.sale_price, p.low_stock_threshold",
+            from_clause="products p", where=where, params=params, key="p.id",
+            sort_columns={
+                "id": "p.id", "name": "p.name", "stock": "p.stock_quantity",
+                "purchase_price": "p.purchase_price", "sale_price": "p.sale_price", "threshold": "p.low_stock_threshold",
+            },
+            default_sort="id", descending=True,
+        )
+
+    def _search_in_background(self, conn, filter_text):
+        # İş parçacığında çalışır: yalnızca sorgu, arayüze dokunulmaz
+        return filter_text, self.grid_view.prefetch(self._build_source(filter_text), conn)
+
+    def _apply_search(self, result):
+        filter_text, (source, total, first_page) = result
+        self._loaded_filter = filter_text
+        self.grid_view.set_source(source, total, first_page)
 
     def filter_products(self, event):
-        self.load_products(self.search_entry.get())
+        self.live_search.submit(self.search_entry.get())
 
     def open_edit_product_window(self):
         selected_item = self.tree.focus()
@@ -374,21 +471,106 @@ class ProductTab(ttk.Frame):
         product_name = self.tree.item(selected_item, 'values')[1]
 
         if messagebox.askyesno("Onay", f"'{product_name}' adlı ürünü silmek istediğinizden emin misiniz?"):
-            conn = get_db_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM products WHERE id=?", (product_id,))
-                conn.commit()
-                self.load_products()
-                self.master.master.nametowidget(self.master.winfo_parent()).dashboard_frame.load_stats() 
-            except sqlite3.Error as e:
-                messagebox.showerror("DB Hatası", f"Ürün silinirken hata oluştu: {e}")
-            finally:
-                conn.close()
+            tasks.submit(
+                lambda conn: conn.execute("DELETE FROM products WHERE id=?", (product_id,)), write=True,
+                on_done=lambda _: events.publish(events.PRODUCT, (int(product_id),), events.DELETE),
+                on_error=lambda e: messagebox.showerror("DB Hatası", f"Ürün silinirken hata oluştu: {e}"),
+            )
 
 
 # --- 3. Satış İşlemleri Modülü ---
 
+class InsufficientStockError(journal.SaleConflict):
+    """Satış anında stoğu yetmeyen kalemler. lines: [(ürün_id, ad, istenen, mevcut), ...]; silinmiş ürünün mevcudu None."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__("\n".join(
+            f"- {name}: istenen {qty}, " + ("ürün silinmiş" if available is None else f"stokta {available}")
+            for _, name, qty, available in lines
+        ))
+
+
+def record_sale(conn, entry):
+    """Satış günlüğündeki bir satışı veritabanına işler; (sale_id, fatura no) döndürür.
+
+    Günlük boşaltıcısının yazma işlemi içinde çalışır. Satış zaten kayıtlıysa
+    (yeniden oynatma) None döndürür; stok yetmiyorsa InsufficientStockError
+    yükselir ve günlük satışı stok çakışmaları listesine alır.
+    """
+    cursor = conn.cursor()
+    invoice_number = entry['invoice_number']
+    journal_id = entry.get('id')
+    if journal_id is not None:
+        if cursor.execute("SELECT 1 FROM sales WHERE journal_id = ?", (journal_id,)).fetchone():
+            return None
+        existing = cursor.execute("SELECT 1 FROM sales WHERE invoice_number = ?", (invoice_number,)).fetchone()
+    else:
+        # Kimliksiz kayıt eski sürümün günlüğünden: numara ve tarih eşleşiyorsa uygulanmıştır
+        existing = cursor.execute("SELECT sale_date FROM sales WHERE invoice_number = ?", (invoice_number,)).fetchone()
+        if existing and existing[0] == entry['sale_date']:
+            return None
+    if existing:
+        # Seri bu kasaya ayrılı olsa da numara kullanılmış (ör. yedekten dönülmüş DB): satış yeni
+        # numarayla kaydedilir, fatura ve bildirim son numarayla yapılır
+        parsed = invoice_numbers.parse_number(invoice_number)
+        invoice_number = invoice_numbers.allocate(conn, parsed[0] if parsed else invoice_numbers.DEFAULT_SERIES)
+        print(f"Fatura numarası çakışması: {entry['invoice_number']} -> {invoice_number}")
+        entry = dict(entry, invoice_number=invoice_number, invoice=dict(entry['invoice'], invoice_number=invoice_number))
+    else:
+        invoice_numbers.record_used(conn, invoice_number)
+
+    customer_id, sale_date, total_amount = entry['customer_id'], entry['sale_date'], entry['total_amount']
+
+    # 1. Stokları Düş: yalnızca yeterli stok varsa. Kasadaki kontrol diğer kasaların günlükte
+    # bekleyen satışlarını bilmez; aynı son ürünler iki kasada satıldıysa biri burada durur
+    short_items = []
+    for item in entry['items']:
+        cursor.execute(
+            "UPDATE products SET stock_quantity = stock_quantity - ? WHERE id = ? AND stock_quantity >= ?",
+            (item['qty'], item['id'], item['qty'])
+        )
+        if cursor.rowcount != 1:
+            short_items.append(item)
+    if short_items:
+        # Günlük bu satışın yazmalarını geri alır (savepoint) ve satışı çakışma listesine yazar
+        lines = []
+        for item in short_items:
+            row = cursor.execute("SELECT stock_quantity FROM products WHERE id = ?", (item['id'],)).fetchone()
+            lines.append((item['id'], item['name'], item['qty'], row[0] if row else None))
+        raise InsufficientStockError(lines)
+
+    # 2. Satış Ana Kaydını Oluştur
+    cursor.execute(
+        "INSERT INTO sales (invoice_number, customer_id, sale_date, total_amount, journal_id) VALUES (?, ?, ?, ?, ?)",
+        (invoice_number, customer_id, sale_date, total_amount, journal_id)
+    )
+    sale_id = cursor.lastrowid
+
+    # Satış Kalemleri (maliyet, satış anındaki alış fiyatıdır)
+    cursor.executemany(
+        "INSERT INTO sale_items (sale_id, product_id, qty, unit_price, unit_cost) "
+        "SELECT ?, id, ?, ?, COALESCE(purchase_price, 0) FROM products WHERE id = ?",
+        [(sale_id, item['qty'], item['price'], item['id']) for item in entry['items']]
+    )
+
+    # 3. Cari Hareket (Perakende müşteri hariç)
+    if customer_id != 1:
+        cursor.execute(
+            "INSERT INTO ledger_transactions (customer_id, type, amount, transaction_date, description) VALUES (?, ?, ?, ?, ?)",
+            (customer_id, "Satış", total_amount, sale_date, f"Fatura No: {invoice_number}")
+        )
+        # Bakiye Güncelleme: Müşteri bize borçlandı (Bakiye negatifleşir/negatife yaklaşır).
+        cursor.execute(
+            "UPDATE customers SET balance = balance - ? WHERE id = ?",
+            (total_amount, customer_id)
+        )
+
+    # 4. PDF faturayı kuyruğa yaz: çizilemezse sonraki açılışta yeniden denenir
+    invoices.enqueue_job(conn, entry['invoice'])
+    return sale_id, invoice_number
+
+
 class SalesTab(ttk.Frame):
     """Hızlı Kasa Sistemi ve Satış Kaydı."""
     def __init__(self, master):
@@ -398,8 +580,20 @@ class SalesTab(ttk.Frame):
         self.current_cart = {}  # Sepet içeriği
         self.selected_customer_id = 1 
         self.selected_customer_name = "Perakende Müşteri"
+        self._sale_in_progress = False  # Kayıt arka planda sürerken ikinci tıklama yok sayılır
         self.create_widgets()
         self.refresh_cart_display() 
+        self._customers_dirty = events.DirtyFlag(self, self.load_customer_combo)
+        events.subscribe(events.CUSTOMER, lambda change: self._customers_dirty.mark())
+        events.subscribe(events.SALE_CONFLICT, lambda change: self.refresh_conflict_count())
+        self.refresh_conflict_count()
+
+    def on_shown(self):
+        self._customers_dirty.flush()
+
+    def refresh_conflict_count(self):
+        tasks.submit(journal.conflict_count, on_done=lambda count: self.btn_conflicts.config(
+            text=f"⚠ Stok Çakışmaları ({count})" if count else "Stok Çakışmaları"))
 
     def create_widgets(self):
         top_frame = ttk.Frame(self)
@@ -434,18 +628,17 @@ class SalesTab(ttk.Frame):
         
         ttk.Button(right_panel, text="✅ SATIŞI TAMAMLA", style='Accent.TButton', command=self.complete_sale).pack(fill='x', pady=(0, 15))
         ttk.Button(right_panel, text="❌ Sepeti Temizle", command=self.clear_cart).pack(fill='x', pady=5)
+        self.btn_conflicts = ttk.Button(right_panel, text="Stok Çakışmaları", command=lambda: SaleConflictWindow(self))
+        self.btn_conflicts.pack(fill='x', pady=5)
         
         self.create_cart_tree()
 
     def open_add_customer_window(self):
-        app_root = self.master.master.nametowidget(self.master.winfo_parent())
-        # CustomerFormWindow'un bu dosyada tanımlı olduğunu varsayıyoruz
-        CustomerFormWindow(app_root.customer_frame, master_tab_sales=self) 
+        # Kayıttan sonra müşteri listesi CUSTOMER olayıyla yenilenir
+        CustomerFormWindow(self)
 
     def load_customer_combo(self):
-        conn = get_db_connection()
-        customers = conn.execute("SELECT id, name, balance FROM customers ORDER BY name ASC").fetchall()
-        conn.close()
+        customers = db.get_read_connection().execute("SELECT id, name, balance FROM customers ORDER BY name ASC").fetchall()
         
         self.customer_map = {}
         combo_values = []
@@ -461,6 +654,16 @@ class SalesTab(ttk.Frame):
                 default_name = display_name
                 
         self.customer_combo['values'] = combo_values
+        # Seçili müşteri hâlâ varsa korunur (bakiyesi değiştiğinde yalnızca etiketi güncellenir)
+        self._select_customer(self.selected_customer_id, default_name)
+
+    def _select_customer(self, c_id, default_name="Perakende Müşteri (N/A)"):
+        for display_name, data in self.customer_map.items():
+            if data['id'] == c_id:
+                self.customer_var.set(display_name)
+                self.selected_customer_id = c_id
+                self.selected_customer_name = data['name']
+                return
         self.customer_var.set(default_name)
         self.selected_customer_id = 1
         self.selected_customer_name = "Perakende Müşteri"
@@ -505,19 +708,23 @@ class SalesTab(ttk.Frame):
         search_term = self.product_search_entry.get().strip()
         if not search_term: return
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT id, name, sale_price, stock_quantity FROM products WHERE name LIKE ? OR id = ? LIMIT 1"
-        
-        try:
-            p_id_search = int(search_term)
-        except ValueError:
-            p_id_search = -1 
-        
-        cursor.execute(query, ('%' + search_term + '%', p_id_search))
-        product = cursor.fetchone()
-        conn.close()
+        product = None
+        add_qty = 1
+        # 1. Barkod: birincil anahtar üzerinden tam eşleşme (koli barkodu adet taşır)
+        scanned = barcodes.find_by_barcode(search_term)
+        if scanned:
+            product, add_qty = scanned[:4], scanned[4]
+        # 2. Kısa sayılar ürün ID'si kabul edilir (bilinmeyen barkodlar yanlış ürüne düşmesin)
+        elif search_term.isdigit() and len(search_term) <= MAX_PRODUCT_ID_DIGITS:
+            product = db.get_read_connection().execute(
+                "SELECT id, name, sale_price, stock_quantity FROM products WHERE id = ?", (int(search_term),)
+            ).fetchone()
+        # 3. Son çare: en alakalı ad eşleşmesi
+        if not product:
+            matches = search.search_products(search_term, limit=1)
+            if matches:
+                p_id, p_name, p_stock, _, p_price, _ = matches[0]
+                product = (p_id, p_name, p_price, p_stock)
 
         if not product:
             messagebox.showwarning("Hata", f"'{search_term}' ile eşleşen ürün bulunamadı.")
@@ -527,15 +734,15 @@ class SalesTab(ttk.Frame):
         p_id, p_name, p_price, p_stock = product
         
         current_qty_in_cart = self.current_cart.get(p_id, {}).get('qty', 0)
-        if current_qty_in_cart + 1 > p_stock:
+        if current_qty_in_cart + add_qty > p_stock:
             messagebox.showwarning("Stok Uyarısı", f"'{p_name}' için yeterli stok yok. Mevcut: {p_stock}")
             self.product_search_entry.delete(0, tk.END)
             return
             
         if p_id in self.current_cart:
-            self.current_cart[p_id]['qty'] += 1
+            self.current_cart[p_id]['qty'] += add_qty
         else:
-            self.current_cart[p_id] = {'id': p_id, 'name': p_name, 'qty': 1, 'price': p_price, 'stock': p_stock}
+            self.current_cart[p_id] = {'id': p_id, 'name': p_name, 'qty': add_qty, 'price': p_price, 'stock': p_stock}
         
         self.refresh_cart_display()
         self.product_search_entry.delete(0, tk.END)
@@ -570,138 +777,195 @@ class SalesTab(ttk.Frame):
 
     def clear_cart(self):
         if messagebox.askyesno("Onay", "Sepeti tamamen temizlemek istediğinizden emin misiniz?"):
-            self.current_cart = {}
-            self.refresh_cart_display()
+            self._reset_cart()
+
+    def _reset_cart(self):
+        self.current_cart = {}
+        self.refresh_cart_display()
 
     
     def complete_sale(self):
         """Satış işlemini tamamlar, veritabanına kaydeder ve stokları düşer."""
+        if self._sale_in_progress:
+            return
         if not self.current_cart:
             messagebox.showwarning("Hata", "Sepet boş! Satış kaydedilemez.")
             return
 
         total_amount = sum(item['qty'] * item['price'] for item in self.current_cart.values())
-        invoice_number = generate_invoice_number()
         sale_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         if not messagebox.askyesno("Satış Onayı", f"Müşteri: {self.selected_customer_name}\nToplam: ₺{total_amount:.2f}\nSatışı tamamlamak istiyor musunuz?"):
             return
 
-        conn = get_db_connection()
-        try:
-            conn.execute("BEGIN TRANSACTION")
-            cursor = conn.cursor()
-            
-            # 1. Satış Ana Kaydını Oluştur
-            cursor.execute(
-                "INSERT INTO sales (invoice_number, customer_id, sale_date, total_amount) VALUES (?, ?, ?, ?)",
-                (invoice_number, self.selected_customer_id, sale_date, total_amount)
-            )
-            sale_id = cursor.lastrowid
-            
-            # 2. Stokları Düş
-            stock_updates = [(item['qty'], item['id']) for item in self.current_cart.values()]
-            cursor.executemany("UPDATE products SET stock_quantity = stock_quantity - ? WHERE id = ?", stock_updates)
-
-            # 3. Cari Hareket (Perakende müşteri hariç)
-            if self.selected_customer_id != 1:
-                cursor.execute(
-                    "INSERT INTO ledger_transactions (customer_id, type, amount, transaction_date, description) VALUES (?, ?, ?, ?, ?)",
-                    (self.selected_customer_id, "Satış", total_amount, sale_date, f"Fatura No: {invoice_number}")
-                )
-                # Bakiye Güncelleme: Müşteri bize borçlandı (Bakiye negatifleşir/negatife yaklaşır).
-                cursor.execute(
-                    "UPDATE customers SET balance = balance - ? WHERE id = ?",
-                    (total_amount, self.selected_customer_id)
-                )
-
-            conn.commit()
-            
-            messagebox.showinfo("Başarılı", f"Satış kaydedildi! Fatura No: {invoice_number}")
-            
-            # PDF Fatura Oluşturma (Geliştirilmiş)
-            self.create_pdf_invoice(invoice_number, self.selected_customer_name, total_amount, self.current_cart)
-            
-            # Temizle ve Yenile
-            self.clear_cart()
-            self.load_customer_combo() 
-            app_root = self.master.master.nametowidget(self.master.winfo_parent())
-            app_root.product_frame.load_products() 
-            app_root.dashboard_frame.load_stats()
-            app_root.ledger_frame.load_customer_list() 
-
+        # Kayıt arka planda sürerken sepet değişebilir; iş parçacığına kopyası verilir
+        cart = {pid: dict(item) for pid, item in self.current_cart.items()}
+        customer = (self.selected_customer_id, self.selected_customer_name)
+        self._sale_in_progress = True
+        tasks.submit(
+            self._current_stock, list(cart), title="Stok kontrol ediliyor",
+            on_done=lambda stock: self._journal_sale(cart, customer, stock, sale_date, total_amount),
+            on_error=self._on_sale_failed,
+        )
+
+    @staticmethod
+    def _current_stock(conn, product_ids):
+        placeholders = ",".join("?" * len(product_ids))
+        return dict(conn.execute(f"SELECT id, stock_quantity FROM products WHERE id IN ({placeholders})", product_ids))
+
+    def _journal_sale(self, cart, customer, stock, sale_date, total_amount):
+        # Günlükte bekleyen (henüz DB'ye aktarılmamış) satışlar da stoktan düşülmüş sayılır
+        reserved = journal.get_journal().pending_quantities()
+        lines = []
+        for item in cart.values():
+            available = stock.get(item['id'])
+            if available is not None:
+                available -= reserved.get(item['id'], 0)
+            if available is None or available < item['qty']:
+                lines.append((item['id'], item['name'], item['qty'], available))
+        if lines:
+            self._on_sale_failed(InsufficientStockError(lines))
+            return
 
-        except Exception as e:
-            conn.rollback()
-            messagebox.showerror("Hata", f"Satış işlemi sırasında bir hata oluştu: {e}\nİşlem Geri Alındı.")
-        finally:
-            conn.close()
-
-    def create_pdf_invoice(self, invoice_number, customer_name, total_amount, cart_data):
-        """ReportLab ile gerçek PDF faturası oluşturur."""
-        import webbrowser
         settings = load_settings()
-        pdf_dir = settings['pdf_save_path']
-        
         try:
-            os.makedirs(pdf_dir, exist_ok=True)
-            pdf_path = os.path.join(pdf_dir, f"Fatura_{invoice_number}.pdf")
-            
-            c = canvas.Canvas(pdf_path, pagesize=A4)
-            width, height = A4
-            
-            c.setFont(FONT_NAME, 20)
-            c.drawString(50, height - 50, settings['company_name'])
-            
-            c.setFont(FONT_NAME, 12)
-            c.drawString(50, height - 80, "--- FATURA ---")
-            c.drawString(50, height - 100, f"Fatura No: {invoice_number}")
-            c.drawString(50, height - 120, f"Müşteri: {customer_name}")
-            c.drawString(50, height - 140, f"Tarih: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-            
-            # Tablo Başlıkları
-            y_pos = height - 180
-            c.setFont(FONT_NAME, 10)
-            c.drawString(50, y_pos, "Ürün Adı")
-            c.drawString(300, y_pos, "Adet")
-            c.drawString(380, y_pos, "Birim Fiyat (₺)")
-            c.drawString(500, y_pos, "Toplam (₺)")
-            
-            c.line(40, y_pos - 5, width - 40, y_pos - 5)
-            
-            # Ürün Listesi
-            y_pos -= 20
-            for item in cart_data.values():
-                c.drawString(50, y_pos, item['name'][:40])
-                c.drawString(300, y_pos, str(item['qty']))
-                c.drawString(380, y_pos, f"{item['price']:.2f}")
-                c.drawString(500, y_pos, f"{item['qty'] * item['price']:.2f}")
-                y_pos -= 15
-                if y_pos < 100: # Yeni Sayfa
-                    c.showPage()
-                    y_pos = height - 50
-                    c.setFont(FONT_NAME, 10)
-            
-            # Toplam
-            c.line(450, 70, 580, 70)
-            c.setFont(FONT_NAME, 14)
-            c.drawString(380, 50, "GENEL TOPLAM:")
-            c.drawString(500, 50, f"₺{total_amount:.2f}")
-            
-            c.save()
-            webbrowser.open(pdf_path)
-            
-        except Exception as e:
-            messagebox.showwarning("PDF Hatası", f"PDF dosyası oluşturulamadı. Lütfen 'arial.ttf' dosyasının bulunduğundan ve ReportLab'ın doğru kurulduğundan emin olun: {e}")
+            invoice_number = journal.get_journal().next_invoice_number(int(sale_date[:4]))
+        except invoice_numbers.SeriesInUseError as e:
+            self._on_sale_failed(e)
+            return
+        entry = {
+            "id": uuid.uuid4().hex,
+            "invoice_number": invoice_number,
+            "customer_id": customer[0],
+            "sale_date": sale_date,
+            "total_amount": total_amount,
+            "items": [{"id": item['id'], "name": item['name'], "qty": item['qty'], "price": item['price']} for item in cart.values()],
+            "invoice": invoices.build_payload(invoice_number, customer[1], sale_date, total_amount, cart, settings),
+        }
+        try:
+            # Satış, yerel günlüğe diske indirilerek yazıldığı anda kesinleşir; DB'ye arka planda aktarılır
+            journal.record(entry)
+        except OSError as e:
+            self._on_sale_failed(e)
+            return
+        self._on_sale_recorded(entry)
+
+    def _on_sale_recorded(self, entry):
+        self._sale_in_progress = False
+
+        # Sepet hemen temizlenir. PDF fatura ve diğer sekmeler satış veritabanına aktarılınca
+        # (son fatura numarasıyla) işlenir: StokTakipApp._on_sales_applied
+        self._reset_cart()
+        self._select_customer(1)
+
+        messagebox.showinfo("Başarılı", f"Satış kaydedildi! Fatura No: {entry['invoice_number']}")
+
+    def _on_sale_failed(self, e):
+        self._sale_in_progress = False
+        if isinstance(e, InsufficientStockError):
+            # Sepet korunur; kasiyer yalnızca sorunlu satırları düzeltir
+            for p_id, _, _, available in e.lines:
+                if p_id in self.current_cart:
+                    self.current_cart[p_id]['stock'] = available or 0
+            events.publish(events.PRODUCT, [line[0] for line in e.lines], events.UPDATE)
+            messagebox.showwarning("Yetersiz Stok", f"Satış kaydedilmedi, aşağıdaki ürünlerin stoğu yetersiz:\n{e}")
+            return
+        if isinstance(e, OSError):
+            messagebox.showerror("Hata", f"Satış günlüğe yazılamadı, satış kaydedilmedi: {e}")
+            return
+        if isinstance(e, invoice_numbers.SeriesInUseError):
+            messagebox.showerror("Fatura Serisi", f"Satış kaydedilmedi. {e}")
+            return
+        messagebox.showerror("Hata", f"Satış işlemi sırasında bir hata oluştu: {e}\nİşlem Geri Alındı.")
+
+class SaleConflictWindow(tk.Toplevel):
+    """Stoğu başka kasada tükendiği için veritabanına uygulanamayan satışlar.
+
+    Satış müşteriye onaylanmıştı: stok düzeltildikten (ör. mal kabulü, sayım)
+    sonra yeniden uygulanır ya da satış iptal edilir.
+    """
+
+    def __init__(self, sales_tab):
+        super().__init__(sales_tab)
+        self.sales_tab = sales_tab
+        self.title("Stok Çakışmaları")
+        self.transient(sales_tab.winfo_toplevel())
+        self.grab_set()
+
+        frame = ttk.Frame(self, padding="10")
+        frame.pack(expand=True, fill="both")
+        ttk.Label(frame, text="Bu satışlar kasada onaylandı ancak veritabanına işlenirken stok yetmedi. "
+                              "Stoğu düzeltip yeniden uygulayın ya da satışı iptal edin.",
+                  wraplength=700).pack(anchor='w', pady=(0, 10))
+
+        columns = ("invoice", "date", "customer", "total", "reason")
+        self.tree = ttk.Treeview(frame, columns=columns, show="headings", selectmode="browse", height=10)
+        for col_id, heading, width, anchor in (("invoice", "Fatura No", 140, tk.CENTER), ("date", "Tarih", 130, tk.CENTER),
+                                               ("customer", "Müşteri", 160, tk.W), ("total", "Tutar (₺)", 90, tk.E),
+                                               ("reason", "Sebep", 300, tk.W)):
+            self.tree.heading(col_id, text=heading)
+            self.tree.column(col_id, width=width, anchor=anchor)
+        self.tree.pack(expand=True, fill="both")
+
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(fill='x', pady=(10, 0))
+        ttk.Button(button_frame, text="Yeniden Uygula", command=self.retry_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Satışı İptal Et", command=self.discard_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Kapat", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        self.load()
+
+    def load(self):
+        tasks.submit(journal.conflicts, on_done=self._fill,
+                     on_error=lambda e: messagebox.showerror("DB Hatası", f"Stok çakışmaları yüklenemedi: {e}", parent=self))
+
+    def _fill(self, rows):
+        if not self.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        for journal_id, invoice_number, sale_date, customer, total, reason in rows:
+            self.tree.insert("", tk.END, iid=journal_id,
+                             values=(invoice_number, sale_date[:16], customer, f"{total:.2f}", reason.replace("\n", " ")))
+
+    def _selected(self):
+        journal_id = self.tree.focus()
+        if not journal_id:
+            messagebox.showwarning("Uyarı", "Lütfen listeden bir satış seçin.", parent=self)
+        return journal_id
+
+    def retry_selected(self):
+        journal_id = self._selected()
+        if not journal_id:
+            return
+        tasks.submit(journal.get_journal().retry_conflict, journal_id, title="Satış yeniden uygulanıyor", write=True,
+                     on_done=self._on_retried,
+                     on_error=lambda e: messagebox.showerror("Hata", f"Satış uygulanamadı: {e}", parent=self))
+
+    def _on_retried(self, result):
+        # Olaylar, fatura ve uyarılar günlükten gelen satışlarla aynı yoldan işlenir
+        self.sales_tab.winfo_toplevel()._on_sales_applied([result])
+        if result.conflict is None:
+            events.publish(events.SALE_CONFLICT, (journal.entry_key(result.entry),), events.DELETE)
+        if self.winfo_exists():
+            self.load()
+
+    def discard_selected(self):
+        journal_id = self._selected()
+        if not journal_id:
+            return
+        invoice_number = self.tree.item(journal_id, 'values')[0]
+        if not messagebox.askyesno("Onay", f"{invoice_number} numaralı satış iptal edilsin mi? Satış kaydedilmeyecek.", parent=self):
+            return
+        tasks.submit(journal.discard_conflict, journal_id, title="Satış iptal ediliyor", write=True,
+                     on_done=lambda _: (events.publish(events.SALE_CONFLICT, (journal_id,), events.DELETE), self.load()),
+                     on_error=lambda e: messagebox.showerror("Hata", f"Satış iptal edilemedi: {e}", parent=self))
 
 
 # --- 4. Müşteri Yönetimi Modülü (CustomerFormWindow ve CustomerTab) ---
 
 class CustomerFormWindow(tk.Toplevel):
-    def __init__(self, master_tab, customer_data=None, master_tab_sales=None):
+    def __init__(self, master_tab, customer_data=None):
         super().__init__(master_tab)
         self.master_tab = master_tab
-        self.master_tab_sales = master_tab_sales
         self.customer_data = customer_data
         self.is_edit = customer_data is not None
         
@@ -730,7 +994,8 @@ class CustomerFormWindow(tk.Toplevel):
         else:
             self.type_var.set("Perakende")
             
-        ttk.Button(form_frame, text="Kaydet", command=self.save_customer).grid(row=2, column=0, columnspan=2, pady=20)
+        self.btn_save = ttk.Button(form_frame, text="Kaydet", command=self.save_customer)
+        self.btn_save.grid(row=2, column=0, columnspan=2, pady=20)
 
     def save_customer(self):
         name = self.entry_name.get().strip()
@@ -740,38 +1005,50 @@ class CustomerFormWindow(tk.Toplevel):
             messagebox.showwarning("Uyarı", "Müşteri Adı boş olamaz.")
             return
             
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            if self.is_edit:
-                query = "UPDATE customers SET name=?, type=? WHERE id=?"
-                params = (name, customer_type, self.customer_data['id'])
-                cursor.execute(query, params)
-            else:
-                query = "INSERT INTO customers (name, type) VALUES (?, ?)"
-                params = (name, customer_type)
-                cursor.execute(query, params)
+        self.btn_save.config(state=tk.DISABLED)
+        tasks.submit(self._write_customer, name, customer_type, title="Müşteri kaydediliyor", write=True,
+                     on_done=self._on_saved, on_error=self._on_save_failed)
 
-            conn.commit()
-            self.master_tab.load_customers() 
-            
-            if self.master_tab_sales:
-                 self.master_tab_sales.load_customer_combo()
-            
-            self.destroy()
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("Veritabanı Hatası", f"Müşteri kaydedilirken hata oluştu: {e}")
-        finally:
-            conn.close()
+    def _write_customer(self, conn, name, customer_type):
+        # Arka plan iş parçacığında çalışır
+        if self.is_edit:
+            query = "UPDATE customers SET name=?, type=? WHERE id=?"
+            params = (name, customer_type, self.customer_data['id'])
+            conn.execute(query, params)
+            return int(self.customer_data['id'])
+        query = "INSERT INTO customers (name, type) VALUES (?, ?)"
+        params = (name, customer_type)
+        return conn.execute(query, params).lastrowid
+
+    def _on_saved(self, customer_id):
+        events.publish(events.CUSTOMER, (customer_id,), events.UPDATE if self.is_edit else events.INSERT)
+        self.destroy()
+
+    def _on_save_failed(self, e):
+        self.btn_save.config(state=tk.NORMAL)
+        messagebox.showerror("Veritabanı Hatası", f"Müşteri kaydedilirken hata oluştu: {e}")
 
 class CustomerTab(ttk.Frame):
     def __init__(self, master):
         super().__init__(master, padding="10")
         self.pack(expand=True, fill="both")
+        self._loaded_filter = None
         self.create_widgets()
         self.load_customers()
+        self._dirty = events.DirtyFlag(self, self.load_customers)
+        events.subscribe(events.CUSTOMER, self._on_customers_changed)
+
+    def on_shown(self):
+        self._dirty.flush()
+
+    def _on_customers_changed(self, change):
+        if change.operation == events.UPDATE and not self._loaded_filter and self.winfo_ismapped() and not self._dirty.dirty:
+            try:
+                self.grid_view.update_rows(change.ids)
+            except sqlite3.Error as e:
+                messagebox.showerror("DB Hatası", f"Müşteriler yüklenemedi: {e}")
+        else:
+            self._dirty.mark()
 
     def create_widgets(self):
         control_frame = ttk.Frame(self)
@@ -786,55 +1063,70 @@ class CustomerTab(ttk.Frame):
         ttk.Button(control_frame, text="✏️ Seçileni Düzenle", command=self.open_edit_customer_window).pack(side=tk.LEFT, padx=5)
         ttk.Button(control_frame, text="🗑️ Seçileni Sil", command=self.delete_customer).pack(side=tk.LEFT, padx=5)
 
-        columns = ("id", "name", "type", "balance")
-        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
-        
-        self.tree.heading("id", text="ID"); self.tree.column("id", width=50, anchor=tk.CENTER)
-        self.tree.heading("name", text="Müşteri Adı"); self.tree.column("name", width=300, anchor=tk.W)
-        self.tree.heading("type", text="Tip"); self.tree.column("type", width=100, anchor=tk.CENTER)
-        self.tree.heading("balance", text="Bakiye (₺)"); self.tree.column("balance", width=150, anchor=tk.E)
-        
-        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.pack(expand=True, fill="both")
+        columns = [
+            ("id", "ID", 50, tk.CENTER),
+            ("name", "Müşteri Adı", 300, tk.W),
+            ("type", "Tip", 100, tk.CENTER),
+            ("balance", "Bakiye (₺)", 150, tk.E),
+        ]
+        self.grid_view = VirtualGrid(self, columns, formatter=self._format_customer_row, selectmode="browse")
+        self.grid_view.pack(expand=True, fill="both")
+        self.tree = self.grid_view.tree
         
         self.tree.tag_configure('borclu', background='#FFCCCC', foreground='black') 
         self.tree.tag_configure('alacakli', background='#CCFFCC', foreground='black')
 
-    def load_customers(self, filter_text=""):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        conn = get_db_connection()
+        self.live_search = LiveSearch(self, run=self._search_in_background, apply=self._apply_search,
+                                      on_error=lambda e: messagebox.showerror("DB Hatası", f"Müşteriler yüklenemedi: {e}"))
+
+    @staticmethod
+    def _format_customer_row(row):
+        c_id, name, c_type, balance = row
+        tag = ''
+        
+        if balance < 0:
+            tag = 'borclu'
+        elif balance > 0:
+            tag = 'alacakli'
+        
+        balance_label = f"₺{abs(balance):.2f} " + ("BORÇLU" if balance < 0 else ("ALACAKLI" if balance > 0 else "Sıfır"))
+        return (c_id, name, c_type, balance_label), (tag,)
+
+    def load_customers(self, filter_text=None):
+        if filter_text is None:
+            filter_text = self.search_entry.get()
+
         try:
-            cursor = conn.cursor()
-            query = "SELECT id, name, type, balance FROM customers WHERE id != 1 AND name LIKE ? ORDER BY name ASC"
-            cursor.execute(query, ('%' + filter_text + '%',))
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                c_id, name, c_type, balance = row
-                tag = ''
-                
-                if balance < 0:
-                    tag = 'borclu'
-                elif balance > 0:
-                    tag = 'alacakli'
-                
-                balance_label = f"₺{abs(balance):.2f} " + ("BORÇLU" if balance < 0 else ("ALACAKLI" if balance > 0 else "Sıfır"))
-                
-                self.tree.insert("", tk.END, 
-                                 values=(c_id, name, c_type, balance_label), 
-                                 tags=(tag,))
+            if self.grid_view.source is not None and filter_text == self._loaded_filter:
+                self.grid_view.refresh()
+                return
+            self._loaded_filter = filter_text
+            self.live_search.reset(filter_text)
+            self.grid_view.set_source(self._build_source(filter_text))
         except sqlite3.Error as e:
             messagebox.showerror("DB Hatası", f"Müşteriler yüklenemedi: {e}")
-        finally:
-            conn.close()
+
+    @staticmethod
+    def _build_source(filter_text):
+        return GridSource(
+            select="id, name, type, COALESCE(balance, 0)",
+            from_clause="customers", where="id != 1 AND name LIKE ?", params=('%' + filter_text + '%',),
+            sort_columns={
+                "id": "id", "name": "name", "type": "COALESCE(type, '')", "balance": "COALESCE(balance, 0)",
+            },
+            default_sort="name",
+        )
+
+    def _search_in_background(self, conn, filter_text):
+        return filter_text, self.grid_view.prefetch(self._build_source(filter_text), conn)
+
+    def _apply_search(self, result):
+        filter_text, (source, total, first_page) = result
+        self._loaded_filter = filter_text
+        self.grid_view.set_source(source, total, first_page)
 
     def filter_customers(self, event):
-        self.load_customers(self.search_entry.get())
+        self.live_search.submit(self.search_entry.get())
 
     def open_edit_customer_window(self):
         selected_item = self.tree.focus()
@@ -861,24 +1153,21 @@ class CustomerTab(ttk.Frame):
         c_name = self.tree.item(selected_item, 'values')[1]
         
         if messagebox.askyesno("Onay", f"'{c_name}' adlı müşteriyi silmek istediğinizden emin misiniz? (Tüm hareketler silinecektir!)"):
-            conn = get_db_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM customers WHERE id=?", (c_id,))
-                cursor.execute("DELETE FROM sales WHERE customer_id=?", (c_id,)) 
-                cursor.execute("DELETE FROM ledger_transactions WHERE customer_id=?", (c_id,)) 
-                conn.commit()
-                messagebox.showinfo("Başarılı", "Müşteri ve tüm ilişkili kayıtlar başarıyla silindi.")
-                self.load_customers()
-                
-                app_root = self.master.master.nametowidget(self.master.winfo_parent())
-                app_root.sales_frame.load_customer_combo()
-                app_root.dashboard_frame.load_stats()
-                app_root.ledger_frame.load_customer_list() 
-            except sqlite3.Error as e:
-                messagebox.showerror("Hata", f"Müşteri silinirken hata oluştu: {e}")
-            finally:
-                conn.close()
+            tasks.submit(self._delete_customer_records, int(c_id), title="Müşteri siliniyor", write=True,
+                         on_done=lambda _: self._on_customer_deleted(int(c_id)),
+                         on_error=lambda e: messagebox.showerror("Hata", f"Müşteri silinirken hata oluştu: {e}"))
+
+    @staticmethod
+    def _delete_customer_records(conn, c_id):
+        conn.execute("DELETE FROM customers WHERE id=?", (c_id,))
+        conn.execute("DELETE FROM sales WHERE customer_id=?", (c_id,)) 
+        conn.execute("DELETE FROM ledger_transactions WHERE customer_id=?", (c_id,)) 
+
+    def _on_customer_deleted(self, c_id):
+        messagebox.showinfo("Başarılı", "Müşteri ve tüm ilişkili kayıtlar başarıyla silindi.")
+        events.publish(events.CUSTOMER, (c_id,), events.DELETE)
+        events.publish(events.SALE, (), events.DELETE)
+        events.publish(events.LEDGER, (c_id,), events.DELETE)
 
 
 # --- 5. Cari İşlemler Modülü (LedgerTransactionWindow ve LedgerTab) ---
@@ -907,7 +1196,8 @@ class LedgerTransactionWindow(tk.Toplevel):
         self.entry_desc = ttk.Entry(form_frame, width=30)
         self.entry_desc.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
         
-        ttk.Button(form_frame, text="Kaydet", command=self.save_transaction).grid(row=2, column=0, columnspan=2, pady=20)
+        self.btn_save = ttk.Button(form_frame, text="Kaydet", command=self.save_transaction)
+        self.btn_save.grid(row=2, column=0, columnspan=2, pady=20)
 
     def save_transaction(self):
         try:
@@ -922,36 +1212,34 @@ class LedgerTransactionWindow(tk.Toplevel):
 
         balance_change = amount if self.transaction_type == "Tahsilat" else -amount
 
-        conn = get_db_connection()
-        try:
-            conn.execute("BEGIN TRANSACTION")
-            
-            conn.execute(
-                "INSERT INTO ledger_transactions (customer_id, type, amount, transaction_date, description) VALUES (?, ?, ?, ?, ?)",
-                (self.customer_id, self.transaction_type, amount, transaction_date, description)
-            )
-            
-            conn.execute(
-                "UPDATE customers SET balance = balance + ? WHERE id = ?",
-                (balance_change, self.customer_id)
-            )
+        self.btn_save.config(state=tk.DISABLED)
+        tasks.submit(self._write_transaction, amount, transaction_date, description, balance_change,
+                     title="Cari hareket kaydediliyor", write=True,
+                     on_done=self._on_saved, on_error=self._on_save_failed)
+
+    def _write_transaction(self, conn, amount, transaction_date, description, balance_change):
+        # Arka plan iş parçacığında çalışır
+        conn.execute(
+            "INSERT INTO ledger_transactions (customer_id, type, amount, transaction_date, description) VALUES (?, ?, ?, ?, ?)",
+            (self.customer_id, self.transaction_type, amount, transaction_date, description)
+        )
+    
+        conn.execute(
+            "UPDATE customers SET balance = balance + ? WHERE id = ?",
+            (balance_change, self.customer_id)
+        )
 
-            conn.commit()
-            messagebox.showinfo("Başarılı", f"Cari hareket başarıyla kaydedildi.")
-            
-            self.master_tab.load_customer_info(self.customer_id) 
-            self.master_tab.load_transactions(self.customer_id) 
-            app_root = self.master_tab.master.nametowidget(self.master_tab.winfo_parent())
-            app_root.sales_frame.load_customer_combo()
-            app_root.dashboard_frame.load_stats()
+    def _on_saved(self, _):
+        messagebox.showinfo("Başarılı", f"Cari hareket başarıyla kaydedildi.")
+        
+        events.publish(events.LEDGER, (self.customer_id,), events.INSERT)
+        events.publish(events.CUSTOMER, (self.customer_id,), events.UPDATE)
 
-            self.destroy()
+        self.destroy()
 
-        except Exception as e:
-            conn.rollback()
-            messagebox.showerror("Hata", f"Cari işlem kaydedilirken hata oluştu: {e}")
-        finally:
-            conn.close()
+    def _on_save_failed(self, e):
+        self.btn_save.config(state=tk.NORMAL)
+        messagebox.showerror("Hata", f"Cari işlem kaydedilirken hata oluştu: {e}")
 
 class LedgerTab(ttk.Frame):
     def __init__(self, master):
@@ -961,6 +1249,29 @@ class LedgerTab(ttk.Frame):
         self.selected_customer_name = ""
         self.create_widgets()
         self.load_customer_list()
+        self._list_dirty = events.DirtyFlag(self, self.load_customer_list)
+        self._detail_dirty = events.DirtyFlag(self, self._reload_selected)
+        events.subscribe(events.CUSTOMER, self._on_customers_changed)
+        events.subscribe(events.LEDGER, self._on_ledger_changed)
+
+    def on_shown(self):
+        self._list_dirty.flush()
+        self._detail_dirty.flush()
+
+    def _on_customers_changed(self, change):
+        self._list_dirty.mark()
+        if self.selected_customer_id in change.ids:
+            self._detail_dirty.mark()
+
+    def _on_ledger_changed(self, change):
+        # Boş ids: birçok müşterinin hareketi değişti (ör. yıl arşivlendi)
+        if not change.ids or self.selected_customer_id in change.ids:
+            self._detail_dirty.mark()
+
+    def _reload_selected(self):
+        if self.selected_customer_id:
+            self.load_customer_info(self.selected_customer_id)
+            self.load_transactions(self.selected_customer_id)
         
     def create_widgets(self):
         main_paned = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
@@ -995,27 +1306,41 @@ class LedgerTab(ttk.Frame):
         ttk.Button(btn_frame, text="📄 EKSTRE YAZDIR (PDF)", command=self.print_ledger).pack(side=tk.LEFT, padx=5)
         
         ttk.Label(right_frame, text="Cari Hareketler", font=('Arial', 12)).pack(anchor='w', pady=(10, 5))
-        columns = ("date", "type", "description", "amount")
+
+        # Sayfalar arası gezinme (en yeni sayfa önce gösterilir)
+        page_frame = ttk.Frame(right_frame)
+        page_frame.pack(side=tk.BOTTOM, fill='x', pady=(5, 0))
+        self.btn_newest = ttk.Button(page_frame, text="⏮ En Yeni", command=lambda: self._load_page(), state=tk.DISABLED)
+        self.btn_newest.pack(side=tk.LEFT, padx=5)
+        self.btn_newer = ttk.Button(page_frame, text="◀ Daha Yeni", command=self._newer_page, state=tk.DISABLED)
+        self.btn_newer.pack(side=tk.LEFT, padx=5)
+        self.btn_older = ttk.Button(page_frame, text="Daha Eski ▶", command=self._older_page, state=tk.DISABLED)
+        self.btn_older.pack(side=tk.LEFT, padx=5)
+        self.lbl_page = ttk.Label(page_frame, text="")
+        self.lbl_page.pack(side=tk.LEFT, padx=10)
+
+        columns = ("date", "type", "description", "amount", "balance")
         self.ledger_tree = ttk.Treeview(right_frame, columns=columns, show="headings")
         self.ledger_tree.heading("date", text="Tarih")
         self.ledger_tree.heading("type", text="Tip")
         self.ledger_tree.heading("description", text="Açıklama")
         self.ledger_tree.heading("amount", text="Miktar (₺)")
+        self.ledger_tree.heading("balance", text="Bakiye (₺)")
         
         self.ledger_tree.column("date", width=150, anchor=tk.CENTER)
         self.ledger_tree.column("type", width=100, anchor=tk.CENTER)
         self.ledger_tree.column("description", width=300, anchor=tk.W)
         self.ledger_tree.column("amount", width=100, anchor=tk.E)
+        self.ledger_tree.column("balance", width=120, anchor=tk.E)
         
         self.ledger_tree.pack(expand=True, fill="both")
+        self._ledger_page = None
 
     def load_customer_list(self):
         for item in self.customer_list_tree.get_children():
             self.customer_list_tree.delete(item)
             
-        conn = get_db_connection()
-        customers = conn.execute("SELECT id, name, balance FROM customers WHERE id != 1 ORDER BY name ASC").fetchall()
-        conn.close()
+        customers = db.get_read_connection().execute("SELECT id, name, balance FROM customers WHERE id != 1 ORDER BY name ASC").fetchall()
         
         for c_id, name, balance in customers:
             balance_tag = 'B' if balance < 0 else ('A' if balance > 0 else 'N/A')
@@ -1028,9 +1353,7 @@ class LedgerTab(ttk.Frame):
         
         self.selected_customer_id = int(selected_item)
         
-        conn = get_db_connection()
-        customer = conn.execute("SELECT name FROM customers WHERE id = ?", (self.selected_customer_id,)).fetchone()
-        conn.close()
+        customer = db.get_read_connection().execute("SELECT name FROM customers WHERE id = ?", (self.selected_customer_id,)).fetchone()
         
         if customer:
             self.selected_customer_name = customer[0]
@@ -1038,9 +1361,7 @@ class LedgerTab(ttk.Frame):
             self.load_transactions(self.selected_customer_id)
 
     def load_customer_info(self, c_id):
-        conn = get_db_connection()
-        customer = conn.execute("SELECT name, balance FROM customers WHERE id = ?", (c_id,)).fetchone()
-        conn.close()
+        customer = db.get_read_connection().execute("SELECT name, balance FROM customers WHERE id = ?", (c_id,)).fetchone()
         
         if customer:
             name, balance = customer
@@ -1053,18 +1374,50 @@ class LedgerTab(ttk.Frame):
                 self.lbl_balance.config(text=f"{balance_text} ALACAKLI (Borcumuz var)", foreground="green")
             else:
                 self.lbl_balance.config(text="Bakiye: Sıfır", foreground="black")
+        elif c_id == self.selected_customer_id:
+            # Seçili müşteri silinmiş
+            self.selected_customer_id = None
+            self.selected_customer_name = ""
+            self.lbl_customer_name.config(text="Müşteri Seçilmedi")
+            self.lbl_balance.config(text="Bakiye: ₺0.00", foreground="black")
 
     def load_transactions(self, c_id):
+        # Müşteri seçildiğinde veya hareketler değiştiğinde en yeni sayfa açılır
+        self._load_page()
+
+    def _load_page(self, before=None, after=None):
+        c_id = self.selected_customer_id
+        if not c_id:
+            return
+        tasks.submit(ledger.page, c_id, before, after, on_done=lambda page: self._apply_page(c_id, page),
+                     on_error=lambda e: messagebox.showerror("DB Hatası", f"Cari hareketler yüklenemedi: {e}"))
+
+    def _older_page(self):
+        if self._ledger_page and self._ledger_page.has_older:
+            self._load_page(before=self._ledger_page.oldest_key)
+
+    def _newer_page(self):
+        if self._ledger_page and self._ledger_page.has_newer:
+            self._load_page(after=self._ledger_page.newest_key)
+
+    def _apply_page(self, c_id, page):
+        if c_id != self.selected_customer_id:
+            return  # Sorgu sürerken başka müşteri seçildi
+        self._ledger_page = page
         for item in self.ledger_tree.get_children():
             self.ledger_tree.delete(item)
-            
-        conn = get_db_connection()
-        query = "SELECT transaction_date, type, description, amount FROM ledger_transactions WHERE customer_id = ? ORDER BY transaction_date DESC"
-        transactions = conn.execute(query, (c_id,)).fetchall()
-        conn.close()
         
-        for date, t_type, desc, amount in transactions:
-            self.ledger_tree.insert("", tk.END, values=(date[:16], t_type, desc, f"{amount:.2f}"))
+        for _, date, t_type, desc, amount, balance in page.rows:
+            balance_tag = 'B' if balance < 0 else ('A' if balance > 0 else '')
+            self.ledger_tree.insert("", tk.END, values=(date[:16], t_type, desc, f"{amount:.2f}", f"{abs(balance):.2f} {balance_tag}"))
+
+        self.btn_older.config(state=tk.NORMAL if page.has_older else tk.DISABLED)
+        self.btn_newer.config(state=tk.NORMAL if page.has_newer else tk.DISABLED)
+        self.btn_newest.config(state=tk.NORMAL if page.has_newer else tk.DISABLED)
+        if page.rows:
+            self.lbl_page.config(text=f"{page.rows[-1][1][:10]} - {page.rows[0][1][:10]} ({len(page.rows)} hareket)")
+        else:
+            self.lbl_page.config(text="Hareket yok")
 
     def open_transaction_window(self, transaction_type):
         if not self.selected_customer_id or self.selected_customer_id == 1:
@@ -1078,73 +1431,144 @@ class LedgerTab(ttk.Frame):
             messagebox.showwarning("Uyarı", "Lütfen önce ekstresini almak istediğiniz müşteriyi seçin.")
             return
         
-        conn = get_db_connection()
-        query = "SELECT transaction_date, type, description, amount FROM ledger_transactions WHERE customer_id = ? ORDER BY transaction_date ASC"
-        transactions = conn.execute(query, (self.selected_customer_id,)).fetchall()
-        conn.close()
-        
-        if not transactions:
+        if not ledger.has_transactions(db.get_read_connection(), self.selected_customer_id):
             messagebox.showwarning("Uyarı", "Bu müşteri için cari hareket bulunmamaktadır.")
             return
             
         settings = load_settings()
         pdf_dir = settings['pdf_save_path']
-        
-        try:
-            os.makedirs(pdf_dir, exist_ok=True)
-            pdf_path = os.path.join(pdf_dir, f"Ekstre_{self.selected_customer_name}_{datetime.now().strftime('%Y%m%d')}.pdf")
-            
-            c = canvas.Canvas(pdf_path, pagesize=A4)
-            width, height = A4
-            
-            c.setFont(FONT_NAME, 16)
-            c.drawString(50, height - 50, f"CARİ EKSTRE: {self.selected_customer_name}")
-            c.setFont(FONT_NAME, 10)
-            c.drawString(50, height - 70, f"Şirket: {settings['company_name']}")
-            c.drawString(50, height - 90, f"Tarih: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-            
-            # Tablo Başlıkları
-            y_pos = height - 120
-            c.setFont(FONT_NAME, 10)
-            c.drawString(50, y_pos, "Tarih")
-            c.drawString(180, y_pos, "Tip")
-            c.drawString(280, y_pos, "Açıklama")
-            c.drawString(500, y_pos, "Miktar (₺)")
-            
-            c.line(40, y_pos - 5, width - 40, y_pos - 5)
-            
-            # Hareket Listesi
-            y_pos -= 20
-            for date, t_type, desc, amount in transactions:
-                c.drawString(50, y_pos, date[:16])
-                c.drawString(180, y_pos, t_type)
-                c.drawString(280, y_pos, desc[:30])
-                c.drawString(500, y_pos, f"{amount:.2f}")
-                y_pos -= 15
-                if y_pos < 50:
-                    c.showPage()
-                    y_pos = height - 50
-                    c.setFont(FONT_NAME, 10)
-            
-            # Bakiye
-            c.line(40, y_pos - 10, width - 40, y_pos - 10)
-            c.setFont(FONT_NAME, 12)
-            c.drawString(50, y_pos - 30, self.lbl_balance.cget('text'))
-            
-            c.save()
-            import webbrowser
-            webbrowser.open(pdf_path)
-            
-        except Exception as e:
-            messagebox.showwarning("Rapor Hatası", f"Ekstre PDF dosyası oluşturulamadı: {e}")
+        pdf_path = os.path.join(pdf_dir, f"Ekstre_{self.selected_customer_name}_{datetime.now().strftime('%Y%m%d')}.pdf")
+        tasks.submit(
+            self._write_statement_pdf, self.selected_customer_id, self.selected_customer_name, pdf_path,
+            settings['company_name'], self.lbl_balance.cget('text'),
+            title="Ekstre hazırlanıyor", cancellable=True,
+            on_done=open_pdf,
+            on_error=lambda e: messagebox.showwarning("Rapor Hatası", f"Ekstre PDF dosyası oluşturulamadı: {e}"),
+        )
+
+    @staticmethod
+    def _write_statement_pdf(conn, c_id, customer_name, pdf_path, company_name, balance_text):
+        # Arka plan iş parçacığında çalışır: hareketler imleçten parça parça okunup çizilir
+        os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+        columns = [("Tarih", 50, None), ("Tip", 160, None), ("Açıklama", 240, 26),
+                   ("Miktar (₺)", 400, None), ("Bakiye (₺)", 480, None)]
+        rows = (
+            ((date[:16], t_type, desc or "", f"{amount:.2f}", f"{balance:.2f}"), signed)
+            for date, t_type, desc, amount, signed, balance in pdf_export.iter_chunks(ledger.statement(conn, c_id))
+        )
+        pdf_export.write_table(
+            pdf_path, f"CARİ EKSTRE: {customer_name}",
+            [f"Şirket: {company_name}", f"Tarih: {datetime.now().strftime('%Y-%m-%d %H:%M')}"],
+            columns, rows, total_label="bakiye", summary_lines=[balance_text],
+        )
+        return pdf_path
 
 
 # --- 6. Raporlama Modülü (ReportTab) ---
 
+class ExportWindow(tk.Toplevel):
+    """Satış, cari hareket ve ürün verisini CSV / Excel / Parquet dosyasına aktarır."""
+    DATASETS = {
+        "Satışlar (kalemleriyle)": (exports.DATASET_SALES, "Satislar"),
+        "Cari Hareketler": (exports.DATASET_LEDGER, "CariHareketler"),
+        "Ürünler": (exports.DATASET_PRODUCTS, "Urunler"),
+    }
+    FORMATS = {
+        "CSV (Excel uyumlu, ';' ayraçlı)": (exports.FORMAT_CSV, ".csv"),
+        "Excel (XLSX)": (exports.FORMAT_XLSX, ".xlsx"),
+        "Parquet": (exports.FORMAT_PARQUET, ".parquet"),
+    }
+
+    def __init__(self, report_tab):
+        super().__init__(report_tab)
+        self.title("Veri Dışa Aktar")
+        self.transient(report_tab.winfo_toplevel())
+        self.grab_set()
+
+        form_frame = ttk.Frame(self, padding="15")
+        form_frame.pack(expand=True, fill="both")
+
+        ttk.Label(form_frame, text="Veri:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.dataset_var = tk.StringVar(value=next(iter(self.DATASETS)))
+        dataset_combo = ttk.Combobox(form_frame, textvariable=self.dataset_var, state="readonly", width=30,
+                                     values=list(self.DATASETS))
+        dataset_combo.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        dataset_combo.bind('<<ComboboxSelected>>', self._on_dataset_changed)
+
+        ttk.Label(form_frame, text="Biçim:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.format_var = tk.StringVar(value=next(iter(self.FORMATS)))
+        ttk.Combobox(form_frame, textvariable=self.format_var, state="readonly", width=30,
+                     values=list(self.FORMATS)).grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+
+        # Tarih aralığı rapor filtresinden gelir; ürün listesinde kullanılmaz
+        ttk.Label(form_frame, text="Başlangıç Tarihi:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.start_date_entry = ttk.Entry(form_frame, width=15)
+        self.start_date_entry.insert(0, report_tab.start_date_entry.get())
+        self.start_date_entry.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+
+        ttk.Label(form_frame, text="Bitiş Tarihi:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.end_date_entry = ttk.Entry(form_frame, width=15)
+        self.end_date_entry.insert(0, report_tab.end_date_entry.get())
+        self.end_date_entry.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
+        ttk.Button(form_frame, text="Dışa Aktar", command=self.start_export,
+                   style='Accent.TButton').grid(row=4, column=0, columnspan=2, pady=20)
+
+    def _on_dataset_changed(self, event):
+        with_dates = self.DATASETS[self.dataset_var.get()][0] != exports.DATASET_PRODUCTS
+        for entry in (self.start_date_entry, self.end_date_entry):
+            entry.config(state=tk.NORMAL if with_dates else tk.DISABLED)
+
+    def start_export(self):
+        dataset, file_prefix = self.DATASETS[self.dataset_var.get()]
+        file_format, extension = self.FORMATS[self.format_var.get()]
+
+        start_date, end_exclusive = None, None
+        if dataset == exports.DATASET_PRODUCTS:
+            file_name = f"{file_prefix}_{datetime.now().strftime('%Y%m%d')}{extension}"
+        else:
+            start_date, end_date = self.start_date_entry.get(), self.end_date_entry.get()
+            try:
+                datetime.strptime(start_date, '%Y-%m-%d')
+                end_exclusive = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+            except ValueError:
+                messagebox.showerror("Hata", "Lütfen tarihleri YYYY-MM-DD formatında girin.", parent=self)
+                return
+            file_name = f"{file_prefix}_{start_date}_{end_date}{extension}"
+
+        path = filedialog.asksaveasfilename(
+            parent=self, initialdir=load_settings()['pdf_save_path'], initialfile=file_name,
+            defaultextension=extension, filetypes=[(self.format_var.get(), f"*{extension}")]
+        )
+        if not path:
+            return
+
+        # Dışa aktarım arka planda sürer; ilerleme durum çubuğunda izlenir ve iptal edilebilir
+        tasks.submit(
+            exports.export, dataset, file_format, path, start_date, end_exclusive,
+            title="Veri dışa aktarılıyor", cancellable=True,
+            on_done=lambda count: messagebox.showinfo("Başarılı", f"{count} satır dışa aktarıldı:\n{path}"),
+            on_error=lambda e: messagebox.showerror("Dışa Aktarım Hatası", f"Veri dışa aktarılamadı: {e}"),
+        )
+        self.destroy()
+
+
 class ReportTab(ttk.Frame):
+    SALES_REPORT = "Satış Listesi"
+    PRODUCT_REPORT = "Ürün Bazında Satış ve Kâr"
+    # Gruplanmış özetler: rapor adı -> (gruplama, grup sütunu başlığı)
+    GROUPED_REPORTS = {
+        "Günlük Satış Özeti": (reports.GROUP_DAY, "Gün"),
+        "Haftalık Satış Özeti": (reports.GROUP_WEEK, "Hafta"),
+        "Aylık Satış Özeti": (reports.GROUP_MONTH, "Ay"),
+        "Müşteri Bazında Satış": (reports.GROUP_CUSTOMER, "Müşteri"),
+        "Müşteri Tipine Göre Satış": (reports.GROUP_CUSTOMER_TYPE, "Müşteri Tipi"),
+    }
+
     def __init__(self, master):
         super().__init__(master, padding="10")
         self.pack(expand=True, fill="both")
+        self._report_task = None
         self.create_widgets()
 
     def create_widgets(self):
@@ -1153,7 +1577,7 @@ class ReportTab(ttk.Frame):
         
         ttk.Label(control_frame, text="Başlangıç Tarihi (YYYY-MM-DD):").grid(row=0, column=0, padx=5, pady=5)
         self.start_date_entry = ttk.Entry(control_frame, width=15)
-        self.start_date_entry.insert(0, (datetime.now() - pd.DateOffset(months=1)).strftime('%Y-%m-%d'))
+        self.start_date_entry.insert(0, one_month_ago().strftime('%Y-%m-%d'))
         self.start_date_entry.grid(row=0, column=1, padx=5, pady=5)
         
         ttk.Label(control_frame, text="Bitiş Tarihi (YYYY-MM-DD):").grid(row=0, column=2, padx=5, pady=5)
@@ -1163,27 +1587,59 @@ class ReportTab(ttk.Frame):
         
         ttk.Button(control_frame, text="Rapor Oluştur", command=self.generate_report, style='Accent.TButton').grid(row=0, column=4, padx=15, pady=5)
         ttk.Button(control_frame, text="PDF Olarak Kaydet", command=self.save_report_pdf).grid(row=0, column=5, padx=5, pady=5)
-        
-        columns = ("invoice", "date", "customer", "total")
-        self.report_tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
-        
-        self.report_tree.heading("invoice", text="Fatura No")
-        self.report_tree.heading("date", text="Tarih")
-        self.report_tree.heading("customer", text="Müşteri")
-        self.report_tree.heading("total", text="Toplam (₺)")
-        
-        self.report_tree.column("invoice", width=150, anchor=tk.CENTER)
-        self.report_tree.column("date", width=150, anchor=tk.CENTER)
-        self.report_tree.column("customer", width=300, anchor=tk.W)
-        self.report_tree.column("total", width=120, anchor=tk.E)
-        
-        self.report_tree.pack(expand=True, fill="both", pady=10)
+        ttk.Button(control_frame, text="Dışa Aktar...", command=lambda: ExportWindow(self)).grid(row=1, column=5, padx=5, pady=5)
+
+        ttk.Label(control_frame, text="Rapor Türü:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.report_type_var = tk.StringVar(value=self.SALES_REPORT)
+        report_type_combo = ttk.Combobox(control_frame, textvariable=self.report_type_var, state="readonly", width=28,
+                                         values=[self.SALES_REPORT, self.PRODUCT_REPORT, *self.GROUPED_REPORTS])
+        report_type_combo.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky="w")
+        report_type_combo.bind('<<ComboboxSelected>>', self._on_report_type_changed)
+        
+        columns = [
+            ("invoice", "Fatura No", 150, tk.CENTER),
+            ("date", "Tarih", 150, tk.CENTER),
+            ("customer", "Müşteri", 300, tk.W),
+            ("total", "Toplam (₺)", 120, tk.E),
+        ]
+        self.report_grid = VirtualGrid(self, columns, formatter=self._format_report_row, selectmode="browse")
+        self.report_grid.pack(expand=True, fill="both", pady=10)
+
+        product_columns = [
+            ("name", "Ürün", 300, tk.W),
+            ("qty", "Adet", 80, tk.CENTER),
+            ("revenue", "Ciro (₺)", 120, tk.E),
+            ("cost", "Maliyet (₺)", 120, tk.E),
+            ("profit", "Kâr (₺)", 120, tk.E),
+            ("margin", "Marj", 80, tk.E),
+        ]
+        self.product_grid = VirtualGrid(self, product_columns, formatter=self._format_product_report_row, selectmode="browse")
 
-        summary_frame = ttk.Frame(self)
-        summary_frame.pack(fill='x')
-        self.lbl_summary = ttk.Label(summary_frame, text="Toplam Satış: ₺0.00", font=('Arial', 14, 'bold'), foreground="darkorange")
+        grouped_columns = [
+            ("group", "Grup", 300, tk.W),
+            ("count", "Satış Adedi", 100, tk.CENTER),
+            ("total", "Toplam (₺)", 120, tk.E),
+            ("average", "Ortalama (₺)", 120, tk.E),
+        ]
+        self.grouped_grid = VirtualGrid(self, grouped_columns, formatter=self._format_grouped_report_row, selectmode="browse")
+
+        self.summary_frame = ttk.Frame(self)
+        self.summary_frame.pack(fill='x')
+        self.lbl_summary = ttk.Label(self.summary_frame, text="Toplam Satış: ₺0.00", font=('Arial', 14, 'bold'), foreground="darkorange")
         self.lbl_summary.pack(side=tk.LEFT, padx=10, pady=5)
 
+    def _active_grid(self):
+        report_type = self.report_type_var.get()
+        if report_type in self.GROUPED_REPORTS:
+            return self.grouped_grid
+        return self.product_grid if report_type == self.PRODUCT_REPORT else self.report_grid
+
+    def _on_report_type_changed(self, event):
+        for grid in (self.report_grid, self.product_grid, self.grouped_grid):
+            grid.pack_forget()
+        self._active_grid().pack(expand=True, fill="both", pady=10, before=self.summary_frame)
+        self.lbl_summary.config(text="")
+
     def generate_report(self):
         start_date = self.start_date_entry.get()
         end_date = self.end_date_entry.get()
@@ -1195,95 +1651,183 @@ class ReportTab(ttk.Frame):
             messagebox.showerror("Hata", "Lütfen tarihleri YYYY-MM-DD formatında girin.")
             return
 
-        for item in self.report_tree.get_children():
-            self.report_tree.delete(item)
-            
-        conn = get_db_connection()
-        try:
-            query = """
-                SELECT s.invoice_number, s.sale_date, c.name, s.total_amount
-                FROM sales s
-                JOIN customers c ON s.customer_id = c.id
-                WHERE s.sale_date BETWEEN ? AND ? || ' 23:59:59' 
-                ORDER BY s.sale_date DESC
-            """
-            rows = conn.execute(query, (start_date, end_date)).fetchall()
-            
-            total_sales = 0.0
-            
-            for row in rows:
-                invoice, date, customer, total = row
-                total_sales += total
-                
-                self.report_tree.insert("", tk.END, 
-                                        values=(invoice, date[:16], customer, f"{total:.2f}"))
-            
-            self.lbl_summary.config(text=f"TOPLAM SATIŞ ({len(rows)} Adet): ₺{total_sales:.2f}")
-
-        except sqlite3.Error as e:
-            messagebox.showerror("DB Hatası", f"Rapor oluşturulurken hata oluştu: {e}")
-        finally:
-            conn.close()
+        report_type = self.report_type_var.get()
+        args = (start_date, end_date)
+        if report_type in self.GROUPED_REPORTS:
+            query = self._query_grouped_report
+            args += self.GROUPED_REPORTS[report_type]
+            self.grouped_grid.set_heading("group", self.GROUPED_REPORTS[report_type][1])
+        elif report_type == self.PRODUCT_REPORT:
+            query = self._query_product_report
+        else:
+            query = self._query_report
+        if self._report_task is not None:
+            self._report_task.cancel()  # Önceki rapor artık gereksiz
+        self._report_task = tasks.submit(
+            query, *args, title="Rapor hazırlanıyor", cancellable=True,
+            on_done=self._apply_report,
+            on_error=lambda e: messagebox.showerror("DB Hatası", f"Rapor oluşturulurken hata oluştu: {e}"),
+        )
+
+    @staticmethod
+    def _archive_source(conn, start_date, end_exclusive):
+        # Aralık arşivlenmiş yıllara uzanıyorsa arşivler bağlanır; tablo kaydırılırken
+        # sorgu başka bağlantıda çalışacağından aynı hazırlık GridSource'a da verilir
+        years = archive.years_in_range(conn, start_date, end_exclusive)
+        schemas = archive.attach(conn, years)
+        return schemas, lambda c: archive.attach(c, years)
+
+    def _query_report(self, conn, start_date, end_date):
+        # Arka plan iş parçacığında çalışır
+        end_exclusive = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        schemas, prepare = self._archive_source(conn, start_date, end_exclusive)
+        sales, params = archive.union(
+            "SELECT id, invoice_number, customer_id, sale_date, total_amount FROM {schema}.sales "
+            "WHERE sale_date >= ? AND sale_date < ?", (start_date, end_exclusive), schemas
+        )
+        from_clause = f"({sales}) s JOIN customers c ON s.customer_id = c.id"
+
+        # Toplamlar SQL'de hesaplanır; satırlar tabloya yalnızca görünen kadar yüklenir
+        count, total_sales = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(s.total_amount), 0) FROM {from_clause}", params
+        ).fetchone()
+
+        source = GridSource(
+            select="s.invoice_number, s.sale_date, c.name, COALESCE(s.total_amount, 0)",
+            from_clause=from_clause, params=params, key="s.id", prepare=prepare,
+            sort_columns={
+                "invoice": "s.invoice_number", "date": "COALESCE(s.sale_date, '')",
+                "customer": "c.name", "total": "COALESCE(s.total_amount, 0)",
+            },
+            default_sort="date", descending=True,
+        )
+        summary = f"TOPLAM SATIŞ ({count} Adet): ₺{total_sales:.2f}"
+        return self.report_grid, summary, self.report_grid.prefetch(source, conn)
+
+    def _query_product_report(self, conn, start_date, end_date):
+        # Arka plan iş parçacığında çalışır: satış kalemleri ürün bazında SQL'de toplanır
+        end_exclusive = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        schemas, prepare = self._archive_source(conn, start_date, end_exclusive)
+        lines, params = archive.union(
+            "SELECT si.product_id, si.qty, si.unit_price, si.unit_cost "
+            "FROM {schema}.sales s JOIN {schema}.sale_items si ON si.sale_id = s.id "
+            "WHERE s.sale_date >= ? AND s.sale_date < ?", (start_date, end_exclusive), schemas
+        )
+        items = f"""SELECT product_id, SUM(qty) AS qty, SUM(qty * unit_price) AS revenue, SUM(qty * unit_cost) AS cost
+            FROM ({lines}) GROUP BY product_id"""
+
+        qty, revenue, cost = conn.execute(
+            f"SELECT COALESCE(SUM(qty), 0), COALESCE(SUM(revenue), 0), COALESCE(SUM(cost), 0) FROM ({items})", params
+        ).fetchone()
+
+        source = GridSource(
+            select="COALESCE(p.name, 'Silinmiş ürün #' || t.product_id), t.qty, t.revenue, t.cost",
+            from_clause=f"({items}) t LEFT JOIN products p ON p.id = t.product_id", params=params, key="t.product_id",
+            prepare=prepare,
+            sort_columns={
+                "name": "COALESCE(p.name, '')", "qty": "t.qty", "revenue": "t.revenue", "cost": "t.cost",
+                "profit": "t.revenue - t.cost",
+                "margin": "CASE WHEN t.revenue > 0 THEN (t.revenue - t.cost) / t.revenue ELSE 0 END",
+            },
+            default_sort="revenue", descending=True,
+        )
+        profit = revenue - cost
+        margin = profit / revenue * 100 if revenue else 0.0
+        summary = f"CİRO ({qty} Adet): ₺{revenue:.2f}   MALİYET: ₺{cost:.2f}   KÂR: ₺{profit:.2f} (%{margin:.1f})"
+        return self.product_grid, summary, self.product_grid.prefetch(source, conn)
+
+    def _query_grouped_report(self, conn, start_date, end_date, group, heading):
+        # Arka plan iş parçacığında çalışır: gruplar SQL'de toplanır, yalnızca görünen grup satırları okunur
+        end_exclusive = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        schemas, prepare = self._archive_source(conn, start_date, end_exclusive)
+        grouped, params = reports.grouped_sales(group, start_date, end_exclusive, schemas)
+
+        group_count, sale_count, total = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(sale_count), 0), COALESCE(SUM(total), 0) FROM ({grouped})", params
+        ).fetchone()
+
+        by_period = group not in (reports.GROUP_CUSTOMER, reports.GROUP_CUSTOMER_TYPE)
+        source = GridSource(
+            select="g.label, g.sale_count, g.total",
+            from_clause=f"({grouped}) g", params=params, key="g.group_key", prepare=prepare,
+            sort_columns={
+                "group": "g.group_key" if by_period else "g.label", "count": "g.sale_count", "total": "g.total",
+                "average": "g.total / g.sale_count",
+            },
+            default_sort="group" if by_period else "total", descending=not by_period,
+        )
+        average = total / sale_count if sale_count else 0.0
+        summary = f"TOPLAM SATIŞ ({sale_count} Adet, {group_count} {heading}): ₺{total:.2f}   ORTALAMA: ₺{average:.2f}"
+        # Grup sayısı zaten okundu; prefetch() aynı toplamayı COUNT için yeniden çalıştırmasın
+        self.grouped_grid.apply_user_sort(source)
+        return self.grouped_grid, summary, (source, group_count, source.fetch(self.grouped_grid.page_size, conn=conn))
+
+    def _apply_report(self, result):
+        self._report_task = None
+        grid, summary, (source, total, first_page) = result
+        grid.set_source(source, total, first_page)
+        self.lbl_summary.config(text=summary)
+
+    @staticmethod
+    def _format_report_row(row):
+        invoice, date, customer, total = row
+        return (invoice, (date or "")[:16], customer, f"{total:.2f}"), ()
+
+    @staticmethod
+    def _format_product_report_row(row):
+        name, qty, revenue, cost = row
+        profit = revenue - cost
+        margin = f"%{profit / revenue * 100:.1f}" if revenue else "-"
+        return (name, qty, f"{revenue:.2f}", f"{cost:.2f}", f"{profit:.2f}", margin), ()
+
+    @staticmethod
+    def _format_grouped_report_row(row):
+        label, sale_count, total = row
+        return (label, sale_count, f"{total:.2f}", f"{total / sale_count:.2f}" if sale_count else "-"), ()
 
     def save_report_pdf(self):
-        data = []
-        for child in self.report_tree.get_children():
-            data.append(self.report_tree.item(child, 'values'))
-            
-        if not data:
+        # Tablo yalnızca görünen satırları tutar; PDF için veri kaynaktan parça parça okunur
+        grid = self._active_grid()
+        if grid.source is None or not grid.total:
             messagebox.showwarning("Uyarı", "Önce bir rapor oluşturmalısınız.")
             return
-            
+
+        # (başlık, x konumu, en fazla karakter); amount_index: sayfa toplamına giren sütun
+        if grid is self.grouped_grid:
+            report_type = self.report_type_var.get()
+            title, file_prefix, amount_index = report_type, "SatisOzeti", 2
+            layout = [(self.GROUPED_REPORTS[report_type][1], 50, 40), ("Satış Adedi", 300, None),
+                      ("Toplam (₺)", 390, None), ("Ortalama (₺)", 480, None)]
+        elif grid is self.product_grid:
+            title, file_prefix, amount_index = "ÜRÜN BAZINDA SATIŞ RAPORU", "UrunRaporu", 2
+            layout = [("Ürün", 50, 28), ("Adet", 230, None), ("Ciro (₺)", 290, None),
+                      ("Maliyet (₺)", 370, None), ("Kâr (₺)", 450, None), ("Marj", 530, None)]
+        else:
+            title, file_prefix, amount_index = "SATİŞ RAPORU", "SatisRaporu", 3
+            layout = [("Fatura No", 50, None), ("Tarih", 180, None), ("Müşteri", 350, 20), ("Toplam (₺)", 500, None)]
+
         settings = load_settings()
-        pdf_dir = settings['pdf_save_path']
-        
-        try:
-            os.makedirs(pdf_dir, exist_ok=True)
-            pdf_path = os.path.join(pdf_dir, f"SatisRaporu_{self.start_date_entry.get()}_{self.end_date_entry.get()}.pdf")
-            
-            c = canvas.Canvas(pdf_path, pagesize=A4)
-            width, height = A4
-            
-            c.setFont(FONT_NAME, 16)
-            c.drawString(50, height - 50, "SATİŞ RAPORU")
-            c.setFont(FONT_NAME, 10)
-            c.drawString(50, height - 70, f"Şirket: {settings['company_name']}")
-            c.drawString(50, height - 90, f"Tarih Aralığı: {self.start_date_entry.get()} - {self.end_date_entry.get()}")
-            
-            # Tablo Başlıkları
-            y_pos = height - 120
-            c.setFont(FONT_NAME, 10)
-            c.drawString(50, y_pos, "Fatura No")
-            c.drawString(180, y_pos, "Tarih")
-            c.drawString(350, y_pos, "Müşteri")
-            c.drawString(500, y_pos, "Toplam (₺)")
-            
-            c.line(40, y_pos - 5, width - 40, y_pos - 5)
-            
-            # Rapor Listesi
-            y_pos -= 20
-            for invoice, date, customer, total in data:
-                c.drawString(50, y_pos, invoice)
-                c.drawString(180, y_pos, date)
-                c.drawString(350, y_pos, customer[:20])
-                c.drawString(500, y_pos, total)
-                y_pos -= 15
-                if y_pos < 50:
-                    c.showPage()
-                    y_pos = height - 50
-                    c.setFont(FONT_NAME, 10)
-            
-            # Özet
-            c.line(40, y_pos - 10, width - 40, y_pos - 10)
-            c.setFont(FONT_NAME, 12)
-            c.drawString(50, y_pos - 30, self.lbl_summary.cget('text'))
-            
-            c.save()
-            import webbrowser
-            webbrowser.open(pdf_path)
-            
-        except Exception as e:
-            messagebox.showwarning("PDF Hatası", f"Rapor PDF dosyası oluşturulamadı: {e}")
+        start_date, end_date = self.start_date_entry.get(), self.end_date_entry.get()
+        pdf_path = os.path.join(settings['pdf_save_path'], f"{file_prefix}_{start_date}_{end_date}.pdf")
+        info_lines = [f"Şirket: {settings['company_name']}", f"Tarih Aralığı: {start_date} - {end_date}"]
+        # Kullanıcı PDF yazılırken sıralamayı değiştirebilir; kaynağın o anki hali kopyalanır
+        source = copy.copy(grid.source)
+        tasks.submit(
+            self._write_report_pdf, source, grid.formatter, amount_index, pdf_path, title, info_lines, layout,
+            self.lbl_summary.cget('text'), grid.total,
+            title="Rapor PDF'i hazırlanıyor", cancellable=True,
+            on_done=open_pdf,
+            on_error=lambda e: messagebox.showwarning("PDF Hatası", f"Rapor PDF dosyası oluşturulamadı: {e}"),
+        )
+
+    @staticmethod
+    def _write_report_pdf(conn, source, formatter, amount_index, pdf_path, title, info_lines, layout, summary, total_rows):
+        # Arka plan iş parçacığında çalışır
+        os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+        rows = ((formatter(row)[0], row[amount_index]) for row in source.iter_rows(pdf_export.CHUNK_SIZE, conn=conn))
+        pdf_export.write_table(pdf_path, title, info_lines, layout, rows, summary_lines=[summary],
+                               expected_rows=total_rows)
+        return pdf_path
 
 
 # --- 7. Ana Uygulama Sınıfı (StokTakipApp) ---
@@ -1291,9 +1835,9 @@ class ReportTab(ttk.Frame):
 class StokTakipApp(ThemedTk):
     def __init__(self):
         super().__init__(theme="arc") 
+        self.withdraw()  # Ana pencere açılış aşamaları bitince gösterilir
         self.title("Stok ve Satış Takip Sistemi (Hata Giderildi)")
         self.geometry("1200x800")
-        self.state('zoomed')  # Tam ekran (maximized) modunda aç
 
         # Uygulama ikonu ayarla
         try:
@@ -1302,56 +1846,124 @@ class StokTakipApp(ThemedTk):
         except Exception as e:
             print(f"İkon yüklenirken hata: {e}")
 
-        setup_database() # KRİTİK: DB Şema Kontrolü burada yapılıyor
         self.settings = load_settings()
-        
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        tasks.init(self) # Sekmeler DB sorgularını bu yürütücüye gönderir
+
+        # Açılış işleri arayüz iş parçacığı dışında çalışır; giriş ekranı gerçek ilerlemeyi gösterir
+        self.splash = SplashScreen(self, self.settings.get("company_name", ""))
+        startup.StartupPipeline(self, [
+            # PRAGMA ayarları bağlantı açılmadan önce uygulanır
+            ("Ayarlar uygulanıyor", lambda context: db.configure(self.settings.get("database"))),
+            ("Veritabanı şeması kontrol ediliyor", lambda context: setup_database()),
+            ("Bekleyen satışlar aktarılıyor", lambda context: open_sale_journal(self.settings)),
+            ("Yazı tipleri yükleniyor", lambda context: invoices.register_font()),
+            ("Önbellek hazırlanıyor", lambda context: warm_database_cache()),
+            ("Kontrol paneli verileri yükleniyor",
+             lambda context: context.update(dashboard_stats=DashboardTab._query_stats(db.get_read_connection()))),
+        ], on_progress=self.splash.set_stage, on_done=self._build_main_window, on_error=self._startup_failed).start()
+
+    def _build_main_window(self, context):
         style = ttk.Style()
         style.configure('Accent.TButton', font=('Arial', 10, 'bold'), foreground='blue') 
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(pady=10, padx=10, expand=True, fill="both")
-        
-        self._create_tabs()
-        
-    def _create_tabs(self):
-        
-        self.dashboard_frame = DashboardTab(self.notebook)
-        self.notebook.add(self.dashboard_frame, text="📈 Kontrol Paneli")
-
-        self.product_frame = ProductTab(self.notebook) 
-        self.notebook.add(self.product_frame, text="📦 Ürün Yönetimi")
 
-        self.sales_frame = SalesTab(self.notebook)
-        self.notebook.add(self.sales_frame, text="🛒 Satış İşlemleri")
+        self.task_status = tasks.TaskStatusBar(self, tasks.get_runner(), before=self.notebook)
+        invoices.init(self) # Önceki oturumda çizilemeyen faturalar yeniden denenir
+        journal.start(self, self._on_sales_applied)
+        backup.start(self.settings)
+        maintenance.start(self) # Kullanıcı boştayken checkpoint, optimize, vacuum
         
-        self.customer_frame = CustomerTab(self.notebook)
-        self.notebook.add(self.customer_frame, text="👥 Müşteri Yönetimi")
+        self._create_tabs(context.get("dashboard_stats"))
 
-        self.ledger_frame = LedgerTab(self.notebook)
-        self.notebook.add(self.ledger_frame, text="💰 Cari İşlemler")
-        
-        self.report_frame = ReportTab(self.notebook)
-        self.notebook.add(self.report_frame, text="📰 Raporlama")
-
-        self.settings_frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(self.settings_frame, text="⚙️ Ayarlar")
-        self._setup_settings_tab()
-        
+        self.splash.destroy()
+        self.deiconify()
+        self.state('zoomed')  # Tam ekran (maximized) modunda aç
+        startup.mark("ana pencere")
+        startup.report()
+
+    def _on_sales_applied(self, results):
+        # Günlükten veritabanına aktarılan satışlar; sekmeler yalnızca değişen kayıtları günceller
+        conflicts = [result for result in results if result.conflict]
+        if conflicts:
+            events.publish(events.SALE_CONFLICT, [journal.entry_key(result.entry) for result in conflicts], events.INSERT)
+            events.publish(events.PRODUCT, {item['id'] for result in conflicts for item in result.entry['items']}, events.UPDATE)
+            messagebox.showwarning("Stok Çakışması", "Aşağıdaki satışlar başka kasada tükenen stok nedeniyle "
+                                   "veritabanına işlenemedi ve Satış sekmesindeki 'Stok Çakışmaları' listesine alındı:\n" +
+                                   "\n".join(f"{result.invoice_number}:\n{result.conflict}" for result in conflicts))
+        applied = [result for result in results if result.sale_id is not None]
+        if not applied:
+            return
+        renumbered = [result for result in applied if result.renumbered]
+        if renumbered:
+            messagebox.showwarning("Fatura Numarası Değişti", "Aşağıdaki satışların numarası veritabanında kullanılmış "
+                                   "olduğundan yeni numarayla kaydedildi:\n" + "\n".join(
+                                       f"- {result.entry['invoice_number']} -> {result.invoice_number}" for result in renumbered))
+        # Fatura işi satışla aynı işlemde kuyruğa yazıldı; çizim ancak şimdi başlar, böylece
+        # çizim sonrası silinen kuyruk satırı sonradan yeniden eklenmez
+        for result in applied:
+            invoices.submit(result.invoice_payload())
+        customer_ids = {result.entry['customer_id'] for result in applied if result.entry['customer_id'] != 1}
+        events.publish(events.SALE, [result.sale_id for result in applied], events.INSERT)
+        events.publish(events.PRODUCT, {item['id'] for result in applied for item in result.entry['items']}, events.UPDATE)
+        if customer_ids:
+            events.publish(events.CUSTOMER, customer_ids, events.UPDATE)
+            events.publish(events.LEDGER, customer_ids, events.INSERT)
+
+    def _startup_failed(self, stage, error):
+        self.splash.destroy()
+        if isinstance(error, sqlite3.Error):
+            messagebox.showerror("KRİTİK Veritabanı Hatası", f"Veritabanı kurulumu/güncellemesi başarısız oldu: {error}")
+        else:
+            messagebox.showerror("KRİTİK HATA", f"Uygulama başlatılırken beklenmedik bir hata oluştu ({stage}): {error}")
+        self._on_close()
+        
+    def _create_tabs(self, dashboard_stats=None):
+        # Sekmeler ilk seçildiklerinde kurulur; açılışta yalnızca kontrol paneli oluşturulur ve veri yükler
+        tab_specs = [
+            ("dashboard_frame", "📈 Kontrol Paneli", lambda master: DashboardTab(master, dashboard_stats)),
+            ("product_frame", "📦 Ürün Yönetimi", ProductTab),
+            ("sales_frame", "🛒 Satış İşlemleri", SalesTab),
+            ("customer_frame", "👥 Müşteri Yönetimi", CustomerTab),
+            ("ledger_frame", "💰 Cari İşlemler", LedgerTab),
+            ("report_frame", "📰 Raporlama", ReportTab),
+            ("settings_frame", "⚙️ Ayarlar", self._build_settings_tab),
+        ]
+        self._pending_tabs = {}
+        self._tabs = {}
+        self._shown_tab = None
+        for attr, text, factory in tab_specs:
+            setattr(self, attr, None)
+            holder = ttk.Frame(self.notebook)
+            self.notebook.add(holder, text=text)
+            self._pending_tabs[str(holder)] = (attr, factory)
+
+        self._on_tab_change()
         self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_change)
 
+    def _build_settings_tab(self, master):
+        self.settings_frame = ttk.Frame(master, padding="10")
+        self.settings_frame.pack(expand=True, fill="both")
+        self._setup_settings_tab()
+        return self.settings_frame
 
-    def _on_tab_change(self, event):
-        selected_tab_id = self.notebook.select()
-        tab_name = self.notebook.tab(selected_tab_id, "text")
-
-        if "Kontrol Paneli" in tab_name:
-            self.dashboard_frame.load_stats()
-        elif "Ürün Yönetimi" in tab_name:
-            self.product_frame.load_products()
-        elif "Müşteri Yönetimi" in tab_name:
-            self.customer_frame.load_customers()
-        elif "Cari İşlemler" in tab_name:
-            self.ledger_frame.load_customer_list() 
+    def _on_tab_change(self, event=None):
+        selected = self.notebook.select()
+        if selected == self._shown_tab:
+            return
+        self._shown_tab = selected
+
+        if selected in self._pending_tabs:
+            attr, factory = self._pending_tabs.pop(selected)
+            tab = factory(self.nametowidget(selected))
+            setattr(self, attr, tab)
+            self._tabs[selected] = tab
+        # Sekmeler gizliyken gelen değişiklikleri yalnızca gösterildiklerinde uygular
+        tab = self._tabs[selected]
+        if hasattr(tab, "on_shown"):
+            tab.on_shown()
 
     def _setup_settings_tab(self):
         current_settings = self.settings
@@ -1369,9 +1981,257 @@ class StokTakipApp(ThemedTk):
         self.entry_pdf_path.insert(0, current_settings.get("pdf_save_path", ""))
         self.entry_pdf_path.pack(side=tk.LEFT, fill='x', expand=True)
         ttk.Button(path_frame, text="Gözat", command=self._browse_pdf_path).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(self.settings_frame, text="Fatura Seri Kodu (her kasada farklı, ör. TR1, TR2):").pack(anchor='w', padx=20, pady=(10,0))
+        self.entry_invoice_series = tk.Entry(self.settings_frame, width=10)
+        self.entry_invoice_series.insert(0, current_settings.get("invoice_series", invoice_numbers.DEFAULT_SERIES))
+        self.entry_invoice_series.pack(anchor='w', padx=20)
+
+        # Veritabanı performans ayarları (PRAGMA)
+        db_settings = db.get_settings()
+        db_frame = ttk.LabelFrame(self.settings_frame, text="Veritabanı Performans Ayarları", padding="10")
+        db_frame.pack(anchor='w', padx=20, pady=(15, 0), fill='x')
+
+        ttk.Label(db_frame, text="Önbellek Boyutu (MB):").grid(row=0, column=0, padx=5, pady=3, sticky="w")
+        self.entry_cache_size = ttk.Entry(db_frame, width=10)
+        self.entry_cache_size.insert(0, str(abs(db_settings["cache_size"]) // 1024))
+        self.entry_cache_size.grid(row=0, column=1, padx=5, pady=3, sticky="w")
+
+        ttk.Label(db_frame, text="Bellek Eşleme / mmap (MB):").grid(row=1, column=0, padx=5, pady=3, sticky="w")
+        self.entry_mmap_size = ttk.Entry(db_frame, width=10)
+        self.entry_mmap_size.insert(0, str(db_settings["mmap_size"] // (1024 * 1024)))
+        self.entry_mmap_size.grid(row=1, column=1, padx=5, pady=3, sticky="w")
+
+        ttk.Label(db_frame, text="Geçici Tablolar:").grid(row=2, column=0, padx=5, pady=3, sticky="w")
+        self.temp_store_var = tk.StringVar(value=db_settings["temp_store"])
+        ttk.Combobox(db_frame, textvariable=self.temp_store_var, values=["MEMORY", "FILE", "DEFAULT"], state="readonly", width=10).grid(row=2, column=1, padx=5, pady=3, sticky="w")
+
+        # Yazma kilidi beklemeleri (çok kasalı kullanımda çakışmaları izlemek için)
+        self.lbl_lock_metrics = ttk.Label(db_frame, text="")
+        self.lbl_lock_metrics.grid(row=3, column=0, columnspan=2, padx=5, pady=(8, 3), sticky="w")
+        ttk.Button(db_frame, text="Yenile", command=self._refresh_lock_metrics).grid(row=3, column=2, padx=5, pady=(8, 3))
+        self._refresh_lock_metrics()
+
+        # Çalışırken yedekleme ve geri yükleme
+        backup_settings = backup.backup_settings(current_settings)
+        backup_frame = ttk.LabelFrame(self.settings_frame, text="Yedekleme", padding="10")
+        backup_frame.pack(anchor='w', padx=20, pady=(15, 0), fill='x')
+
+        self.backup_enabled_var = tk.BooleanVar(value=backup_settings["enabled"])
+        ttk.Checkbutton(backup_frame, text="Otomatik yedek al (aynı veritabanını kullanan kasalardan yalnızca birinde açın)",
+                        variable=self.backup_enabled_var).grid(row=0, column=0, columnspan=3, padx=5, pady=3, sticky="w")
+
+        ttk.Label(backup_frame, text="Yedek Klasörü:").grid(row=1, column=0, padx=5, pady=3, sticky="w")
+        self.entry_backup_dir = ttk.Entry(backup_frame, width=40)
+        self.entry_backup_dir.insert(0, backup_settings["dir"])
+        self.entry_backup_dir.grid(row=1, column=1, padx=5, pady=3, sticky="w")
+        ttk.Button(backup_frame, text="Gözat", command=self._browse_backup_dir).grid(row=1, column=2, padx=5, pady=3)
+
+        ttk.Label(backup_frame, text="Yedekleme Aralığı (dk):").grid(row=2, column=0, padx=5, pady=3, sticky="w")
+        self.entry_backup_interval = ttk.Entry(backup_frame, width=10)
+        self.entry_backup_interval.insert(0, str(backup_settings["interval_minutes"]))
+        self.entry_backup_interval.grid(row=2, column=1, padx=5, pady=3, sticky="w")
+
+        self.lbl_backup_status = ttk.Label(backup_frame, text="")
+        self.lbl_backup_status.grid(row=3, column=0, columnspan=2, padx=5, pady=3, sticky="w")
+        ttk.Button(backup_frame, text="Şimdi Yedekle", command=self._backup_now).grid(row=3, column=2, padx=5, pady=3)
+
+        ttk.Label(backup_frame, text="Yedekler:").grid(row=4, column=0, padx=5, pady=3, sticky="w")
+        self.backup_combo = ttk.Combobox(backup_frame, state="readonly", width=40)
+        self.backup_combo.grid(row=4, column=1, padx=5, pady=3, sticky="w")
+        ttk.Button(backup_frame, text="Geri Yükle", command=self._restore_backup).grid(row=4, column=2, padx=5, pady=3)
+        self._refresh_backup_status()
+
+        # Kapanmış yılların arşive taşınması
+        archive_frame = ttk.LabelFrame(self.settings_frame, text="Mali Yıl Arşivi", padding="10")
+        archive_frame.pack(anchor='w', padx=20, pady=(15, 0), fill='x')
+        self.lbl_archived_years = ttk.Label(archive_frame, text="")
+        self.lbl_archived_years.grid(row=0, column=0, columnspan=3, padx=5, pady=3, sticky="w")
+        ttk.Label(archive_frame, text="Arşivlenecek Yıl:").grid(row=1, column=0, padx=5, pady=3, sticky="w")
+        self.archive_year_combo = ttk.Combobox(archive_frame, state="readonly", width=10)
+        self.archive_year_combo.grid(row=1, column=1, padx=5, pady=3, sticky="w")
+        ttk.Button(archive_frame, text="Arşivle", command=self._archive_year).grid(row=1, column=2, padx=5, pady=3)
+        self._refresh_archive_info()
+
+        # Boşta çalışan bakım işlerinin son durumu
+        maintenance_frame = ttk.LabelFrame(self.settings_frame, text="Veritabanı Bakımı", padding="10")
+        maintenance_frame.pack(anchor='w', padx=20, pady=(15, 0), fill='x')
+        self.lbl_maintenance = ttk.Label(maintenance_frame, text="", justify=tk.LEFT)
+        self.lbl_maintenance.grid(row=0, column=0, padx=5, pady=3, sticky="w")
+        ttk.Button(maintenance_frame, text="Yenile", command=self._refresh_maintenance_info).grid(row=0, column=1, padx=5, pady=3, sticky="n")
+        self._refresh_maintenance_info()
+
+        # Müşteri bakiyeleri ile cari hareketlerin mutabakatı (bakım işi olarak her gün de çalışır)
+        reconcile_frame = ttk.LabelFrame(self.settings_frame, text="Bakiye Mutabakatı", padding="10")
+        reconcile_frame.pack(anchor='w', padx=20, pady=(15, 0), fill='x')
+        self.lbl_drift = ttk.Label(reconcile_frame, text="", justify=tk.LEFT)
+        self.lbl_drift.grid(row=0, column=0, columnspan=3, padx=5, pady=3, sticky="w")
+        ttk.Button(reconcile_frame, text="Şimdi Denetle", command=self._verify_balances).grid(row=1, column=0, padx=5, pady=3, sticky="w")
+        ttk.Button(reconcile_frame, text="Tam Denetim", command=lambda: self._verify_balances(full=True)).grid(row=1, column=1, padx=5, pady=3, sticky="w")
+        self.btn_repair_balances = ttk.Button(reconcile_frame, text="Bakiyeleri Düzelt", command=self._repair_balances)
+        self.btn_repair_balances.grid(row=1, column=2, padx=5, pady=3, sticky="w")
+        self._refresh_drift_info()
         
         ttk.Button(self.settings_frame, text="Ayarları Kaydet", command=self._save_settings_action).pack(pady=20, padx=20)
 
+    def _refresh_lock_metrics(self):
+        m = db.lock_metrics()
+        self.lbl_lock_metrics.config(text=(
+            f"Yazma: {m['transactions']}  |  Ort. bekleme: {m['wait_ms_avg']:.1f} ms  |  "
+            f"En uzun: {m['wait_ms_max']:.1f} ms  |  Yeniden deneme: {m['retries']}  |  Başarısız: {m['failures']}"
+        ))
+
+    def _refresh_backup_status(self):
+        status = backup.get_scheduler().status()
+        if status["running"]:
+            text = "Yedek alınıyor..."
+        elif status["last_error"]:
+            text = f"Son yedek başarısız: {status['last_error']}"
+        elif status["last_path"]:
+            text = f"Son yedek: {os.path.basename(status['last_path'])} ({status['last_duration_s']:.0f} sn)"
+        else:
+            text = "Bu oturumda yedek alınmadı."
+        self.lbl_backup_status.config(text=text)
+
+        self._backup_paths = []
+        values = []
+        for taken_at, path, size in backup.list_backups(backup.backup_settings(self.settings)["dir"]):
+            self._backup_paths.append(path)
+            values.append(f"{taken_at:%Y-%m-%d %H:%M:%S}  ({size / (1024 * 1024):.1f} MB)")
+        self.backup_combo.config(values=values)
+        if values and self.backup_combo.current() < 0:
+            self.backup_combo.current(0)
+
+        # Süren yedek bitene kadar durum yenilenir
+        if status["running"]:
+            self.after(1000, self._refresh_backup_status)
+
+    def _backup_now(self):
+        backup.get_scheduler().request_now()
+        self._refresh_backup_status()
+
+    def _restore_backup(self):
+        index = self.backup_combo.current()
+        if index < 0:
+            messagebox.showwarning("Uyarı", "Lütfen geri yüklenecek yedeği seçin.")
+            return
+        path = self._backup_paths[index]
+        if not messagebox.askyesno(
+            "Geri Yükleme Onayı",
+            f"Veritabanı '{self.backup_combo.get()}' tarihli yedekle değiştirilecek. Bu yedekten sonraki tüm kayıtlar "
+            "kaybolur ve uygulama kapanır.\nDiğer kasaların kapalı olduğundan emin olun. Devam edilsin mi?"
+        ):
+            return
+        # Geri yükleme sırasında yedek alınmaz ve günlükteki satışlar aktarılmaz (açılışta aktarılır)
+        backup.stop()
+        journal.stop()
+        maintenance.stop()
+        tasks.submit(
+            lambda conn: backup.restore_backup(path), title="Yedek geri yükleniyor",
+            on_done=lambda _: self._on_restored(),
+            on_error=lambda e: messagebox.showerror("Geri Yükleme Hatası", f"Yedek geri yüklenemedi: {e}\nUygulamayı yeniden başlatın."),
+        )
+
+    def _on_restored(self):
+        messagebox.showinfo("Başarılı", "Yedek geri yüklendi. Uygulama kapanacak; lütfen yeniden açın.")
+        self._on_close()
+
+    def _refresh_archive_info(self):
+        conn = db.get_read_connection()
+        archived = archive.archived_years(conn)
+        if archived:
+            self.lbl_archived_years.config(text="Arşivlenmiş yıllar: " + ", ".join(
+                f"{year} ({sales} satış, {ledger} cari hareket)" for year, (sales, ledger) in archived.items()
+            ))
+        else:
+            self.lbl_archived_years.config(text="Henüz arşivlenmiş yıl yok.")
+        years = archive.archivable_years(conn)
+        self.archive_year_combo.config(values=years)
+        self.archive_year_combo.set(years[0] if years else "")
+
+    def _archive_year(self):
+        if not self.archive_year_combo.get():
+            messagebox.showwarning("Uyarı", "Arşivlenecek kapanmış bir yıl bulunmuyor.")
+            return
+        year = int(self.archive_year_combo.get())
+        if not messagebox.askyesno(
+            "Arşivleme Onayı",
+            f"{year} yılının satışları ve cari hareketleri arşiv dosyasına taşınacak. Müşteri bakiyeleri, "
+            f"{year + 1} başına tarihli devir hareketleriyle korunur; raporlar arşivi otomatik kullanır.\n"
+            "Önce yedek alınması önerilir. Devam edilsin mi?"
+        ):
+            return
+        tasks.submit(
+            lambda conn: archive.archive_year(year), title=f"{year} yılı arşivleniyor",
+            on_done=lambda counts: self._on_year_archived(year, *counts),
+            on_error=lambda e: messagebox.showerror("Arşivleme Hatası", f"{year} yılı arşivlenemedi: {e}"),
+        )
+
+    def _on_year_archived(self, year, sale_count, ledger_count):
+        self._refresh_archive_info()
+        events.publish(events.SALE, (), events.DELETE)
+        events.publish(events.LEDGER, (), events.UPDATE)
+        messagebox.showinfo("Başarılı", f"{year} yılı arşivlendi: {sale_count} satış, {ledger_count} cari hareket taşındı.")
+
+    def _refresh_maintenance_info(self):
+        runs = maintenance.last_runs(db.get_read_connection())
+        if not runs:
+            self.lbl_maintenance.config(text="Henüz bakım yapılmadı (uygulama boştayken otomatik çalışır).")
+            return
+        self.lbl_maintenance.config(text="\n".join(
+            f"{job}: {started_at}  ({duration_ms:.0f} ms, {reclaimed / (1024 * 1024):.1f} MB geri kazanıldı)"
+            for job, (started_at, duration_ms, reclaimed) in sorted(runs.items())
+        ))
+
+    def _refresh_drift_info(self):
+        rows = reconcile.drift(db.get_read_connection())
+        self.btn_repair_balances.config(state=tk.NORMAL if rows else tk.DISABLED)
+        if not rows:
+            self.lbl_drift.config(text="Son denetimde uyuşmazlık bulunmadı.")
+            return
+        lines = [f"{name}: kayıtlı ₺{stored:.2f}, hareketlerden ₺{ledger_balance:.2f}"
+                 for _, name, stored, ledger_balance, _ in rows[:10]]
+        if len(rows) > 10:
+            lines.append(f"... ve {len(rows) - 10} müşteri daha")
+        self.lbl_drift.config(text=f"{len(rows)} müşteride bakiye uyuşmuyor ({rows[0][4]}):\n" + "\n".join(lines))
+
+    def _verify_balances(self, full=False):
+        tasks.submit(
+            lambda conn: reconcile.verify(conn, full), title="Bakiyeler denetleniyor", write=True,
+            on_done=self._on_balances_verified,
+            on_error=lambda e: messagebox.showerror("DB Hatası", f"Bakiyeler denetlenemedi: {e}"),
+        )
+
+    def _on_balances_verified(self, mismatches):
+        self._refresh_drift_info()
+        if mismatches:
+            messagebox.showwarning("Bakiye Mutabakatı", f"{len(mismatches)} müşterinin bakiyesi cari hareketlerle uyuşmuyor.")
+        else:
+            messagebox.showinfo("Bakiye Mutabakatı", "Tüm müşteri bakiyeleri cari hareketlerle uyuşuyor.")
+
+    def _repair_balances(self):
+        if not messagebox.askyesno(
+            "Düzeltme Onayı",
+            "Uyuşmayan müşteri bakiyeleri cari hareketlerden yeniden hesaplanan değerle değiştirilecek. Devam edilsin mi?"
+        ):
+            return
+        tasks.submit(
+            reconcile.repair, title="Bakiyeler düzeltiliyor", write=True,
+            on_done=self._on_balances_repaired,
+            on_error=lambda e: messagebox.showerror("DB Hatası", f"Bakiyeler düzeltilemedi: {e}"),
+        )
+
+    def _on_balances_repaired(self, customer_ids):
+        self._refresh_drift_info()
+        events.publish(events.CUSTOMER, customer_ids, events.UPDATE)
+        messagebox.showinfo("Başarılı", f"{len(customer_ids)} müşterinin bakiyesi düzeltildi.")
+
+    def _browse_backup_dir(self):
+        folder_selected = filedialog.askdirectory()
+        if folder_selected:
+            self.entry_backup_dir.delete(0, tk.END)
+            self.entry_backup_dir.insert(0, folder_selected)
+
     def _browse_pdf_path(self):
         folder_selected = filedialog.askdirectory()
         if folder_selected:
@@ -1379,21 +2239,79 @@ class StokTakipApp(ThemedTk):
             self.entry_pdf_path.insert(0, folder_selected)
 
     def _save_settings_action(self):
-        new_settings = {
+        try:
+            cache_mb = int(self.entry_cache_size.get())
+            mmap_mb = int(self.entry_mmap_size.get())
+        except ValueError:
+            messagebox.showerror("Hata", "Önbellek ve mmap boyutları tam sayı (MB) olmalıdır.")
+            return
+        try:
+            backup_interval = int(self.entry_backup_interval.get())
+            if backup_interval <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Hata", "Yedekleme aralığı pozitif bir tam sayı (dakika) olmalıdır.")
+            return
+        try:
+            invoice_series = invoice_numbers.normalize_series(self.entry_invoice_series.get())
+        except ValueError as e:
+            messagebox.showerror("Hata", str(e))
+            return
+
+        db_settings = dict(self.settings.get("database", {}))
+        db_settings.update({
+            "cache_size": -abs(cache_mb) * 1024,  # Negatif değer KiB cinsindendir
+            "mmap_size": abs(mmap_mb) * 1024 * 1024,
+            "temp_store": self.temp_store_var.get(),
+        })
+
+        # Bilinmeyen anahtarlar (ör. elle eklenen ayarlar) korunur
+        new_settings = dict(self.settings)
+        new_settings.update({
             "company_name": self.entry_company_name.get(),
-            "pdf_save_path": self.entry_pdf_path.get()
-        }
-        
+            "pdf_save_path": self.entry_pdf_path.get(),
+            "invoice_series": invoice_series,
+            "database": db_settings,
+            "backup": dict(self.settings.get("backup", {}), enabled=self.backup_enabled_var.get(),
+                           dir=self.entry_backup_dir.get(), interval_minutes=backup_interval),
+        })
+
+        if invoice_series != journal.get_journal().series:
+            # Yeni seri önce bu kasaya ayrılır; başka kasanınsa ayarlar kaydedilmez
+            tasks.submit(
+                claim_invoice_series, invoice_series, ensure_register_id(new_settings),
+                title="Fatura serisi ayrılıyor", write=True,
+                on_done=lambda _: self._apply_settings(new_settings),
+                on_error=lambda e: messagebox.showerror("Fatura Serisi", f"Ayarlar kaydedilmedi: {e}"),
+            )
+            return
+        self._apply_settings(new_settings)
+
+    def _apply_settings(self, new_settings):
+        database_changed = new_settings.get("database") != self.settings.get("database")
         save_settings(new_settings)
         self.settings = new_settings 
+        if database_changed:
+            # Yalnızca bağlantı ayarları değiştiyse bağlantılar yeni ayarlarla yeniden açılır
+            db.configure(new_settings["database"])
+        backup.get_scheduler().configure(backup.backup_settings(new_settings))
         messagebox.showinfo("Başarılı", "Ayarlar başarıyla kaydedildi!")
 
+    def _on_close(self):
+        maintenance.stop()
+        backup.stop()
+        journal.stop()
+        invoices.shutdown()
+        tasks.shutdown()
+        db.close_all()
+        self.destroy()
+
 
 # --- 8. Giriş Ekranı (Splash Screen) ---
 
 class SplashScreen(tk.Toplevel):
-    def __init__(self, company_name):
-        super().__init__()
+    def __init__(self, master, company_name):
+        super().__init__(master)
         self.overrideredirect(True)  # Kenarlık olmadan
         self.geometry("450x350+500+250")  # Daha büyük ve ortada
         self.configure(bg='#f0f0f0')  # Açık gri arka plan
@@ -1430,14 +2348,19 @@ class SplashScreen(tk.Toplevel):
         self.lbl_percent.pack(pady=5)
 
         self.update()
-        self.after(3000, self.destroy)  # 3 saniye sonra kapat
+
+    def set_stage(self, index, total, title):
+        """Açılış aşaması başladığında çağrılır; ilerleme tamamlanan aşama sayısıdır."""
+        self.lbl_status.config(text=f"{title}...")
+        self.progress.config(maximum=total, value=index)
+        self.lbl_percent.config(text=f"{index * 100 // total}%")
 
 
 # --- 9. Uygulamayı Çalıştırma ---
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # PyInstaller paketinde fatura çizim süreci için gerekli
     try:
-        settings = load_settings()
         app = StokTakipApp()
         app.mainloop()
     except Exception as e:
@@ -0,0 +1,265 @@
+"""Boşta çalışan veritabanı bakımı.
+
+Kullanıcı IDLE_SECONDS boyunca klavye/fareye dokunmadığında, vadesi gelen
+bakım işleri kısa dilimler halinde arka plan görevi olarak çalıştırılır:
+
+- checkpoint: WAL dosyasını ana dosyaya işler ve kısaltır
+- optimize: PRAGMA optimize (gereken tabloların istatistiklerini günceller)
+- analyze: haftalık tam ANALYZE, her dilimde bir tablo
+- reconcile: günlük bakiye mutabakatı (reconcile.py), yalnızca yeni hareketler
+- incremental_vacuum: boş sayfaları her dilimde VACUUM_PAGES sayfa geri verir
+- vacuum: auto_vacuum kapalı eski veritabanlarında bir kez tam VACUUM
+  (yalnızca boş alan büyükse ve kullanıcı uzun süredir boştaysa)
+
+Kullanıcı bir tuşa/fareye dokunduğu anda çalışan dilim iptal edilir (SQL
+ifadesi kesilir ve işlem geri alınır); kalan dilimler bir sonraki boşta
+devam eder. Her işin süresi ve geri kazanılan alan maintenance_log tablosuna
+yazılır; aynı DB'yi kullanan kasalar aynı işi tekrar yapmaz.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import db
+import reconcile
+import tasks
+
+IDLE_SECONDS = 120
+LONG_IDLE_SECONDS = 600     # Tam VACUUM için
+CHECK_MS = 15000
+NEXT_SLICE_MS = 100
+
+# Vade aralıkları (sn)
+INTERVALS = {
+    "checkpoint": 15 * 60,
+    "optimize": 6 * 3600,
+    "analyze": 7 * 86400,
+    "reconcile": 86400,
+}
+VACUUM_PAGES = 2048             # Dilim başına geri verilecek boş sayfa
+MIN_FREE_PAGES = 256            # Bunun altındaki boş alan için uğraşılmaz
+FULL_VACUUM_FREE_RATIO = 0.2    # auto_vacuum kapalıysa tam VACUUM eşiği
+LOG_RETENTION_DAYS = 90
+
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def create_maintenance_schema(conn):
+    """maintenance_log tablosunu oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS maintenance_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        duration_ms REAL NOT NULL,
+        reclaimed_bytes INTEGER NOT NULL DEFAULT 0
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_job ON maintenance_log(job, started_at)")
+
+
+def last_runs(conn):
+    """Her iş için son çalışma {iş: (başlangıç, süre ms, geri kazanılan bayt)}."""
+    return {job: (started_at, duration_ms, reclaimed) for job, started_at, duration_ms, reclaimed in conn.execute(
+        "SELECT job, started_at, duration_ms, reclaimed_bytes FROM maintenance_log m "
+        "WHERE id = (SELECT MAX(id) FROM maintenance_log WHERE job = m.job)"
+    )}
+
+
+def _db_size(conn):
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    wal_path = db.get_db_path() + "-wal"
+    return page_count * page_size + (os.path.getsize(wal_path) if os.path.exists(wal_path) else 0)
+
+
+class MaintenanceScheduler:
+    """Kullanıcı boştayken vadesi gelen bakım dilimlerini sırayla çalıştırır."""
+
+    def __init__(self, root):
+        self.root = root
+        self._last_activity = time.monotonic()
+        self._task = None
+        self._after_id = None
+        self._analyze_queue = []
+        self._analyze_started = None    # (başlangıç zamanı, toplam süre ms)
+        self._stopped = False
+
+    def start(self):
+        for sequence in ("<Any-KeyPress>", "<Any-ButtonPress>", "<Motion>", "<MouseWheel>"):
+            self.root.bind_all(sequence, self._on_activity, add="+")
+        self._schedule(CHECK_MS)
+
+    def _on_activity(self, event=None):
+        self._last_activity = time.monotonic()
+        if self._task is not None:
+            # Dilim yarıda kalır ve işlemi geri alınır. İptal edilen görev geri çağrı
+            # almaz; yoklama burada yeniden kurulur, yeni dilim bir sonraki boşta başlar
+            self._task.cancel()
+            self._task = None
+            self._schedule(CHECK_MS)
+
+    def _schedule(self, delay_ms):
+        if not self._stopped and self._after_id is None:
+            self._after_id = self.root.after(delay_ms, self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        idle = time.monotonic() - self._last_activity
+        if self._task is not None or idle < IDLE_SECONDS:
+            self._schedule(CHECK_MS)
+            return
+        self._task = tasks.submit(self._run_slice, idle, cancellable=True,
+                                  on_done=self._on_slice_done, on_error=self._on_slice_failed)
+
+    def _on_slice_done(self, result):
+        self._task = None
+        if result is None:
+            self._schedule(CHECK_MS)  # Vadesi gelen iş yok
+            return
+        job, duration_ms, reclaimed, finished = result
+        if finished:
+            print(f"Veritabanı bakımı: {job} {duration_ms:.0f} ms, {reclaimed / (1024 * 1024):.1f} MB geri kazanıldı")
+        # Kullanıcı hâlâ boştaysa sıradaki dilim hemen başlar
+        self._schedule(NEXT_SLICE_MS)
+
+    def _on_slice_failed(self, error):
+        self._task = None
+        print(f"Veritabanı bakımı başarısız: {error}")
+        self._schedule(CHECK_MS)
+
+    def stop(self):
+        self._stopped = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # --- Arka plan iş parçacığında ---
+
+    def _run_slice(self, conn, idle):
+        """Vadesi gelen ilk işin bir dilimini çalıştırır; (iş, süre ms, geri kazanılan, iş bitti mi) veya None."""
+        now = datetime.now()
+        runs = last_runs(conn)
+
+        def due(job):
+            if job not in runs:
+                return True
+            return now - datetime.strptime(runs[job][0], "%Y-%m-%d %H:%M:%S") >= timedelta(seconds=INTERVALS[job])
+
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+        if self._analyze_queue or due("analyze"):
+            return self._analyze_slice(conn, now)
+        if due("checkpoint"):
+            return self._timed(conn, "checkpoint", now, self._checkpoint)
+        if due("optimize"):
+            return self._timed(conn, "optimize", now, self._optimize)
+        if due("reconcile"):
+            return self._timed(conn, "reconcile", now, self._reconcile)
+        if free_pages >= MIN_FREE_PAGES:
+            if auto_vacuum == _AUTO_VACUUM_INCREMENTAL:
+                return self._timed(conn, "incremental_vacuum", now, self._incremental_vacuum)
+            if free_pages >= page_count * FULL_VACUUM_FREE_RATIO and idle >= LONG_IDLE_SECONDS:
+                return self._timed(conn, "vacuum", now, self._full_vacuum)
+        return None
+
+    def _timed(self, conn, job, now, func):
+        size_before = _db_size(conn)
+        started = time.perf_counter()
+        func()
+        duration_ms = (time.perf_counter() - started) * 1000
+        reclaimed = max(size_before - _db_size(conn), 0)
+        self._log(job, now, duration_ms, reclaimed)
+        return job, duration_ms, reclaimed, True
+
+    def _log(self, job, now, duration_ms, reclaimed):
+        def write(conn):
+            conn.execute(
+                "INSERT INTO maintenance_log (job, started_at, duration_ms, reclaimed_bytes) VALUES (?, ?, ?, ?)",
+                (job, now.strftime("%Y-%m-%d %H:%M:%S"), duration_ms, reclaimed)
+            )
+            cutoff = (now - timedelta(days=LOG_RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+            conn.execute("DELETE FROM maintenance_log WHERE started_at < ?", (cutoff,))
+        db.run_write(write)
+
+    @staticmethod
+    def _checkpoint():
+        with db.exclusive_connection() as conn, tasks.interruptible(conn):
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+
+    @staticmethod
+    def _optimize():
+        with db.exclusive_connection() as conn, tasks.interruptible(conn):
+            conn.execute("PRAGMA analysis_limit = 1000")
+            conn.execute("PRAGMA optimize")
+
+    @staticmethod
+    def _reconcile():
+        def verify(conn):
+            with tasks.interruptible(conn):
+                return reconcile.verify(conn)
+        mismatches = db.run_write(verify)
+        if mismatches:
+            print(f"Bakiye mutabakatı: {len(mismatches)} müşteride bakiye cari hareketlerle uyuşmuyor")
+
+    @staticmethod
+    def _incremental_vacuum():
+        # Her adım (step) tek sayfa geri verir; execute() yalnızca ilk adımı
+        # çalıştırdığından ifade executescript() ile sonuna kadar yürütülür
+        with db.exclusive_connection() as conn, tasks.interruptible(conn):
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+
+    @staticmethod
+    def _full_vacuum():
+        # auto_vacuum = INCREMENTAL (db._connect) bu VACUUM ile etkinleşir;
+        # sonraki boş alanlar incremental_vacuum dilimleriyle geri verilir
+        with db.exclusive_connection() as conn, tasks.interruptible(conn):
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+
+    def _analyze_slice(self, conn, now):
+        if not self._analyze_queue:
+            self._analyze_queue = [name for name, in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name"
+            )]
+            self._analyze_started = (now, 0.0)
+        table = self._analyze_queue[0]
+        started = time.perf_counter()
+
+        def analyze(write_conn):
+            with tasks.interruptible(write_conn):
+                write_conn.execute(f'ANALYZE "{table}"')
+        db.run_write(analyze)
+        self._analyze_queue.pop(0)  # İptal edilen tablo bir sonraki boşta yeniden denenir
+
+        analyze_now, total_ms = self._analyze_started
+        total_ms += (time.perf_counter() - started) * 1000
+        self._analyze_started = (analyze_now, total_ms)
+        if self._analyze_queue:
+            return "analyze", total_ms, 0, False
+        self._log("analyze", analyze_now, total_ms, 0)
+        return "analyze", total_ms, 0, True
+
+
+_scheduler = None
+
+
+def start(root):
+    """Bakım zamanlayıcısını başlatır (ana pencere kurulduktan sonra)."""
+    global _scheduler
+    _scheduler = MaintenanceScheduler(root)
+    _scheduler.start()
+    return _scheduler
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def stop():
+    if _scheduler is not None:
+        _scheduler.stop()
@@ -0,0 +1,151 @@
+"""Sürümlü veritabanı şema göçleri (migration).
+
+Her göç (sürüm, açıklama, fonksiyon) üçlüsüdür ve sırayla, kendi işlemi içinde
+bir kez uygulanır. Uygulanan sürümler schema_version tablosuna yazılır.
+Göç fonksiyonları idempotent yazılmalıdır: eski sürümlerde elle oluşturulmuş
+tablo/sütunlar bulunabilir.
+"""
+from datetime import datetime
+
+import archive
+import barcodes
+import db
+import invoice_numbers
+import invoices
+import journal
+import maintenance
+import reconcile
+import search
+import summaries
+
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+# --- Göç adımları ---
+
+def _m001_base_tables(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, stock_quantity INTEGER DEFAULT 0,
+        sale_price REAL DEFAULT 0.0, low_stock_threshold INTEGER DEFAULT 10, purchase_price REAL DEFAULT 0.0
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT DEFAULT 'Perakende', balance REAL DEFAULT 0.0
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, invoice_number TEXT NOT NULL, customer_id INTEGER, sale_date TEXT, total_amount REAL
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS ledger_transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id INTEGER, type TEXT, amount REAL, transaction_date TEXT, description TEXT
+    )""")
+
+
+def _m002_products_purchase_price(conn):
+    # Çok eski DB'lerde products tablosu purchase_price sütunu olmadan oluşturulmuş
+    if not _column_exists(conn, "products", "purchase_price"):
+        conn.execute("ALTER TABLE products ADD COLUMN purchase_price REAL DEFAULT 0.0")
+
+
+def _m003_hot_path_indexes(conn):
+    # Kontrol paneli ve raporlar: tarih aralığı + toplam (kapsayan indeks)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(sale_date, total_amount)")
+    # Müşteri silme ve müşteri bazlı sorgular
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales(customer_id, sale_date)")
+    # Cari hareket listesi ve ekstre: müşteri + tarih sıralı
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_customer_date ON ledger_transactions(customer_id, transaction_date, id)")
+    # Tarih aralığı bazlı cari sorguları
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_date ON ledger_transactions(transaction_date)")
+    # Müşteri listeleri ada göre sıralanır
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name)")
+
+
+def _m006_grid_sort_indexes(conn):
+    # Sanal tablolarda başlığa göre sıralama + keyset sayfalama (sıralama, id) çiftiyle yapılır
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products(name, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock_quantity, id)")
+
+
+def _m009_sale_items(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS sale_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, sale_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+        qty INTEGER NOT NULL, unit_price REAL NOT NULL, unit_cost REAL NOT NULL DEFAULT 0.0
+    )""")
+    # Fatura kalemleri ve tarih aralığındaki satışların kalemleri (kapsayan indeks)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id, product_id, qty, unit_price, unit_cost)")
+    # Ürün bazlı satış geçmişi
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items(product_id, sale_id)")
+    # Müşteri silinince satışlarıyla birlikte kalemleri de silinir
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_sales_items_delete AFTER DELETE ON sales BEGIN
+        DELETE FROM sale_items WHERE sale_id = old.id;
+    END""")
+
+
+def _m014_report_group_index(conn):
+    # Gün ve müşteri gruplu raporlar: tarih aralığı + müşteri + toplam (kapsayan indeks).
+    # idx_sales_date'in (sale_date, total_amount) sorgularını da kapsar; satış başına
+    # güncellenen indeks sayısı artmasın diye eskisi kaldırılır
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_date_customer ON sales(sale_date, customer_id, total_amount)")
+    conn.execute("DROP INDEX IF EXISTS idx_sales_date")
+
+
+MIGRATIONS = [
+    (1, "Temel tablolar", _m001_base_tables),
+    (2, "products.purchase_price sütunu", _m002_products_purchase_price),
+    (3, "Sık kullanılan sorgular için indeksler", _m003_hot_path_indexes),
+    (4, "Ürün adı arama indeksi (FTS5 trigram)", search.create_fts_schema),
+    (5, "Çoklu ürün barkodları", barcodes.create_barcode_schema),
+    (6, "Ürün listesi sıralama indeksleri", _m006_grid_sort_indexes),
+    (7, "PDF fatura kuyruğu", invoices.create_invoice_schema),
+    (8, "Kontrol paneli özet tabloları", summaries.create_summary_schema),
+    (9, "Satış kalemleri", _m009_sale_items),
+    (10, "Sıralı fatura numaraları", invoice_numbers.create_sequence_schema),
+    (11, "Arşivlenmiş mali yıllar", archive.create_archive_schema),
+    (12, "Bakım kayıtları", maintenance.create_maintenance_schema),
+    (13, "Bakiye kontrol noktaları", reconcile.create_reconcile_schema),
+    (14, "Gruplanmış rapor indeksi", _m014_report_group_index),
+    (15, "Kasa fatura serisi sahipliği", invoice_numbers.create_series_owner_schema),
+    (16, "Satış günlüğü kimlikleri", journal.create_journal_schema),
+    (17, "Stok çakışması olan satışlar", journal.create_conflict_schema),
+]
+
+
+# --- Göç motoru ---
+
+def _ensure_version_table(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT
+    )""")
+
+
+def current_version():
+    """Veritabanına uygulanmış en yüksek şema sürümünü döndürür."""
+    with db.transaction() as conn:
+        _ensure_version_table(conn)
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate():
+    """Bekleyen göçleri sırayla uygular. Uygulanan sürüm numaralarının listesini döndürür."""
+    with db.transaction() as conn:
+        _ensure_version_table(conn)
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        with db.transaction(immediate=True) as conn:
+            # Aynı DB'yi kullanan başka bir kasa göçü bu arada uygulamış olabilir
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                continue
+            step(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        applied.append(version)
+        print(f"Veritabanı şeması güncellendi: {version} - {description}")
+
+    if applied:
+        # Yeni indeksler için sorgu planlayıcı istatistiklerini güncelle
+        with db.transaction() as conn:
+            conn.execute("PRAGMA optimize")
+    return applied
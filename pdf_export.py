@@ -0,0 +1,121 @@
+"""Veritabanından akışla PDF tablo çıktısı (raporlar ve cari ekstre).
+
+Satırlar imleçten parça parça okunur ve sayfa doldukça çizilir; sorgu sonucu
+hiçbir zaman bir listede tutulmaz. Bellek yine de sabit değildir: ReportLab
+Canvas'ı biten sayfaların çizim akışlarını save() çağrılana kadar bellekte
+tutar, bu yüzden kullanım sayfa sayısıyla büyür (50 bin satırda yaklaşık
+30 MB). Her sayfanın altında sayfa toplamı ve o sayfaya
+kadarki devreden toplam, sonraki sayfanın başında da önceki sayfadan devreden
+toplam yazılır.
+
+Arka plan görevinde çalıştırılır: ilerleme ve iptal tasks.current_task()
+üzerinden yapılır. Dosya önce .tmp uzantılı yazılır; iptal edilen veya hata
+alan çıktı yarım bir PDF bırakmaz.
+"""
+import os
+
+import invoices
+import tasks
+
+CHUNK_SIZE = 500
+
+ROW_HEIGHT = 15
+TOP_MARGIN = 50
+FOOTER_Y = 45
+# Son satırın altında sayfa toplamı çizgisine kalan boşluk
+_BODY_BOTTOM = FOOTER_Y + 25
+
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE):
+    """İmleçteki satırları fetchmany() ile parça parça dolaşır."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def write_table(path, title, info_lines, columns, rows, total_label="toplam", summary_lines=(), expected_rows=None):
+    """Tablo PDF'ini yazar ve çizilen satır sayısını döndürür.
+
+    columns: [(başlık, x konumu, en fazla karakter), ...]
+    rows: (değerler, tutar) ikilileri üreten yineleyici; tutar sayfa ve
+          devreden toplamlara eklenir
+    expected_rows: biliniyorsa ilerleme çubuğu için toplam satır sayısı
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    font_name = invoices.register_font()
+    task = tasks.current_task()
+    tmp_path = path + ".tmp"
+    c = canvas.Canvas(tmp_path, pagesize=A4)
+    width, height = A4
+    state = {"page": 1, "page_total": 0.0, "carried": 0.0}
+
+    def draw_header(first):
+        y_pos = height - TOP_MARGIN
+        if first:
+            c.setFont(font_name, 16)
+            c.drawString(50, y_pos, title)
+            c.setFont(font_name, 10)
+            for line in info_lines:
+                y_pos -= 20
+                c.drawString(50, y_pos, line)
+            y_pos -= 30
+        else:
+            c.setFont(font_name, 10)
+            c.drawString(50, y_pos, f"{title} (devam)")
+            c.drawRightString(width - 40, y_pos, f"Önceki sayfadan devreden {total_label}: {state['carried']:.2f}")
+            y_pos -= 30
+        for heading, x, _ in columns:
+            c.drawString(x, y_pos, heading)
+        c.line(40, y_pos - 5, width - 40, y_pos - 5)
+        return y_pos - 20
+
+    def draw_footer():
+        c.setFont(font_name, 9)
+        c.line(40, FOOTER_Y + 12, width - 40, FOOTER_Y + 12)
+        c.drawString(50, FOOTER_Y, f"Sayfa toplamı: {state['page_total']:.2f}")
+        c.drawString(230, FOOTER_Y, f"Devreden {total_label}: {state['carried']:.2f}")
+        c.drawRightString(width - 40, FOOTER_Y, f"Sayfa {state['page']}")
+
+    try:
+        y_pos = draw_header(first=True)
+        count = 0
+        for values, amount in rows:
+            if y_pos < _BODY_BOTTOM:
+                draw_footer()
+                c.showPage()
+                state["page"] += 1
+                state["page_total"] = 0.0
+                y_pos = draw_header(first=False)
+            c.setFont(font_name, 10)
+            for (_, x, max_chars), value in zip(columns, values):
+                c.drawString(x, y_pos, str(value)[:max_chars])
+            state["page_total"] += amount or 0
+            state["carried"] += amount or 0
+            y_pos -= ROW_HEIGHT
+            count += 1
+            if task is not None and count % CHUNK_SIZE == 0:
+                task.check_cancelled()
+                task.progress(count, expected_rows, f"{count} satır yazıldı")
+        draw_footer()
+
+        # Özet son sayfanın altına sığmıyorsa yeni sayfaya yazılır
+        needed = 20 * len(summary_lines) + 20
+        if y_pos - needed < _BODY_BOTTOM:
+            c.showPage()
+            state["page"] += 1
+            y_pos = height - TOP_MARGIN
+        c.setFont(font_name, 12)
+        for line in summary_lines:
+            y_pos -= 20
+            c.drawString(50, y_pos, line)
+        c.save()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,159 @@
+"""Müşteri bakiyesi ile cari hareketlerin mutabakatı.
+
+customers.balance, satış ve cari hareket kaydedilirken ledger_transactions'tan
+ayrı olarak güncellenen bir toplamdır. Bu modül ikisinin tutarlılığını denetler.
+
+balance_checkpoints, her müşteri için belirli bir hareket kimliğine
+(ledger_id) kadarki hareketlerin toplamını tutar. Denetim yalnızca bu
+kimlikten sonra eklenen hareketleri toplar: kimlikler AUTOINCREMENT olduğundan
+"sonradan eklenen" tarihten bağımsız olarak id > ledger_id demektir ve birincil
+anahtar üzerinde tek aralık taramasıdır. Tutan müşterilerin kontrol noktası
+en son hareket kimliğine ilerletilir; tutmayanlar balance_drift tablosuna
+yazılır ve repair() ile hareketlerden yeniden hesaplanan değere düzeltilir
+(doğru kaynak cari hareketlerdir).
+
+Kontrol noktasından önceki bir hareket silinir veya değiştirilirse (müşteri
+silme, yıl arşivleme) tetikleyici o müşterinin kontrol noktasını siler; bir
+sonraki denetim o müşteri için tüm hareketleri toplar.
+"""
+from datetime import datetime
+
+from ledger import SIGNED_AMOUNT
+
+# Kuruş altı farklar (kayan nokta) uyuşmazlık sayılmaz
+TOLERANCE = 0.005
+
+# Perakende müşterinin cari hareketi tutulmaz
+_RETAIL_CUSTOMER_ID = 1
+
+
+def create_reconcile_schema(conn):
+    """Kontrol noktası ve uyuşmazlık tablolarını, tetikleyicilerini oluşturur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS balance_checkpoints (
+        customer_id INTEGER PRIMARY KEY,
+        ledger_id INTEGER NOT NULL,
+        balance REAL NOT NULL,
+        checked_at TEXT NOT NULL
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS balance_drift (
+        customer_id INTEGER PRIMARY KEY,
+        stored_balance REAL NOT NULL,
+        ledger_balance REAL NOT NULL,
+        detected_at TEXT NOT NULL
+    )""")
+
+    invalidate = """DELETE FROM balance_checkpoints WHERE customer_id = old.customer_id
+            AND ledger_id >= old.id;"""
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_ledger_checkpoint_delete AFTER DELETE ON ledger_transactions "
+                 f"BEGIN {invalidate} END")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_checkpoint_update
+        AFTER UPDATE OF customer_id, type, amount ON ledger_transactions BEGIN {invalidate}
+            DELETE FROM balance_checkpoints WHERE customer_id = new.customer_id AND ledger_id >= new.id;
+        END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_customers_checkpoint_delete AFTER DELETE ON customers BEGIN
+        DELETE FROM balance_checkpoints WHERE customer_id = old.id;
+        DELETE FROM balance_drift WHERE customer_id = old.id;
+    END""")
+
+
+def ledger_balances(conn, full=False):
+    """Müşteri başına hareketlerden hesaplanan bakiye {müşteri id: bakiye}.
+
+    Kontrol noktası olan müşterilerde yalnızca noktadan sonraki hareketler
+    toplanır; full=True kontrol noktalarını yok sayıp tüm hareketleri toplar.
+    """
+    balances = {}
+    if not full:
+        low = None
+        for customer_id, ledger_id, balance in conn.execute(
+            "SELECT customer_id, ledger_id, balance FROM balance_checkpoints"
+        ):
+            balances[customer_id] = balance
+            low = ledger_id if low is None else min(low, ledger_id)
+        if balances:
+            # Kontrol noktaları toplu ilerletildiğinden low çoğunlukla tüm noktalara eşittir.
+            # NOT INDEXED: GROUP BY için müşteri indeksinin tamamı taranmasın, birincil
+            # anahtarda yalnızca low sonrası okunsun
+            for customer_id, delta in conn.execute(
+                f"""SELECT l.customer_id, SUM({SIGNED_AMOUNT})
+                FROM ledger_transactions l NOT INDEXED JOIN balance_checkpoints cp ON cp.customer_id = l.customer_id
+                WHERE l.id > ? AND l.id > cp.ledger_id
+                GROUP BY l.customer_id""",
+                (low,)
+            ):
+                balances[customer_id] += delta
+
+    # Kontrol noktası olmayan (yeni veya noktası geçersizleşmiş) müşteriler baştan toplanır
+    missing = "" if full else "AND id NOT IN (SELECT customer_id FROM balance_checkpoints)"
+    for customer_id, total in conn.execute(
+        f"""SELECT c.id, (SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM ledger_transactions WHERE customer_id = c.id)
+        FROM customers c WHERE c.id != ? {missing}""",
+        (_RETAIL_CUSTOMER_ID,)
+    ):
+        balances[customer_id] = total
+    return balances
+
+
+def verify(conn, full=False):
+    """Bakiyeleri denetler ve kontrol noktalarını ilerletir; [(müşteri id, ad, kayıtlı, hesaplanan), ...].
+
+    Yazma işlemi içinde (db.run_write) çağrılmalıdır: denetim ile en son
+    hareket kimliği arasında başka kasanın yazması araya girmemelidir.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ledger_transactions").fetchone()[0]
+    expected = ledger_balances(conn, full)
+
+    mismatches, matched = [], []
+    for customer_id, name, stored in conn.execute(
+        "SELECT id, name, COALESCE(balance, 0) FROM customers WHERE id != ?", (_RETAIL_CUSTOMER_ID,)
+    ).fetchall():
+        ledger_balance = round(expected.get(customer_id, 0), 2)
+        if abs(stored - ledger_balance) > TOLERANCE:
+            mismatches.append((customer_id, name, stored, ledger_balance))
+        else:
+            matched.append((customer_id, last_id, ledger_balance, now))
+
+    # Uyuşmayan müşterinin kontrol noktası ilerletilmez; düzeltilene kadar kayıtta kalır
+    conn.executemany(
+        "INSERT OR REPLACE INTO balance_checkpoints (customer_id, ledger_id, balance, checked_at) VALUES (?, ?, ?, ?)",
+        matched
+    )
+    conn.execute("DELETE FROM balance_drift")
+    conn.executemany(
+        "INSERT INTO balance_drift (customer_id, stored_balance, ledger_balance, detected_at) VALUES (?, ?, ?, ?)",
+        [(customer_id, stored, ledger_balance, now) for customer_id, _, stored, ledger_balance in mismatches]
+    )
+    return mismatches
+
+
+def drift(conn):
+    """Son denetimde bulunan uyuşmazlıklar [(müşteri id, ad, kayıtlı, hesaplanan, tarih), ...]."""
+    return conn.execute(
+        "SELECT d.customer_id, c.name, d.stored_balance, d.ledger_balance, d.detected_at "
+        "FROM balance_drift d JOIN customers c ON c.id = d.customer_id ORDER BY c.name"
+    ).fetchall()
+
+
+def repair(conn):
+    """Uyuşmayan bakiyeleri cari hareketlerden yeniden hesaplar; düzeltilen müşteri kimliklerini döndürür.
+
+    Yazma işlemi içinde çağrılmalıdır. Denetimden bu yana eklenen hareketler
+    de hesaba katılır.
+    """
+    customer_ids = [row[0] for row in conn.execute("SELECT customer_id FROM balance_drift")]
+    if not customer_ids:
+        return []
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ledger_transactions").fetchone()[0]
+    for customer_id in customer_ids:
+        balance = round(conn.execute(
+            f"SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM ledger_transactions WHERE customer_id = ?", (customer_id,)
+        ).fetchone()[0], 2)
+        conn.execute("UPDATE customers SET balance = ? WHERE id = ?", (balance, customer_id))
+        conn.execute(
+            "INSERT OR REPLACE INTO balance_checkpoints (customer_id, ledger_id, balance, checked_at) VALUES (?, ?, ?, ?)",
+            (customer_id, last_id, balance, now)
+        )
+    conn.execute("DELETE FROM balance_drift")
+    return customer_ids
@@ -0,0 +1,79 @@
+"""Gruplanmış satış raporları.
+
+Satışlar gün, hafta, ay, müşteri veya müşteri tipine göre SQL'de GROUP BY ile
+toplanır; Python'a yalnızca grup satırları gelir. Tarih koşulu yarı açık
+aralıktır (başlangıç <= tarih < bitişin ertesi günü).
+
+Dönem raporları ana veritabanında satırları değil, tetikleyicilerle güncel
+tutulan günlük özet tablosunu (daily_sales) okur: yıllarca satış olsa da
+okunan satır sayısı gün sayısı kadardır. Müşteri raporları satışları
+idx_sales_date_customer kapsayan indeksinde aralık taramasıyla toplar.
+
+Aralık arşivlenmiş yıllara uzanıyorsa her arşiv kendi satışlarını gün veya
+müşteri başına toplar; dış sorgu bu ara toplamları birleştirip döneme ya da
+müşteri tipine göre yeniden gruplar. Haftalık ve aylık gruplar da önce güne
+göre toplanır, böylece tarih fonksiyonları satır başına değil gün başına
+bir kez çalışır.
+"""
+import archive
+
+GROUP_DAY = "day"
+GROUP_WEEK = "week"
+GROUP_MONTH = "month"
+GROUP_CUSTOMER = "customer"
+GROUP_CUSTOMER_TYPE = "customer_type"
+
+# Günü (YYYY-MM-DD) döneme çeviren ifade; hafta pazartesi başlar
+_PERIOD_KEYS = {
+    GROUP_DAY: "k",
+    GROUP_WEEK: "date(k, 'weekday 0', '-6 days')",
+    GROUP_MONTH: "substr(k, 1, 7)",
+}
+_PERIOD_LABELS = {
+    GROUP_DAY: "{key}",
+    GROUP_WEEK: "{key} || ' haftası'",
+    GROUP_MONTH: "{key}",
+}
+
+
+def grouped_sales(group, start_date, end_exclusive, schemas=()):
+    """Gruplanmış satış sorgusu ve parametreleri.
+
+    Sorgu (group_key, label, sale_count, total) sütunlarını döndürür;
+    group_key grup başına tekildir ve dönem gruplarında kronolojik sıralanır.
+    schemas: archive.attach() ile bağlanmış arşiv şemaları
+    """
+    if group in _PERIOD_KEYS:
+        main_branch = ("SELECT day AS k, sale_count AS n, total_amount AS t FROM main.daily_sales "
+                       "WHERE day >= ? AND day < ? AND sale_count > 0")
+        branch_key = "substr(sale_date, 1, 10)"
+    elif group in (GROUP_CUSTOMER, GROUP_CUSTOMER_TYPE):
+        main_branch = None
+        branch_key = "+customer_id"  # Müşteri indeksinde atlamalı tarama yerine kapsayan tarih indeksi
+    else:
+        raise ValueError(f"Bilinmeyen rapor gruplaması: {group}")
+
+    select = (f"SELECT {branch_key} AS k, COUNT(*) AS n, COALESCE(SUM(total_amount), 0) AS t FROM {{schema}}.sales "
+              f"WHERE sale_date >= ? AND sale_date < ? GROUP BY {branch_key}")
+    if main_branch is None:
+        partials, params = archive.union(select, (start_date, end_exclusive), schemas)
+    else:
+        # Arşivlerde özet tablosu yoktur; yalnızca onların satışları satır satır toplanır
+        branches = [main_branch, *(select.replace("{schema}", schema) for schema in schemas)]
+        partials, params = " UNION ALL ".join(branches), (start_date, end_exclusive) * len(branches)
+
+    if group in _PERIOD_KEYS:
+        key = _PERIOD_KEYS[group]
+        sql = f"""SELECT {key} AS group_key, {_PERIOD_LABELS[group].format(key=key)} AS label,
+                SUM(n) AS sale_count, SUM(t) AS total
+            FROM ({partials}) GROUP BY 1"""
+    elif group == GROUP_CUSTOMER:
+        sql = f"""SELECT p.k AS group_key, COALESCE(c.name, 'Silinmiş müşteri #' || p.k) AS label,
+                SUM(p.n) AS sale_count, SUM(p.t) AS total
+            FROM ({partials}) p LEFT JOIN customers c ON c.id = p.k GROUP BY p.k"""
+    else:
+        sql = f"""SELECT COALESCE(c.type, 'Bilinmiyor') AS group_key, COALESCE(c.type, 'Bilinmiyor') AS label,
+                SUM(p.n) AS sale_count, SUM(p.t) AS total
+            FROM ({partials}) p LEFT JOIN customers c ON c.id = p.k GROUP BY 1"""
+    return sql, params
+
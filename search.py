@@ -0,0 +1,115 @@
+"""Türkçe duyarlı ürün arama.
+
+Ürün adları tr_fold() ile normalize edilip products_fts (FTS5, trigram)
+tablosunda tutulur; tablo products üzerindeki tetikleyicilerle senkron kalır.
+SQLite'ın LIKE'ı yalnızca ASCII harflerde büyük/küçük harf eşler ve indeks
+kullanamaz; trigram indeksi ise alt dize aramasını indeksle yapar.
+"""
+import db
+
+# Türkçe büyük/küçük harf dönüşümü: I -> ı, İ -> i (str.lower() bunu yanlış yapar)
+_TR_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+# Aramada Türkçe karakterler ASCII karşılıklarına indirgenir: "sarj" de "ŞARJ"ı bulur
+_TR_ASCII = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+
+# Trigram tokenizer 3 karakterden kısa dizeleri indeksleyemez
+MIN_INDEXED_TERM = 3
+# Sınırlı aramalarda alaka sıralamasına girecek en fazla eşleşme sayısı
+CANDIDATE_LIMIT = 2000
+
+PRODUCT_COLUMNS = "p.id, p.name, p.stock_quantity, p.purchase_price, p.sale_price, p.low_stock_threshold"
+
+
+def turkish_fold(text):
+    """Metni arama anahtarına çevirir (Türkçe küçük harf + aksan katlama)."""
+    if text is None:
+        return ""
+    return " ".join(str(text).translate(_TR_LOWER).lower().translate(_TR_ASCII).split())
+
+
+db.register_function("tr_fold", 1, turkish_fold)
+
+
+def create_fts_schema(conn):
+    """products_fts tablosunu, tetikleyicilerini oluşturur ve mevcut ürünleri indeksler (göç adımı)."""
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+        USING fts5(name_key, tokenize = 'trigram')""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name_key) VALUES (new.id, tr_fold(new.name));
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_products_fts_update AFTER UPDATE OF name ON products BEGIN
+        UPDATE products_fts SET name_key = tr_fold(new.name) WHERE rowid = old.id;
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+    END""")
+    conn.execute("DELETE FROM products_fts")
+    conn.execute("INSERT INTO products_fts (rowid, name_key) SELECT id, tr_fold(name) FROM products")
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fts_conditions(words):
+    """products_fts üzerinde kelimelerin hepsini arayan WHERE koşulu ve parametreleri."""
+    indexed = [w for w in words if len(w) >= MIN_INDEXED_TERM]
+    short = [w for w in words if len(w) < MIN_INDEXED_TERM]
+
+    where, params = [], []
+    if indexed:
+        where.append("products_fts MATCH ?")
+        params.append(" AND ".join('"' + w.replace('"', '""') + '"' for w in indexed))
+    for w in short:
+        where.append("name_key LIKE ? ESCAPE '\\'")
+        params.append(f"%{_escape_like(w)}%")
+    return " AND ".join(where), params
+
+
+def build_match_filter(term, id_column="p.id"):
+    """Ürün sorgularına eklenecek (koşul, parametreler) döndürür; terim boşsa None.
+
+    Sıralama çağırana bırakılır (ör. sanal tablolarda sütun başlığına göre).
+    """
+    words = turkish_fold(term).split()
+    if not words:
+        return None
+    where, params = _fts_conditions(words)
+    return f"{id_column} IN (SELECT rowid FROM products_fts WHERE {where})", params
+
+
+def build_search_query(term, columns=PRODUCT_COLUMNS, limit=None):
+    """Arama terimi için (sql, params) döndürür; terim boşsa None.
+
+    Her kelime ayrı eşleşmelidir (sıra önemsiz). Alaka sırası: adı terimle
+    başlayanlar, terimin adda geçtiği konum, ad uzunluğu. limit verildiğinde
+    sıralama en yeni CANDIDATE_LIMIT eşleşme üzerinde yapılır; böylece çok
+    genel terimlerde de yazarken sorgu süresi sınırlı kalır.
+    """
+    key = turkish_fold(term)
+    if not key:
+        return None
+
+    words = key.split()
+    where, params = _fts_conditions(words)
+    candidates = f"SELECT rowid, name_key FROM products_fts WHERE {where}"
+    if limit is not None:
+        candidates += " ORDER BY rowid DESC LIMIT ?"
+        params.append(CANDIDATE_LIMIT)
+
+    sql = f"""SELECT {columns} FROM ({candidates}) f JOIN products p ON p.id = f.rowid
+        ORDER BY (f.name_key LIKE ? ESCAPE '\\') DESC, instr(f.name_key, ?), length(f.name_key), p.id DESC"""
+    params += [f"{_escape_like(key)}%", words[0]]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return sql, params
+
+
+def search_products(term, limit=None, conn=None):
+    """Ürünleri alaka sırasıyla döndürür; satırlar PRODUCT_COLUMNS sırasındadır."""
+    query = build_search_query(term, limit=limit)
+    if query is None:
+        return []
+    conn = conn or db.get_read_connection()
+    return conn.execute(*query).fetchall()
@@ -0,0 +1,110 @@
+"""Açılış süresi ölçümü.
+
+main.py bu modülü ilk olarak içe aktarır; modül yüklendiği an açılışın
+başlangıcı kabul edilir. Aşamalar mark() ile işaretlenir, içe aktarma süresi
+IMPORT_BUDGET_MS bütçesiyle karşılaştırılır ve aşılırsa uyarı yazılır.
+Ayrıntılı döküm için STOKTAKIP_PROFILE=1 ortam değişkeni verilebilir; hangi
+modülün pahalı olduğunu bulmak için `python -X importtime main.py` kullanılır.
+
+Ağır modüller (pandas, ReportLab) ilk kullanıldıkları fonksiyonun içinde
+içe aktarılmalıdır; modül düzeyine taşınmaları bu bütçeyi aşar.
+
+Geri kalan açılış işleri (şema göçü, font, önbellek, ilk sekme verisi)
+StartupPipeline ile arayüz iş parçacığı dışında, giriş ekranına gerçek
+ilerleme bildirilerek çalıştırılır.
+"""
+import os
+import queue
+import threading
+import time
+
+_START = time.perf_counter()
+
+# Paketlenmiş (PyInstaller) sürümde yavaş bir mağaza bilgisayarı için üst sınır
+IMPORT_BUDGET_MS = 400
+
+_marks = []
+_last = _START
+
+
+def mark(stage):
+    """Önceki işaretten bu yana geçen süreyi stage adıyla kaydeder; süreyi (ms) döndürür."""
+    global _last
+    now = time.perf_counter()
+    elapsed = (now - _last) * 1000
+    _marks.append((stage, elapsed))
+    _last = now
+    return elapsed
+
+
+def elapsed_ms():
+    """Açılışın başından bu yana geçen süre (ms)."""
+    return (time.perf_counter() - _START) * 1000
+
+
+def check_import_budget(stage="imports"):
+    """İçe aktarma aşamasını işaretler ve bütçe aşıldıysa uyarır."""
+    elapsed = mark(stage)
+    if elapsed > IMPORT_BUDGET_MS:
+        print(f"Açılış uyarısı: modül yükleme {elapsed:.0f} ms sürdü (bütçe {IMPORT_BUDGET_MS} ms).")
+    return elapsed
+
+
+def report():
+    """Aşama sürelerini (profil açıksa) yazdırır."""
+    if os.environ.get("STOKTAKIP_PROFILE"):
+        for stage, elapsed in _marks:
+            print(f"  {stage:<36} {elapsed:8.1f} ms")
+        print(f"  {'toplam':<36} {elapsed_ms():8.1f} ms")
+
+
+class StartupPipeline:
+    """Açılış aşamalarını arka plan iş parçacığında sırayla çalıştırır.
+
+    stages: [(başlık, fonksiyon(context)), ...]; fonksiyonlar Tk'ye dokunmamalıdır,
+    sonuçlarını ortak context sözlüğüne yazar. İlerleme, bitiş ve hata bildirimleri
+    after() ile yoklanan bir kuyruktan ana iş parçacığında çağrılır:
+    on_progress(sıra, toplam, başlık), on_done(context), on_error(başlık, hata).
+    """
+
+    POLL_MS = 30
+
+    def __init__(self, root, stages, on_progress, on_done, on_error):
+        self.root = root
+        self.stages = stages
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self._events = queue.Queue()
+
+    def start(self):
+        threading.Thread(target=self._worker, name="Startup", daemon=True).start()
+        self.root.after(self.POLL_MS, self._poll)
+
+    def _worker(self):
+        context = {}
+        for index, (title, func) in enumerate(self.stages):
+            self._events.put(("stage", index, title))
+            try:
+                func(context)
+            except Exception as e:
+                self._events.put(("error", title, e))
+                return
+            mark(title)
+        self._events.put(("done", context, None))
+
+    def _poll(self):
+        while True:
+            try:
+                kind, value, detail = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "stage":
+                self.on_progress(value, len(self.stages), detail)
+            elif kind == "done":
+                self.on_done(value)
+                return
+            else:
+                self.on_error(value, detail)
+                return
+        self.root.after(self.POLL_MS, self._poll)
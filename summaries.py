@@ -0,0 +1,77 @@
+"""Kontrol paneli için önceden toplanmış özet tablolar.
+
+daily_sales gün başına satış adedi ve tutarını, summary_totals ise ürün sayısı
+ve toplam cari açık gibi genel toplamları tutar. Tablolar sales, customers ve
+products üzerindeki tetikleyicilerle her yazmada güncellenir; böylece panel,
+kaç yıllık satış olursa olsun tek satırlık indeks okumalarıyla dolar.
+"""
+
+# summary_totals anahtarları
+PRODUCT_COUNT = "product_count"
+RECEIVABLES = "receivables"      # Borçlu müşterilerin toplam borcu (pozitif)
+
+# Bakiyesi negatif olan müşteri bize borçludur
+_DEBT = "(CASE WHEN COALESCE({row}.balance, 0) < 0 THEN -{row}.balance ELSE 0 END)"
+
+
+def create_summary_schema(conn):
+    """Özet tablolarını ve tetikleyicilerini oluşturur, mevcut veriden doldurur (göç adımı)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS daily_sales (
+        day TEXT PRIMARY KEY,
+        sale_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS summary_totals (
+        name TEXT PRIMARY KEY,
+        value REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+
+    add_sale = """INSERT INTO daily_sales (day, sale_count, total_amount)
+            VALUES (substr(new.sale_date, 1, 10), 1, COALESCE(new.total_amount, 0))
+            ON CONFLICT(day) DO UPDATE SET sale_count = sale_count + 1, total_amount = total_amount + excluded.total_amount;"""
+    remove_sale = """UPDATE daily_sales SET sale_count = sale_count - 1, total_amount = total_amount - COALESCE(old.total_amount, 0)
+            WHERE day = substr(old.sale_date, 1, 10);"""
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_sales_summary_insert AFTER INSERT ON sales BEGIN {add_sale} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_sales_summary_delete AFTER DELETE ON sales BEGIN {remove_sale} END")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sales_summary_update AFTER UPDATE OF sale_date, total_amount ON sales
+        BEGIN {remove_sale} {add_sale} END""")
+
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_customers_summary_insert AFTER INSERT ON customers BEGIN
+        UPDATE summary_totals SET value = value + {_DEBT.format(row='new')} WHERE name = '{RECEIVABLES}';
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_customers_summary_delete AFTER DELETE ON customers BEGIN
+        UPDATE summary_totals SET value = value - {_DEBT.format(row='old')} WHERE name = '{RECEIVABLES}';
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_customers_summary_update AFTER UPDATE OF balance ON customers BEGIN
+        UPDATE summary_totals SET value = value + {_DEBT.format(row='new')} - {_DEBT.format(row='old')} WHERE name = '{RECEIVABLES}';
+    END""")
+
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_products_summary_insert AFTER INSERT ON products BEGIN
+        UPDATE summary_totals SET value = value + 1 WHERE name = '{PRODUCT_COUNT}';
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_products_summary_delete AFTER DELETE ON products BEGIN
+        UPDATE summary_totals SET value = value - 1 WHERE name = '{PRODUCT_COUNT}';
+    END""")
+
+    rebuild_summaries(conn)
+
+
+def rebuild_summaries(conn):
+    """Özetleri kaynak tablolardan baştan hesaplar (biriken kayan nokta farklarını da sıfırlar)."""
+    conn.execute("DELETE FROM daily_sales")
+    conn.execute("""INSERT INTO daily_sales (day, sale_count, total_amount)
+        SELECT substr(sale_date, 1, 10), COUNT(*), COALESCE(SUM(total_amount), 0) FROM sales GROUP BY 1""")
+    conn.execute("DELETE FROM summary_totals")
+    conn.execute(f"INSERT INTO summary_totals (name, value) SELECT '{PRODUCT_COUNT}', COUNT(*) FROM products")
+    conn.execute(f"INSERT INTO summary_totals (name, value) SELECT '{RECEIVABLES}', COALESCE(SUM({_DEBT.format(row='customers')}), 0) FROM customers")
+
+
+def get_day(conn, day):
+    """Günün (satış adedi, satış tutarı) değerini döndürür; day 'YYYY-MM-DD' biçimindedir."""
+    row = conn.execute("SELECT sale_count, total_amount FROM daily_sales WHERE day = ?", (day,)).fetchone()
+    return row or (0, 0.0)
+
+
+def get_total(conn, name):
+    row = conn.execute("SELECT value FROM summary_totals WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
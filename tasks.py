@@ -0,0 +1,276 @@
+"""Arka plan görev yürütücüsü.
+
+Veritabanı ve dosya işleri iş parçacığı havuzunda çalışır; sonuç, hata ve
+ilerleme bildirimleri bir kuyruğa yazılır ve Tk ana döngüsünde after() ile
+yoklanarak geri çağrılara iletilir (Tkinter iş parçacığı güvenli değildir).
+
+Kullanım:
+    tasks.submit(sorgu_fonksiyonu, arg1, on_done=..., on_error=...)
+
+Sorgu fonksiyonu ilk argüman olarak bir bağlantı alır: okuma görevlerinde
+iş parçacığının okuma bağlantısı, write=True görevlerinde ise db.run_write()
+içindeki yazıcı bağlantısı (kilit meşgulse fonksiyon yeniden çalıştırılabilir,
+bu yüzden yan etkisi yalnızca veritabanında olmalıdır). Uzun görevler
+tasks.current_task() ile ilerleme bildirebilir ve iptal durumunu kontrol edebilir.
+"""
+import queue
+import sqlite3
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from tkinter import ttk
+
+import db
+
+
+class TaskCancelled(Exception):
+    """Görev kullanıcı tarafından iptal edildi."""
+
+
+class Task:
+    def __init__(self, runner, title, cancellable, on_done, on_error, on_progress):
+        self.runner = runner
+        self.title = title
+        self.cancellable = cancellable
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.progress_value = None   # (tamamlanan, toplam, metin)
+        self._cancel_event = threading.Event()
+        self._conn_lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Görevi iptal eder; çalışan SQL ifadesi varsa kesilir."""
+        if not self.cancellable:
+            return
+        self._cancel_event.set()
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def check_cancelled(self):
+        """Uzun döngülerde çağrılır; iptal edildiyse TaskCancelled yükseltir."""
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def progress(self, done, total=None, text=None):
+        """İş parçacığından ilerleme bildirir (total yoksa belirsiz ilerleme gösterilir)."""
+        self.runner._events.put(("progress", self, (done, total, text)))
+
+    def _attach(self, conn):
+        with self._conn_lock:
+            self._conn = conn
+
+
+_current = threading.local()
+
+
+def current_task():
+    """Çalışan görev fonksiyonu içinden o anki Task nesnesini döndürür."""
+    return getattr(_current, "task", None)
+
+
+@contextmanager
+def interruptible(conn):
+    """Görev iptal edilirse conn üzerinde çalışan SQL ifadesi kesilir.
+
+    Görev fonksiyonu kendisine verilenden farklı bir bağlantı kullanıyorsa
+    (ör. db.exclusive_connection) çağrılır.
+    """
+    task = current_task()
+    previous = task._conn
+    task._attach(conn)
+    try:
+        yield conn
+    finally:
+        task._attach(previous)
+
+
+class TaskRunner:
+    POLL_MS = 30
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="DBWorker")
+        self._events = queue.Queue()
+        self._poll_id = None
+        self._in_flight = 0  # Yalnızca ana iş parçacığında değişir
+        self.active = []
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Etkin görev listesi veya ilerleme değiştiğinde (ana iş parçacığında) çağrılır."""
+        self._listeners.append(callback)
+
+    def submit(self, func, *args, title=None, write=False, cancellable=False,
+               on_done=None, on_error=None, on_progress=None):
+        task = Task(self, title, cancellable, on_done, on_error, on_progress)
+        if title:
+            self.active.append(task)
+            self._notify()
+        self._in_flight += 1
+        self._executor.submit(self._run, task, func, args, write)
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+        return task
+
+    def _run(self, task, func, args, write):
+        _current.task = task
+        try:
+            task.check_cancelled()
+            if write:
+                def body(conn):
+                    # Yazıcı bağlantısı paylaşılır: görev ona yalnızca yazma kilidini tutarken
+                    # bağlı kalır, kilit bırakıldıktan sonraki bir iptal başka iş parçacığının
+                    # yazmasını kesmesin
+                    task._attach(conn)
+                    try:
+                        result = func(conn, *args)
+                        task.check_cancelled()  # İptal edildiyse işlem geri alınır
+                    finally:
+                        task._attach(None)
+                    return result
+                result = db.run_write(body)
+            else:
+                conn = db.get_read_connection()
+                task._attach(conn)
+                result = func(conn, *args)
+            self._events.put(("done", task, result))
+        except TaskCancelled:
+            self._events.put(("cancelled", task, None))
+        except sqlite3.OperationalError as e:
+            if task.cancelled and "interrupt" in str(e):
+                self._events.put(("cancelled", task, None))
+            else:
+                self._events.put(("error", task, e))
+        except Exception as e:
+            self._events.put(("error", task, e))
+        finally:
+            task._attach(None)
+            _current.task = None
+
+    def _poll(self):
+        self._poll_id = None
+        changed = False
+        while True:
+            try:
+                kind, task, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                task.progress_value = value
+                if task.on_progress:
+                    task.on_progress(*value)
+                changed = True
+                continue
+
+            self._in_flight -= 1
+            if task in self.active:
+                self.active.remove(task)
+                changed = True
+            try:
+                if kind == "done" and task.on_done:
+                    task.on_done(value)
+                elif kind == "error":
+                    if task.on_error:
+                        task.on_error(value)
+                    else:
+                        print(f"Arka plan görevi başarısız ({task.title or 'adsız'}): {value}")
+            except tk.TclError:
+                pass  # Sonucu bekleyen pencere kapatılmış olabilir
+
+        if changed:
+            self._notify()
+        # Sonucu beklenen görev kalmadıysa yoklama durur; yeni submit yeniden başlatır
+        if self._in_flight:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def _notify(self):
+        for callback in self._listeners:
+            callback(self.active)
+
+    def shutdown(self):
+        for task in list(self.active):
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_runner = None
+
+
+def init(root, max_workers=2):
+    """Uygulama başlarken bir kez çağrılır."""
+    global _runner
+    _runner = TaskRunner(root, max_workers)
+    return _runner
+
+
+def get_runner():
+    return _runner
+
+
+def submit(func, *args, **options):
+    """Görevi arka planda çalıştırır; bkz. TaskRunner.submit."""
+    return _runner.submit(func, *args, **options)
+
+
+def shutdown():
+    if _runner is not None:
+        _runner.shutdown()
+
+
+class TaskStatusBar(ttk.Frame):
+    """Uzun süren görevler için ilerleme çubuğu ve iptal düğmesi (görev yokken gizlenir)."""
+
+    def __init__(self, master, runner, before=None):
+        super().__init__(master, padding=(10, 2))
+        self.runner = runner
+        self._before = before  # Genişleyen bir widget'tan önce paketlenmezse yer kalmaz
+        self._shown = False
+        self.lbl_status = ttk.Label(self, text="")
+        self.lbl_status.pack(side=tk.LEFT, padx=(0, 10))
+        self.progress = ttk.Progressbar(self, orient="horizontal", length=250, mode="determinate")
+        self.progress.pack(side=tk.LEFT)
+        self.btn_cancel = ttk.Button(self, text="İptal", command=self._cancel)
+        self.btn_cancel.pack(side=tk.LEFT, padx=10)
+        runner.add_listener(self._update)
+
+    def _update(self, active):
+        if not active:
+            self.progress.stop()
+            if self._shown:
+                self.pack_forget()
+                self._shown = False
+            return
+
+        task = active[-1]
+        text = task.title
+        done, total, detail = task.progress_value or (0, None, None)
+        if detail:
+            text = f"{text}: {detail}"
+        if len(active) > 1:
+            text = f"{text} (+{len(active) - 1} görev)"
+        self.lbl_status.config(text=text)
+
+        if total:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=total, value=done)
+        elif str(self.progress.cget("mode")) != "indeterminate":
+            self.progress.config(mode="indeterminate")
+            self.progress.start(15)
+        self.btn_cancel.config(state=tk.NORMAL if task.cancellable else tk.DISABLED)
+
+        if not self._shown:
+            self.pack(side=tk.BOTTOM, fill='x', **({"before": self._before} if self._before else {}))
+            self._shown = True
+
+    def _cancel(self):
+        if self.runner.active:
+            self.runner.active[-1].cancel()
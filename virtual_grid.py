@@ -0,0 +1,363 @@
+"""Sanal (sayfalı) Treeview.
+
+Treeview'a yalnızca ekranda görünen satırlar eklenir; diğerleri bellekte
+sınırlı sayıda sayfa olarak tutulur. Sayfalar anahtar kümesi (keyset) ile
+okunur: önceki sayfanın son satırının (sıralama, anahtar) değerinden devam
+edilir. Kaydırma çubuğuyla uzak bir konuma atlandığında bilinen bir sayfa
+sınırı yoksa bir kez OFFSET kullanılır. Sütun başlığına tıklamak sıralamayı
+SQL ORDER BY ile değiştirir.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import db
+
+
+class GridSource:
+    """VirtualGrid için SQL veri kaynağı.
+
+    select: görüntülenecek sütunlar (formatter'a bu sırayla gelir)
+    from_clause / where / params: FROM ve WHERE kısmı
+    key: satırı tekil belirleyen ifade (Treeview iid olarak da kullanılır)
+    sort_columns: {sütun_id: SQL ifadesi}; ifadeler NULL döndürmemelidir
+    prepare: her sorgudan önce bağlantıyla çağrılır (ör. arşiv veritabanlarını ATTACH etmek için)
+    """
+
+    def __init__(self, select, from_clause, where="", params=(), key="id",
+                 sort_columns=None, default_sort=None, descending=False, prepare=None):
+        self.select = select
+        self.from_clause = from_clause
+        self.where = where
+        self.params = tuple(params)
+        self.key = key
+        self.sort_columns = dict(sort_columns or {})
+        self.sort_column = default_sort
+        self.descending = descending
+        self.prepare = prepare
+
+    def _connection(self, conn):
+        conn = conn or db.get_read_connection()
+        if self.prepare is not None:
+            self.prepare(conn)
+        return conn
+
+    def _sort_expr(self):
+        return self.sort_columns.get(self.sort_column, self.key)
+
+    def _base(self, extra_where=None):
+        conditions = [c for c in (self.where, extra_where) if c]
+        where_sql = f" WHERE {' AND '.join(f'({c})' for c in conditions)}" if conditions else ""
+        return f"FROM {self.from_clause}{where_sql}"
+
+    def count(self, conn=None):
+        conn = self._connection(conn)
+        return conn.execute(f"SELECT COUNT(*) {self._base()}", self.params).fetchone()[0]
+
+    def fetch(self, limit, after=None, before=None, offset=None, conn=None):
+        """Bir sayfa satır döndürür. Her satır (sıralama_değeri, anahtar, *select) biçimindedir.
+
+        after: bu (sıralama, anahtar) değerinden sonraki satırlar
+        before: bu değerden önceki satırlar (sonuç yine ileri sıradadır)
+        offset: bilinen sınır yoksa atlanacak satır sayısı
+        """
+        conn = self._connection(conn)
+        sort_expr, key = self._sort_expr(), self.key
+        forward = before is None
+        descending = self.descending if forward else not self.descending
+        direction = "DESC" if descending else "ASC"
+        comparator = "<" if descending else ">"
+
+        extra_where, params = None, list(self.params)
+        boundary = after if forward else before
+        if boundary is not None:
+            extra_where = f"({sort_expr}, {key}) {comparator} (?, ?)"
+            params += list(boundary)
+
+        sql = (f"SELECT {sort_expr}, {key}, {self.select} {self._base(extra_where)} "
+               f"ORDER BY {sort_expr} {direction}, {key} {direction} LIMIT ?")
+        params.append(limit)
+        if boundary is None and offset:
+            sql += " OFFSET ?"
+            params.append(offset)
+
+        rows = conn.execute(sql, params).fetchall()
+        return rows if forward else rows[::-1]
+
+    def fetch_keys(self, keys, conn=None):
+        """Verilen anahtarlardaki satırları fetch() biçiminde döndürür (sıra belirsiz)."""
+        conn = self._connection(conn)
+        keys = list(keys)
+        placeholders = ", ".join("?" * len(keys))
+        sql = (f"SELECT {self._sort_expr()}, {self.key}, {self.select} "
+               f"{self._base(f'{self.key} IN ({placeholders})')}")
+        return conn.execute(sql, list(self.params) + keys).fetchall()
+
+    def iter_rows(self, chunk_size=500, conn=None):
+        """Tüm satırları mevcut sıralamada, sabit bellekle parça parça dolaşır (select sütunları)."""
+        after = None
+        while True:
+            rows = self.fetch(chunk_size, after=after, conn=conn)
+            for row in rows:
+                yield row[2:]
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1][:2]
+
+
+class VirtualGrid(ttk.Frame):
+    """Yalnızca görünen satırları oluşturan, kaydırma çubuklu Treeview.
+
+    columns: [(sütun_id, başlık, genişlik, hizalama), ...]
+    formatter: select satırını (values, tags) ikilisine çevirir
+    """
+
+    def __init__(self, master, columns, formatter=None, page_size=200, max_cached_pages=8, **tree_options):
+        super().__init__(master)
+        self.columns = columns
+        self.formatter = formatter or (lambda row: (row, ()))
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+
+        self.source = None
+        self.total = 0
+        self._offset = 0
+        self._visible = 20
+        self._pages = {}
+        self._last_keys = {}   # sayfa no -> son satırın (sıralama, anahtar) değeri
+        self._first_keys = {}  # sayfa no -> ilk satırın (sıralama, anahtar) değeri
+        self._selected_key = None
+        self._user_sort = None
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings", **tree_options)
+        for col_id, heading, width, anchor in columns:
+            self.tree.heading(col_id, text=heading, command=lambda c=col_id: self.sort_by(c))
+            self.tree.column(col_id, width=width, anchor=anchor, stretch=width > 0)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(expand=True, fill="both")
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Down>", lambda e: self._on_key_move(1))
+        self.tree.bind("<Up>", lambda e: self._on_key_move(-1))
+        self.tree.bind("<Next>", lambda e: self._on_key_move(self._visible))
+        self.tree.bind("<Prior>", lambda e: self._on_key_move(-self._visible))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+    # --- Veri ---
+
+    def apply_user_sort(self, source):
+        """Kullanıcının başlıktan seçtiği sıralamayı yeni kaynağa taşır (filtre değişince korunur)."""
+        user_sort = self._user_sort
+        if user_sort and user_sort[0] in source.sort_columns:
+            source.sort_column, source.descending = user_sort
+        return source
+
+    def set_source(self, source, total=None, first_page=None):
+        """Yeni veri kaynağını bağlar ve en başa döner.
+
+        total ve first_page arka planda önceden okunduysa verilebilir; böylece
+        ana iş parçacığında sorgu çalışmaz.
+        """
+        self.apply_user_sort(source)
+        self.source = source
+        self._offset = 0
+        self.refresh(total, first_page)
+
+    def refresh(self, total=None, first_page=None):
+        """Önbelleği boşaltır, satır sayısını yeniden okur ve mevcut konumu yeniden çizer."""
+        self._pages.clear()
+        self._last_keys.clear()
+        self._first_keys.clear()
+        if first_page is not None:
+            self._store_page(0, first_page)
+        if total is None:
+            total = self.source.count() if self.source else 0
+        self.total = total
+        self._offset = max(0, min(self._offset, self.total - self._visible))
+        self._render()
+        self._update_heading_arrows()
+
+    def iter_rows(self, chunk_size=500):
+        if self.source is None:
+            return iter(())
+        return self.source.iter_rows(chunk_size)
+
+    def _load_page(self, page_no):
+        page = self._pages.get(page_no)
+        if page is not None:
+            return page
+
+        if page_no == 0:
+            rows = self.source.fetch(self.page_size)
+        elif page_no - 1 in self._last_keys:
+            rows = self.source.fetch(self.page_size, after=self._last_keys[page_no - 1])
+        elif page_no + 1 in self._first_keys:
+            rows = self.source.fetch(self.page_size, before=self._first_keys[page_no + 1])
+        else:
+            rows = self.source.fetch(self.page_size, offset=page_no * self.page_size)
+
+        self._store_page(page_no, rows)
+
+        # Görünen konumdan en uzak sayfaları bellekten at
+        if len(self._pages) > self.max_cached_pages:
+            current = self._offset // self.page_size
+            for far in sorted(self._pages, key=lambda p: abs(p - current), reverse=True):
+                if len(self._pages) <= self.max_cached_pages:
+                    break
+                if far != page_no:
+                    del self._pages[far]
+        return rows
+
+    def _store_page(self, page_no, rows):
+        self._pages[page_no] = rows
+        if rows:
+            self._first_keys[page_no] = tuple(rows[0][:2])
+            self._last_keys[page_no] = tuple(rows[-1][:2])
+
+    def prefetch(self, source, conn):
+        """Arka plan iş parçacığında çağrılır: (kaynak, toplam, ilk sayfa) döndürür (set_source'a verilir)."""
+        self.apply_user_sort(source)
+        return source, source.count(conn), source.fetch(self.page_size, conn=conn)
+
+    def update_rows(self, keys):
+        """Önbellekteki satırları yeniden okuyup yerinde günceller (satır sayısı değişmediğinde).
+
+        Satırın sıralama değeri değiştiyse veya satır artık filtreye uymuyorsa
+        sayfa sınırları geçersiz olacağından tüm tablo yenilenir.
+        """
+        if self.source is None:
+            return
+        wanted = {str(k) for k in keys}
+        cached = {}
+        for page_no, rows in self._pages.items():
+            for index, row in enumerate(rows):
+                if str(row[1]) in wanted:
+                    cached[str(row[1])] = (page_no, index, row[0])
+        if not cached:
+            return  # Değişen satırlar yüklenmemiş; okunduklarında zaten güncel gelecekler
+
+        fresh = {str(row[1]): row for row in self.source.fetch_keys([self._pages[p][i][1] for p, i, _ in cached.values()])}
+        if len(fresh) != len(cached) or any(fresh[k][0] != sort for k, (_, _, sort) in cached.items()):
+            self.refresh()
+            return
+        for key, (page_no, index, _) in cached.items():
+            self._pages[page_no][index] = fresh[key]
+        self._render()
+
+    def _rows_in_view(self):
+        end = min(self._offset + self._visible, self.total)
+        rows, index = [], self._offset
+        while index < end:
+            page_no, start = divmod(index, self.page_size)
+            page = self._load_page(page_no)
+            chunk = page[start:start + (end - index)]
+            if not chunk:
+                break
+            rows.extend(chunk)
+            index += len(chunk)
+        return rows
+
+    # --- Çizim ---
+
+    def _render(self):
+        self.tree.delete(*self.tree.get_children())
+        if self.source is not None:
+            for row in self._rows_in_view():
+                values, tags = self.formatter(row[2:])
+                self.tree.insert("", tk.END, iid=str(row[1]), values=values, tags=tags)
+            if self._selected_key is not None and self.tree.exists(self._selected_key):
+                self.tree.selection_set(self._selected_key)
+                self.tree.focus(self._selected_key)
+
+        if self.total:
+            self.scrollbar.set(self._offset / self.total, min(1.0, (self._offset + self._visible) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def set_heading(self, col_id, heading):
+        """Sütun başlığını değiştirir (ör. raporun gruplamasına göre)."""
+        self.columns = [(c, heading if c == col_id else h, w, a) for c, h, w, a in self.columns]
+        self._update_heading_arrows()
+
+    def _update_heading_arrows(self):
+        for col_id, heading, _, _ in self.columns:
+            if self.source is not None and col_id == self.source.sort_column:
+                heading = f"{heading} {'▼' if self.source.descending else '▲'}"
+            self.tree.heading(col_id, text=heading)
+
+    # --- Kaydırma ---
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.total - self._visible))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def scroll(self, rows):
+        self.scroll_to(self._offset + rows)
+
+    def yview(self, *args):
+        if not args or not self.total:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.scroll(amount * self._visible if args[2] == "pages" else amount)
+
+    def _on_mousewheel(self, event):
+        # Windows'ta bir tık 120 birimdir; macOS küçük değerler gönderir
+        steps = int(event.delta / 120) if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * steps)
+        return "break"
+
+    def _on_configure(self, event):
+        style = ttk.Style()
+        row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        visible = max(1, event.height // row_height - 1)  # başlık satırı hariç
+        if visible != self._visible:
+            self._visible = visible
+            self._offset = max(0, min(self._offset, self.total - self._visible))
+            self._render()
+
+    def _on_key_move(self, delta):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        focus = self.tree.focus()
+        position = children.index(focus) if focus in children else 0
+        target = position + delta
+        if 0 <= target < len(children):
+            return None  # Treeview'ın kendi gezinmesi yeterli
+
+        self.scroll(delta)
+        children = self.tree.get_children()
+        if children:
+            item = children[-1] if delta > 0 else children[0]
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+            self.tree.see(item)
+        return "break"
+
+    def _on_select(self, event):
+        focus = self.tree.focus()
+        if focus:
+            self._selected_key = focus
+
+    # --- Sıralama ---
+
+    def sort_by(self, col_id):
+        if self.source is None or col_id not in self.source.sort_columns:
+            return
+        if self.source.sort_column == col_id:
+            self.source.descending = not self.source.descending
+        else:
+            self.source.sort_column = col_id
+            self.source.descending = False
+        self._user_sort = (col_id, self.source.descending)
+        self._offset = 0
+        self.refresh()